@@ -12,7 +12,40 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from sushy_oem_idrac.resources.manager.constants import *  # noqa
-from sushy_oem_idrac.resources.system.constants import *  # noqa
-from sushy_oem_idrac.resources.system.storage.constants import * # noqa
-from sushy_oem_idrac.resources.taskservice.constants import *  # noqa
+import importlib
+
+# Constants of these modules are re-exported from the package. They get
+# imported on first use only, as every sushy OEM entry point loads this
+# package. Later modules take precedence, as with star imports.
+_CONSTANTS_MODULES = (
+    'sushy_oem_idrac.resources.manager.constants',
+    'sushy_oem_idrac.resources.system.constants',
+    'sushy_oem_idrac.resources.system.storage.constants',
+    'sushy_oem_idrac.resources.taskservice.constants',
+)
+
+
+def _public_names(module):
+    return [name for name in vars(module) if name[:1].isupper()]
+
+
+def __getattr__(name):
+    if name == '__all__':
+        return sorted({name for module_name in _CONSTANTS_MODULES
+                       for name in _public_names(
+                           importlib.import_module(module_name))})
+
+    # Constants are capitalized, anything else (e.g. a submodule not
+    # imported yet) must not trigger importing all constants modules
+    if name[:1].isupper():
+        for module_name in reversed(_CONSTANTS_MODULES):
+            module = importlib.import_module(module_name)
+            if name in vars(module):
+                value = globals()[name] = getattr(module, name)
+                return value
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__('__all__')))
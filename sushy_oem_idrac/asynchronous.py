@@ -10,32 +10,407 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
 from datetime import datetime
-from datetime import timedelta
+from datetime import timezone
+from email import utils as email_utils
+import functools
+import heapq
+import itertools
 import logging
+import random
+import threading
 import time
+from urllib.parse import urlparse
 
-from dateutil import parser
 import sushy
 
+from sushy_oem_idrac import utils
+
 LOG = logging.getLogger(__name__)
 
+# Only needed by some code paths, imported on first use
+asyncio = utils.lazy_import('asyncio')
+futures = utils.lazy_import('concurrent.futures')
+parser = utils.lazy_import('dateutil.parser')
+
 TASK_POLL_PERIOD = 1
 
+# Window, in seconds, the delay requested by Retry-After is clamped to
+RETRY_AFTER_MIN_DELAY = 0
+RETRY_AFTER_MAX_DELAY = 300
+
+# For how long, in seconds, a measured BMC clock skew is reused
+CLOCK_SKEW_TTL = 600
+
+TASK_POLLER_WORKERS = 8
+
+# Polls falling due within this many seconds of each other are issued
+# together, so that GETs towards the same host can be batched
+TASK_POLLER_COALESCE_WINDOW = 0.25
+
+# How often, in seconds, a caller waiting on the poller checks whether
+# its wait got cancelled
+TASK_CANCEL_CHECK_PERIOD = 0.1
+
+_task_poller = None
+_task_poller_lock = threading.Lock()
+_default_task_poller = None
+
+# Structure {'host': (skew in seconds, monotonic time of measurement)}
+_clock_skews = {}
+
+
+class TaskTimeoutError(sushy.exceptions.ExtensionError):
+    """Waiting for an asynchronous iDRAC task was cut short.
+
+    Raised when the deadline of the wait passes or the wait gets
+    cancelled. `location` holds the last known task Location URI,
+    which can be used to check on the task later.
+    """
+
+    message = 'Gave up waiting for task at %(location)s: %(reason)s'
+
+    def __init__(self, location=None, reason=None):
+        self.location = location
+        self.reason = reason
+        super(TaskTimeoutError, self).__init__(
+            location=location, reason=reason)
+
+
+def _get_host(conn):
+    url = getattr(conn, '_url', None)
+    return urlparse(url).netloc if isinstance(url, str) else None
+
+
+def _parse_http_date(value):
+    """Parse HTTP-date into timezone-aware datetime, None if malformed."""
+    if not value:
+        return None
+
+    try:
+        parsed = email_utils.parsedate_to_datetime(value)
+
+    except (TypeError, ValueError):
+        try:
+            parsed = parser.parse(value)
+
+        except (OverflowError, ValueError):
+            return None
+
+    if parsed.tzinfo is None:
+        # HTTP-date is always in GMT
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed
+
+
+def _get_clock_skew(response, host):
+    """Get how far the clock of the host is ahead of the local one.
 
-def _to_datetime(retry_after_str):
-    if retry_after_str.isdigit():
+    Measured from the Date header of the response and remembered per
+    host for `CLOCK_SKEW_TTL` seconds, during which the Date headers of
+    further responses from that host are not parsed again. Skews of
+    unknown hosts are measured every time, as they may be any host.
+
+    :returns: Skew in seconds, 0 if not known.
+    """
+    now = time.monotonic()
+
+    skew, measured_at = _clock_skews.get(host, (None, None))
+    if skew is not None and now - measured_at < CLOCK_SKEW_TTL:
+        return skew
+
+    server_now = _parse_http_date(response.headers.get('Date'))
+    if server_now is None:
+        return skew or 0
+
+    skew = (server_now - datetime.now(timezone.utc)).total_seconds()
+
+    LOG.debug('Clock of %s is %.1f secs off the local clock', host, skew)
+
+    if host is not None:
+        _clock_skews[host] = (skew, now)
+    return skew
+
+
+def _get_location(response, location, method, args, kwargs):
+    location = response.headers.get('Location', location)
+    if not location:
+        raise sushy.exceptions.ExtensionError(
+            error='Response %d to HTTP %s with args %s, kwargs %s '
+                  'does not include Location: in '
+                  'header' % (response.status_code, method.upper(),
+                              args, kwargs))
+    return location
+
+
+def _get_retry_after(response, host=None):
+    """Get the delay requested by Retry-After header of the response.
+
+    An HTTP-date is taken relative to the clock of the responding host
+    rather than the local one, and the delay is clamped into
+    [`RETRY_AFTER_MIN_DELAY`, `RETRY_AFTER_MAX_DELAY`].
+
+    :returns: Delay in seconds or None if not requested.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after:
+        return None
+
+    if retry_after.isdigit():
         # Retry-After: 120
-        return datetime.now() + timedelta(seconds=int(retry_after_str))
+        delay = int(retry_after)
+
     else:
         # Retry-After: Fri, 31 Dec 1999 23:59:59 GMT
-        return parser.parse(retry_after_str)
+        retry_at = _parse_http_date(retry_after)
+        if retry_at is None:
+            LOG.warning('Ignoring malformed Retry-After: %s', retry_after)
+            return None
+
+        skew = _get_clock_skew(response, host)
+        delay = (retry_at - datetime.now(timezone.utc)).total_seconds() - skew
+
+    return min(max(delay, RETRY_AFTER_MIN_DELAY), RETRY_AFTER_MAX_DELAY)
+
+
+def _check_response(response, method, args, kwargs):
+    if response.status_code >= 400:
+        raise sushy.exceptions.ExtensionError(
+            error='HTTP %s with args %s, kwargs %s failed '
+                  'with code %s' % (method.upper(), args, kwargs,
+                                    response.status_code))
+    return response
+
+
+class PollPolicy(object):
+    """Decides how long to wait before polling a pending task again."""
+
+    def get_delay(self, attempt, retry_after=None):
+        """Get the delay before the next poll.
+
+        :param attempt: Number of polls done so far, 0 for the first one.
+        :param retry_after: Delay in seconds requested by the service
+            through Retry-After header, None if not requested.
+        :returns: Delay in seconds.
+        """
+        raise NotImplementedError()
+
+
+class FixedPollPolicy(PollPolicy):
+    """Polls every `period` seconds unless told otherwise by Retry-After."""
+
+    def __init__(self, period=TASK_POLL_PERIOD):
+        self.period = period
+
+    def get_delay(self, attempt, retry_after=None):
+        return self.period if retry_after is None else retry_after
+
+
+class ExponentialPollPolicy(PollPolicy):
+    """Polls with exponentially growing, jittered and capped delays.
+
+    Delay of the first poll is `initial`, every following one grows by
+    `factor` up to `max_delay`. Each delay is then randomly spread by
+    up to +/- `jitter` of its value, so that many operations started
+    together do not poll in lockstep. Retry-After requested by the
+    service takes precedence unless `honor_retry_after` is False.
+    """
+
+    def __init__(self, initial=TASK_POLL_PERIOD, factor=2, max_delay=15,
+                 jitter=0.1, honor_retry_after=True):
+        self.initial = initial
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.honor_retry_after = honor_retry_after
+
+    def get_delay(self, attempt, retry_after=None):
+        if retry_after is not None and self.honor_retry_after:
+            return retry_after
+
+        delay = min(self.initial * self.factor ** attempt, self.max_delay)
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(0, min(delay, self.max_delay))
+
+
+# Poll policies by operation type, None is the default for all others
+_poll_policies = {
+    None: FixedPollPolicy(),
+    'export_system_configuration': ExponentialPollPolicy(max_delay=15),
+    'import_system_configuration': ExponentialPollPolicy(max_delay=10),
+}
+
+
+def get_poll_policy(operation=None):
+    """Get the poll policy used for the given operation type.
+
+    :param operation: Operation type, e.g. 'export_system_configuration'.
+        None for the default policy.
+    :returns: `PollPolicy` instance.
+    """
+    return _poll_policies.get(operation) or _poll_policies[None]
+
+
+def set_poll_policy(policy, operation=None):
+    """Set the poll policy of an operation type or the default one.
+
+    :param policy: `PollPolicy` instance. None removes the operation
+        specific policy so that the default one applies.
+    :param operation: Operation type, None to set the default policy.
+    """
+    if policy is None and operation is not None:
+        _poll_policies.pop(operation, None)
+    elif policy is not None:
+        _poll_policies[operation] = policy
+
+
+class PollStats(object):
+    """Counts how many polls asynchronous operations took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, operation, polls):
+        with self._lock:
+            stats = self._stats.setdefault(
+                operation or 'default',
+                {'operations': 0, 'polls': 0, 'max_polls': 0})
+            stats['operations'] += 1
+            stats['polls'] += polls
+            stats['max_polls'] = max(stats['max_polls'], polls)
+
+    def get(self, operation=None):
+        """Get poll counters of one or all operation types.
+
+        :param operation: Operation type. All types if None.
+        :returns: dict with 'operations', 'polls' and 'max_polls' counts,
+            or a dict of those by operation type.
+        """
+        with self._lock:
+            if operation is not None:
+                return dict(self._stats.get(
+                    operation, {'operations': 0, 'polls': 0, 'max_polls': 0}))
+
+            return {k: dict(v) for k, v in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+poll_stats = PollStats()
+
+
+class _TaskPoll(object):
+    """Poll state of one asynchronous operation.
+
+    Consumes `sushy_task_poll_period`, `sushy_poll_policy` and
+    `sushy_task_operation` from request kwargs. An explicit poll period
+    selects a `FixedPollPolicy`, otherwise the policy of the operation
+    type applies.
+
+    `sushy_task_deadline` limits the overall wait to this many seconds
+    and `sushy_task_cancel` takes an event (`threading.Event`, or
+    `asyncio.Event` for coroutines) that aborts the wait once set.
+    """
+
+    def __init__(self, conn, kwargs):
+        self.host = _get_host(conn)
+
+        period = kwargs.pop('sushy_task_poll_period', None)
+        self.operation = kwargs.pop('sushy_task_operation', None)
+        self.policy = kwargs.pop('sushy_poll_policy', None)
+        self.cancel = kwargs.pop('sushy_task_cancel', None)
+        deadline = kwargs.pop('sushy_task_deadline', None)
+
+        if self.policy is None:
+            self.policy = (get_poll_policy(self.operation) if period is None
+                           else FixedPollPolicy(period))
+
+        self.deadline = (None if deadline is None
+                         else time.monotonic() + deadline)
+        self.polls = 0
+
+    def check(self, location):
+        """Raise TaskTimeoutError if the wait is cancelled or expired."""
+        if self.cancel is not None and self.cancel.is_set():
+            raise TaskTimeoutError(location=location, reason='cancelled')
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TaskTimeoutError(location=location,
+                                   reason='deadline exceeded')
+
+    def clamp(self, delay):
+        """Shorten the delay so that it does not overrun the deadline."""
+        if self.deadline is None:
+            return delay
+        return max(0, min(delay, self.deadline - time.monotonic()))
+
+    def wait(self, delay, location):
+        self.check(location)
+
+        delay = self.clamp(delay)
+
+        if self.cancel is None:
+            time.sleep(delay)
+        else:
+            self.cancel.wait(delay)
+
+        self.check(location)
+
+    async def async_wait(self, delay, location):
+        self.check(location)
+
+        delay = self.clamp(delay)
+
+        if isinstance(self.cancel, asyncio.Event):
+            try:
+                await asyncio.wait_for(self.cancel.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(delay)
+
+        self.check(location)
+
+    def next_delay(self, response):
+        delay = self.policy.get_delay(
+            self.polls, _get_retry_after(response, self.host))
+        self.polls += 1
+        return delay
+
+    def finish(self):
+        LOG.debug('Operation %s took %d poll(s)', self.operation or 'default',
+                  self.polls)
+        poll_stats.record(self.operation, self.polls)
 
 
 def http_call(conn, method, *args, **kwargs):
+    poller = kwargs.pop('sushy_task_poller', _default_task_poller)
+
+    if poller is not None:
+        cancel = kwargs.get('sushy_task_cancel')
+        future = poller.http_call(conn, method, *args, **kwargs)
+        if cancel is None:
+            return future.result()
+
+        # The poller checks the event only before each poll, which may
+        # be minutes apart, so the wait is cut short from here
+        while True:
+            try:
+                return future.result(timeout=TASK_CANCEL_CHECK_PERIOD)
+            except futures.TimeoutError:
+                if cancel.is_set() and future.cancel():
+                    raise TaskTimeoutError(
+                        location=getattr(future, 'location', None),
+                        reason='cancelled')
+
     handle = getattr(conn, method.lower())
 
-    sleep_for = kwargs.pop('sushy_task_poll_period', TASK_POLL_PERIOD)
+    poll = _TaskPoll(conn, kwargs)
 
     response = handle(*args, **kwargs)
 
@@ -44,33 +419,279 @@ def http_call(conn, method, *args, **kwargs):
 
     location = None
     while response.status_code == 202:
-        location = response.headers.get('Location', location)
-        if not location:
-            raise sushy.exceptions.ExtensionError(
-                error='Response %d to HTTP %s with args %s, kwargs %s '
-                      'does not include Location: in '
-                      'header' % (response.status_code, method.upper(),
-                                  args, kwargs))
-
-        retry_after = response.headers.get('Retry-After')
-        if retry_after:
-            retry_after = _to_datetime(retry_after)
-            sleep_for = max(0, (retry_after - datetime.now()).total_seconds())
+        location = _get_location(response, location, method, args, kwargs)
+        sleep_for = poll.next_delay(response)
 
         LOG.debug('Sleeping for %d secs before retrying HTTP GET '
                   '%s', sleep_for, location)
 
-        time.sleep(sleep_for)
+        poll.wait(sleep_for, location)
 
         response = conn.get(location)
 
         LOG.debug('Finished HTTP GET %s, response is '
                   '%d', location, response.status_code)
 
-    if response.status_code >= 400:
-        raise sushy.exceptions.ExtensionError(
-            error='HTTP %s with args %s, kwargs %s failed '
-                  'with code %s' % (method.upper(), args, kwargs,
-                                    response.status_code))
+    poll.finish()
 
-    return response
+    return _check_response(response, method, args, kwargs)
+
+
+async def async_http_call(conn, method, *args, **kwargs):
+    """Coroutine counterpart of `http_call`.
+
+    Follows the same 202/Location/Retry-After protocol, but waits between
+    polls on the running event loop instead of blocking a thread, so many
+    pending iDRAC tasks can be awaited concurrently. The blocking HTTP
+    requests themselves are handed over to the loop's default executor.
+
+    :param conn: sushy connector to issue the requests with.
+    :param method: HTTP method of the initial request, e.g. 'post'.
+    :returns: the final response once the task is no longer pending.
+    :raises: ExtensionError if a 202 response carries no Location or
+        the final response reports an error.
+    """
+    loop = asyncio.get_running_loop()
+    handle = getattr(conn, method.lower())
+
+    poll = _TaskPoll(conn, kwargs)
+
+    response = await loop.run_in_executor(
+        None, functools.partial(handle, *args, **kwargs))
+
+    LOG.debug('Finished HTTP %s with args %s %s, response is '
+              '%d', method, args or '', kwargs, response.status_code)
+
+    location = None
+    while response.status_code == 202:
+        location = _get_location(response, location, method, args, kwargs)
+        sleep_for = poll.next_delay(response)
+
+        LOG.debug('Awaiting %d secs before retrying HTTP GET '
+                  '%s', sleep_for, location)
+
+        await poll.async_wait(sleep_for, location)
+
+        response = await loop.run_in_executor(None, conn.get, location)
+
+        LOG.debug('Finished HTTP GET %s, response is '
+                  '%d', location, response.status_code)
+
+    poll.finish()
+
+    return _check_response(response, method, args, kwargs)
+
+
+def _set_result(future, result):
+    # The waiting caller may have cancelled the future meanwhile
+    try:
+        future.set_result(result)
+    except futures.InvalidStateError:
+        pass
+
+
+def _set_exception(future, exc):
+    try:
+        future.set_exception(exc)
+    except futures.InvalidStateError:
+        pass
+
+
+class _PendingTask(object):
+    """Book-keeping of one outstanding 202 Location URI."""
+
+    def __init__(self, conn, poll, future, method, args, kwargs):
+        self.conn = conn
+        self.location = None
+        self.poll = poll
+        self.future = future
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+
+    @property
+    def host(self):
+        return self.poll.host
+
+
+class TaskPoller(object):
+    """Polls outstanding iDRAC tasks of many callers on one scheduler.
+
+    Callers register the Location URI of a 202 response and get back a
+    `concurrent.futures.Future` resolving to the final response. A
+    single scheduler thread keeps all pending Location URIs ordered by
+    their next due time. Due GETs are grouped by host and each host's
+    group is issued sequentially by one worker, reusing that host's
+    connector, so a BMC never sees a burst of parallel polls.
+    """
+
+    def __init__(self, max_workers=TASK_POLLER_WORKERS):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._counter = itertools.count()
+        self._thread = None
+        self._stopped = False
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='sushy-oem-idrac-poller')
+
+    def http_call(self, conn, method, *args, **kwargs):
+        """Issue a request and poll its task on this poller.
+
+        The initial request is issued from the calling thread, the
+        polling of a 202 response is then left to the poller. Pending
+        polls are dropped once the returned future is cancelled, while
+        `sushy_task_cancel` event is checked before each poll.
+
+        :returns: `concurrent.futures.Future` resolving to the final
+            response, or to ExtensionError on failure. Its `location`
+            attribute holds the last known task Location URI.
+        """
+        handle = getattr(conn, method.lower())
+
+        poll = _TaskPoll(conn, kwargs)
+
+        response = handle(*args, **kwargs)
+
+        LOG.debug('Finished HTTP %s with args %s %s, response is '
+                  '%d', method, args or '', kwargs, response.status_code)
+
+        future = futures.Future()
+        future.location = None
+
+        if response.status_code != 202:
+            poll.finish()
+            try:
+                future.set_result(
+                    _check_response(response, method, args, kwargs))
+            except sushy.exceptions.ExtensionError as exc:
+                future.set_exception(exc)
+            return future
+
+        task = _PendingTask(conn, poll, future, method, args, kwargs)
+        self._reschedule(task, response)
+        return future
+
+    def _reschedule(self, task, response):
+        try:
+            task.location = _get_location(
+                response, task.location, task.method, task.args, task.kwargs)
+        except sushy.exceptions.ExtensionError as exc:
+            _set_exception(task.future, exc)
+            return
+
+        task.future.location = task.location
+
+        sleep_for = task.poll.clamp(task.poll.next_delay(response))
+
+        LOG.debug('Scheduling HTTP GET %s in %d secs', task.location,
+                  sleep_for)
+
+        with self._cond:
+            if self._stopped:
+                _set_exception(task.future, sushy.exceptions.ExtensionError(
+                    error='Task poller is shut down, abandoning %s'
+                          % task.location))
+                return
+
+            heapq.heappush(self._queue, (time.monotonic() + sleep_for,
+                                         next(self._counter), task))
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='sushy-oem-idrac-scheduler',
+                    daemon=True)
+                self._thread.start()
+
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    timeout = None
+                    if self._queue:
+                        timeout = self._queue[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self._cond.wait(timeout)
+
+                if self._stopped:
+                    return
+
+                now = time.monotonic() + TASK_POLLER_COALESCE_WINDOW
+                by_host = collections.defaultdict(list)
+                while self._queue and self._queue[0][0] <= now:
+                    _, _, task = heapq.heappop(self._queue)
+                    by_host[task.host].append(task)
+
+            for host, tasks in by_host.items():
+                self._executor.submit(self._poll_host, host, tasks)
+
+    def _poll_host(self, host, tasks):
+        LOG.debug('Polling %d pending task(s) at %s', len(tasks), host)
+
+        for task in tasks:
+            if task.future.cancelled():
+                continue
+
+            try:
+                task.poll.check(task.location)
+
+                response = task.conn.get(task.location)
+
+            except Exception as exc:
+                _set_exception(task.future, exc)
+                continue
+
+            LOG.debug('Finished HTTP GET %s, response is '
+                      '%d', task.location, response.status_code)
+
+            if response.status_code == 202:
+                self._reschedule(task, response)
+                continue
+
+            task.poll.finish()
+
+            try:
+                _set_result(task.future, _check_response(
+                    response, task.method, task.args, task.kwargs))
+            except sushy.exceptions.ExtensionError as exc:
+                _set_exception(task.future, exc)
+
+    def shutdown(self):
+        """Stop polling and fail all still pending tasks."""
+        with self._cond:
+            self._stopped = True
+            pending, self._queue = self._queue, []
+            self._cond.notify()
+
+        for _, _, task in pending:
+            _set_exception(task.future, sushy.exceptions.ExtensionError(
+                error='Task poller is shut down, abandoning %s'
+                      % task.location))
+
+        self._executor.shutdown(wait=False)
+
+
+def get_task_poller():
+    """Get the process-wide `TaskPoller`, creating it on first use."""
+    global _task_poller
+
+    with _task_poller_lock:
+        if _task_poller is None:
+            _task_poller = TaskPoller()
+
+        return _task_poller
+
+
+def set_default_task_poller(poller):
+    """Make `http_call` poll through the given `TaskPoller` by default.
+
+    E.g. ``set_default_task_poller(get_task_poller())`` routes all
+    `http_call` users, such as `DellManagerExtension`, through the
+    process-wide poller. Passing None restores private poll loops.
+    """
+    global _default_task_poller
+
+    _default_task_poller = poller
@@ -18,3 +18,9 @@ NO_FOREIGN_CONFIG = 'STOR018'
 INCOMPLETE_JOB_STATES = ['Scheduled',
                          'Running',
                          'Paused']
+# Jobs in these states hold the job queue, unlike scheduled ones that
+# wait for a reboot
+RUNNING_JOB_STATES = ['New',
+                      'Scheduling',
+                      'Downloading',
+                      'Running']
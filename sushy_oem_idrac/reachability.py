@@ -0,0 +1,236 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+import itertools
+import logging
+import os
+import selectors
+import socket
+import struct
+import time
+from urllib.parse import urlparse
+
+import sushy
+
+LOG = logging.getLogger(__name__)
+
+PROBE_TCP = 'tcp'
+PROBE_ICMP = 'icmp'
+
+# How long, in seconds, a probe waits for hosts to answer
+PROBE_TIMEOUT = 2
+
+# Port probed when the host does not name one
+REDFISH_PORT = 443
+
+# Connection results telling that something at the address answered
+_TCP_ALIVE = (0, errno.ECONNREFUSED)
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+
+_icmp_sequence = itertools.count()
+
+
+def _split_host(host, default_port):
+    """Split ``host[:port]``, as found in a URL netloc, into its parts."""
+    parsed = urlparse('//' + host)
+    return parsed.hostname, parsed.port or default_port
+
+
+def _resolve(host, port, family=socket.AF_UNSPEC, type=0):
+    try:
+        return socket.getaddrinfo(host, port, family, type)[0]
+    except (socket.gaierror, UnicodeError) as exc:
+        LOG.debug('Cannot resolve %(host)s: %(error)s',
+                  {'host': host, 'error': exc})
+
+
+def _probe_tcp(hosts, timeout, port, port_open):
+    alive = (0,) if port_open else _TCP_ALIVE
+    results = dict.fromkeys(hosts, False)
+    selector = selectors.DefaultSelector()
+    try:
+        for host in results:
+            address = _resolve(*_split_host(host, port),
+                               type=socket.SOCK_STREAM)
+            if address is None:
+                continue
+
+            family, type_, proto, _, sockaddr = address
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            result = sock.connect_ex(sockaddr)
+            if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                selector.register(sock, selectors.EVENT_WRITE, host)
+                continue
+
+            results[host] = result in alive
+            sock.close()
+
+        deadline = time.monotonic() + timeout
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            for key, _ in selector.select(remaining):
+                result = key.fileobj.getsockopt(
+                    socket.SOL_SOCKET, socket.SO_ERROR)
+                results[key.data] = result in alive
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+    return results
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _build_echo_request(ident, sequence):
+    payload = b'sushy-oem-idrac'
+    header = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, 0, ident, sequence)
+    checksum = _checksum(header + payload)
+    header = struct.pack(
+        '!BBHHH', _ICMP_ECHO_REQUEST, 0, checksum, ident, sequence)
+    return header + payload
+
+
+def _parse_echo_reply(data):
+    """Get the sequence number of an ICMP echo reply, None otherwise."""
+    # Raw sockets hand over the IPv4 header too, datagram ones do not
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+
+    if len(data) < 8:
+        return
+
+    type_, _, _, _, sequence = struct.unpack('!BBHHH', data[:8])
+    if type_ == _ICMP_ECHO_REPLY:
+        return sequence
+
+
+def _open_icmp_socket():
+    # Unprivileged ICMP datagram sockets need net.ipv4.ping_group_range to
+    # cover the user, raw ones need CAP_NET_RAW
+    errors = []
+    for type_ in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            return socket.socket(
+                socket.AF_INET, type_, socket.IPPROTO_ICMP)
+        except OSError as exc:
+            errors.append(str(exc))
+
+    raise sushy.exceptions.ExtensionError(
+        error='Cannot open an ICMP socket: %s' % '; '.join(errors))
+
+
+def _probe_icmp(hosts, timeout):
+    results = dict.fromkeys(hosts, False)
+    sock = _open_icmp_socket()
+    selector = selectors.DefaultSelector()
+    try:
+        sock.setblocking(False)
+        ident = os.getpid() & 0xffff
+
+        # The kernel rewrites the identifier of datagram ICMP sockets, so
+        # replies are told apart by sequence number and source address
+        pending = {}
+        for host in results:
+            address = _resolve(_split_host(host, None)[0], None,
+                               family=socket.AF_INET)
+            if address is None:
+                continue
+
+            ip = address[4][0]
+            sequence = next(_icmp_sequence) & 0xffff
+            try:
+                sock.sendto(_build_echo_request(ident, sequence), (ip, 0))
+            except OSError as exc:
+                LOG.debug('Cannot send ICMP echo request to %(host)s: '
+                          '%(error)s', {'host': host, 'error': exc})
+                continue
+
+            pending[(sequence, ip)] = host
+
+        selector.register(sock, selectors.EVENT_READ)
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not selector.select(remaining):
+                break
+
+            try:
+                data, (ip, _) = sock.recvfrom(1024)
+            except BlockingIOError:
+                continue
+
+            host = pending.pop((_parse_echo_reply(data), ip), None)
+            if host is not None:
+                results[host] = True
+
+    finally:
+        selector.close()
+        sock.close()
+
+    return results
+
+
+def probe(hosts, timeout=PROBE_TIMEOUT, method=PROBE_TCP,
+          port=REDFISH_PORT, port_open=False):
+    """Check which of the given hosts are reachable.
+
+    All hosts are probed at once, from a single selector loop in the
+    calling thread, without spawning any process.
+
+    With TCP probing, a host is considered alive when it either accepts
+    or actively refuses a connection to the probed port; either way its
+    network stack answers, which is what ``ping`` used to tell.
+
+    :param hosts: Iterable of hostnames or IPs, optionally followed by
+        ``:port`` as in a URL netloc.
+    :param timeout: Time in seconds to wait for hosts to answer.
+    :param method: PROBE_TCP or PROBE_ICMP. ICMP probing needs either
+        unprivileged ICMP sockets or CAP_NET_RAW and supports IPv4 only.
+    :param port: TCP port to probe for hosts not naming one.
+    :param port_open: With TCP probing, only count hosts accepting the
+        connection as alive.
+    :returns: Dictionary mapping each host to True if it is alive;
+        otherwise, False.
+    :raises: ExtensionError if ICMP probing is not permitted.
+    """
+    if method == PROBE_ICMP:
+        return _probe_icmp(hosts, timeout)
+
+    return _probe_tcp(hosts, timeout, port, port_open)
+
+
+def is_reachable(host, **kwargs):
+    """Check whether a single host is reachable.
+
+    :param host: Hostname or IP, optionally followed by ``:port``.
+    :param kwargs: Any other argument taken by `probe`.
+    :returns: True if host is alive; otherwise, False.
+    """
+    return probe([host], **kwargs)[host]
@@ -54,3 +54,16 @@ class DellJobCollection(base.ResourceBase):
                 unfinished_jobs.append(job['Id'])
         LOG.info('Got unfinished jobs')
         return unfinished_jobs
+
+    def get_running_jobs(self):
+        """Get the jobs currently running.
+
+        Unlike `get_unfinished_jobs`, leaves out jobs scheduled to run
+        on next reboot.
+
+        :returns: A list of running jobs.
+        """
+        job_expand_uri = '%s%s' % (self._path, self._JOB_EXPAND)
+        data = self._conn.get(job_expand_uri).json()
+        return [job['Id'] for job in data[u'Members']
+                if job[u'JobState'] in constants.RUNNING_JOB_STATES]
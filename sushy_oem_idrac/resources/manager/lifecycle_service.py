@@ -13,25 +13,75 @@
 # under the License.
 
 import logging
+import time
 
 from sushy.resources import base
 from sushy.resources import common
 
 LOG = logging.getLogger(__name__)
 
+# For how long, in seconds, a remote services API status is reused
+REMOTE_SERVICES_STATUS_TTL = 5
+
+_READY_STATUS = 'Ready'
+
 
 class ActionsField(base.CompositeField):
     remote_service_api_status = common.ActionField(
         "#DellLCService.GetRemoteServicesAPIStatus")
 
 
+class RemoteServicesAPIStatus(object):
+    """Snapshot of the iDRAC remote services API status.
+
+    Holds every status reported by one GetRemoteServicesAPIStatus call.
+    A status the iDRAC did not report, e.g. because the call did not
+    succeed, is None and never ready.
+    """
+
+    def __init__(self, data=None):
+        self.raw = data or {}
+        self.lc_status = self.raw.get('LCStatus')
+        self.rt_status = self.raw.get('RTStatus')
+        self.server_status = self.raw.get('ServerStatus')
+        self.status = self.raw.get('Status')
+        self.timestamp = time.monotonic()
+
+    @property
+    def age(self):
+        """Time in seconds since the status was retrieved."""
+        return time.monotonic() - self.timestamp
+
+    def is_ready(self, status_field):
+        """Checks remote service status field
+
+        :param status_field: Status field to check, e.g., LCStatus, RTStatus
+        :returns: True if status field is Ready, otherwise False.
+        """
+        return self.raw.get(status_field) == _READY_STATUS
+
+    @property
+    def lc_ready(self):
+        """Whether the Lifecycle Controller is ready."""
+        return self.is_ready('LCStatus')
+
+    @property
+    def rt_ready(self):
+        """Whether real-time operations are ready to be accepted."""
+        return self.is_ready('RTStatus')
+
+
 class DellLCService(base.ResourceBase):
 
     _actions = ActionsField('Actions')
     _OK_STATUS_CODE = 200
-    _READY_STATUS = 'Ready'
     identity = base.Field('Id', required=True)
 
+    status_ttl = REMOTE_SERVICES_STATUS_TTL
+    """Time in seconds a remote services API status is reused for"""
+
+    _remote_services_api_status = None
+
     def __init__(self, connector, identity, redfish_version=None,
                  registries=None):
         """A class representing a DellLCService.
@@ -46,34 +96,52 @@ class DellLCService(base.ResourceBase):
         super(DellLCService, self).__init__(
             connector, identity, redfish_version, registries)
 
-    def _is_remote_service_api_status_ready(self, status_field):
-        """Checks remote service status field
+    def _do_refresh(self, force):
+        self._remote_services_api_status = None
 
-        :param status_field: Status field to check, e.g., LCStatus, RTStatus
-        :returns: True if response returned and status field is Ready,
-            otherwise False.
+    def get_remote_services_api_status(self, max_age=None):
+        """Get the remote services API status of the iDRAC.
+
+        All statuses come from a single GetRemoteServicesAPIStatus call,
+        whose result is reused for `status_ttl` seconds.
+
+        :param max_age: Maximum age in seconds of a reused status, 0 to
+            always ask the iDRAC. Defaults to `status_ttl`.
+        :returns: `RemoteServicesAPIStatus` instance.
         """
+        if max_age is None:
+            max_age = self.status_ttl
+
+        status = self._remote_services_api_status
+        if status is not None and status.age < max_age:
+            return status
+
         target_uri = self._actions.remote_service_api_status.target_uri
         response = self._conn.post(target_uri, data={})
-        if response.status_code != self._OK_STATUS_CODE:
-            return False
-        data = response.json()
-        return data[status_field] == self._READY_STATUS
+        status = RemoteServicesAPIStatus(
+            response.json()
+            if response.status_code == self._OK_STATUS_CODE else None)
+        self._remote_services_api_status = status
+        return status
 
-    def is_idrac_ready(self):
+    def is_idrac_ready(self, max_age=None):
         """Indicates if the iDRAC is ready to accept commands.
 
+        :param max_age: Maximum age in seconds of a reused status, see
+            `get_remote_services_api_status`.
         :returns: A boolean value True/False based on remote service api status
             response.
         """
         LOG.debug('Checking to see if the iDRAC is ready...')
-        return self._is_remote_service_api_status_ready('LCStatus')
+        return self.get_remote_services_api_status(max_age).lc_ready
 
-    def is_realtime_ready(self):
+    def is_realtime_ready(self, max_age=None):
         """Indicates if real-time operations are ready to be accepted.
 
+        :param max_age: Maximum age in seconds of a reused status, see
+            `get_remote_services_api_status`.
         :returns: True if ready to accept real-time operations, otherwise
             false.
         """
         LOG.debug('Checking to see if the real-time operations are ready...')
-        return self._is_remote_service_api_status_ready('RTStatus')
+        return self.get_remote_services_api_status(max_age).rt_ready
@@ -14,7 +14,6 @@
 
 import json
 import logging
-import subprocess
 import time
 from urllib.parse import urlparse
 
@@ -22,20 +21,28 @@ import sushy
 from sushy.resources import base
 from sushy.resources import common
 from sushy.resources.oem import base as oem_base
-from sushy.taskmonitor import TaskMonitor
 from sushy import utils as sushy_utils
 
 from sushy_oem_idrac import asynchronous
 from sushy_oem_idrac import constants
 from sushy_oem_idrac.resources.manager import constants as mgr_cons
-from sushy_oem_idrac.resources.manager import idrac_card_service
-from sushy_oem_idrac.resources.manager import job_collection
-from sushy_oem_idrac.resources.manager import job_service
-from sushy_oem_idrac.resources.manager import lifecycle_service
 from sushy_oem_idrac import utils
 
 LOG = logging.getLogger(__name__)
 
+# Only needed by some code paths, imported on first use
+taskmonitor = utils.lazy_import('sushy.taskmonitor')
+idrac_card_service = utils.lazy_import(
+    'sushy_oem_idrac.resources.manager.idrac_card_service')
+job_collection = utils.lazy_import(
+    'sushy_oem_idrac.resources.manager.job_collection')
+job_service = utils.lazy_import(
+    'sushy_oem_idrac.resources.manager.job_service')
+lifecycle_service = utils.lazy_import(
+    'sushy_oem_idrac.resources.manager.lifecycle_service')
+readiness = utils.lazy_import('sushy_oem_idrac.resources.manager.readiness')
+scp = utils.lazy_import('sushy_oem_idrac.resources.manager.scp')
+
 # System Configuration Tag Constant
 _SYSTEM_CONFIG_TAG = "SystemConfiguration"
 
@@ -48,6 +55,37 @@ _DESTRUCTIVE_CONF_KEYS = {
         ('IPv4Static', 'IPv6Static', 'IPv4.1#Enable', 'IPv4.1#DHCPEnable',
          'IPv6.1#Enable', 'IPv6.1#AutoConfig')}
 
+# Earliest iDRAC firmware booting virtual media on the standard Cd boot
+# override target. Older ones allow it too, but boot a physical drive.
+BOOT_OVERRIDE_MIN_FIRMWARE = (6, 0)
+
+# Whether the standard boot override works, by iDRAC firmware version
+_boot_override_support = {}
+
+
+def _parse_firmware_version(version):
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except ValueError:
+        return None
+
+
+def _remove_destructive_fields(response):
+    """Remove destructive settings from a JSON SCP export response.
+
+    The document is rewritten as a whole, keeping all other members
+    where they are, so the streaming `scp.ExportReader` is not used here.
+    """
+    conf = response.json()
+    if _SYSTEM_CONFIG_TAG in conf:
+        for component in conf[_SYSTEM_CONFIG_TAG]['Components']:
+            prefixes = _DESTRUCTIVE_CONF_KEYS.get(component['FQDD'])
+            if prefixes:
+                component['Attributes'] = [
+                    attribute for attribute in component['Attributes']
+                    if not attribute.get('Name').startswith(prefixes)]
+    response._content = json.dumps(conf).encode()
+
 
 class SharedParameters(base.CompositeField):
     allowed_target_values = base.Field('Target@Redfish.AllowableValues')
@@ -87,45 +125,19 @@ class DellManagerExtension(oem_base.OEMResourceBase):
         'ImportBuffer': None
     }
 
-    # NOTE(etingof): iDRAC job would fail if this XML has
-    # insignificant whitespaces
-
-    IDRAC_CONFIG_CD = """\
-<SystemConfiguration>\
-<Component FQDD="%s">\
-<Attribute Name="ServerBoot.1#BootOnce">\
-%s\
-</Attribute>\
-<Attribute Name="ServerBoot.1#FirstBootDevice">\
-VCD-DVD\
-</Attribute>\
-</Component>\
-</SystemConfiguration>\
-"""
-
-    IDRAC_CONFIG_FLOPPY = """\
-<SystemConfiguration>\
-<Component FQDD="%s">\
-<Attribute Name="ServerBoot.1#BootOnce">\
-%s\
-</Attribute>\
-<Attribute Name="ServerBoot.1#FirstBootDevice">\
-VFDD\
-</Attribute>\
-</Component>\
-</SystemConfiguration>\
-"""
-
-    IDRAC_MEDIA_TYPES = {
-        sushy.VIRTUAL_MEDIA_FLOPPY: IDRAC_CONFIG_FLOPPY,
-        sushy.VIRTUAL_MEDIA_CD: IDRAC_CONFIG_CD
+    # ServerBoot.1#FirstBootDevice values of the devices
+    IDRAC_BOOT_DEVICES = {
+        sushy.VIRTUAL_MEDIA_FLOPPY: 'VFDD',
+        sushy.VIRTUAL_MEDIA_CD: 'VCD-DVD'
     }
 
     RETRY_COUNT = 35
     RETRY_DELAY = 15
 
-    _IDRAC_IS_READY_RETRIES = 96
-    _IDRAC_IS_READY_RETRY_DELAY_SEC = 10
+    # Delays between checks of the job queue while a job blocks importing
+    JOB_QUEUE_POLL_POLICY = asynchronous.ExponentialPollPolicy(
+        initial=1, factor=1.5, max_delay=RETRY_DELAY, jitter=0.1,
+        honor_retry_after=False)
 
     @property
     def import_system_configuration_uri(self):
@@ -187,35 +199,53 @@ VFDD\
             self._conn, path, self.redfish_version, self.registries)
 
     def set_virtual_boot_device(self, device, persistent=False,
-                                manager=None, system=None):
+                                manager=None, system=None,
+                                skip_if_set=False):
         """Set boot device for a node.
 
         Dell iDRAC Redfish implementation does not support setting
-        boot device to virtual media via standard Redfish means.
-        However, this still can be done via an OEM extension.
+        boot device to virtual media via standard Redfish means before
+        firmware 6.00. This still can be done via an OEM extension, by
+        importing a system configuration, which takes a job. On newer
+        firmware, and given the system, virtual CD is set through the
+        standard boot override instead.
 
         :param device: Boot device. Values are vendor-specific.
         :param persistent: Whether to set next-boot, or make the change
             permanent. Default: False.
         :param manager: Manager of OEM extension. Optional.
         :param system: System of OEM extension. Optional.
-        :raises: InvalidParameterValue if Dell OEM extension can't
-            be used.
+        :param skip_if_set: Whether to check the current boot settings of
+            the iDRAC first, through a targeted export, and not import
+            them again if they match. Default: False.
+        :returns: Response of the configuration import, None if no import
+            job was submitted, as the device was set through the standard
+            boot override or, with `skip_if_set`, was set already.
+        :raises: InvalidParameterValueError if the device is not
+            supported.
         :raises: ExtensionError on failure to perform requested
             operation.
         """
-        try:
-            idrac_media = self.IDRAC_MEDIA_TYPES[device]
+        change_set = scp.ChangeSet()
+        self.add_virtual_boot_device(change_set, device,
+                                     persistent=persistent, manager=manager)
 
-        except KeyError:
-            raise sushy.exceptions.InvalidParameterValue(
-                error='Unknown or unsupported device %s' % device)
+        if (device == sushy.VIRTUAL_MEDIA_CD and system is not None
+                and self._set_boot_override(manager or self._parent_resource,
+                                            system, persistent)):
+            return
 
-        idrac_media = idrac_media % (
-            manager.identity if manager else self._parent_resource.identity,
-            'Disabled' if persistent else 'Enabled')
+        if skip_if_set:
+            fqdd, wanted = next(iter(change_set.components.items()))
+            current = self._get_server_boot_attributes(fqdd)
+            if current and all(current.get(name) == value
+                               for name, value in wanted.items()):
+                LOG.info('Boot device is %(device)s already, skipped '
+                         'importing it (persistent %(persistent)s)',
+                         {'device': device, 'persistent': persistent})
+                return
 
-        action_data = dict(self.ACTION_DATA, ImportBuffer=idrac_media)
+        action_data = dict(self.ACTION_DATA, ImportBuffer=change_set.to_xml())
 
         # TODO(etingof): figure out if on-time or persistent boot can at
         # all be implemented via this OEM call
@@ -229,7 +259,7 @@ VFDD\
                     self._conn, 'post',
                     self.import_system_configuration_uri,
                     data=action_data,
-                    sushy_task_poll_period=1)
+                    sushy_task_operation='import_system_configuration')
 
                 LOG.info("Set boot device to %(device)s via "
                          "Dell OEM magic spell (%(retries)d "
@@ -246,6 +276,7 @@ VFDD\
 
                 errors = exc.body and exc.body.get(
                     '@Message.ExtendedInfo') or []
+                job_running = False
 
                 for error in errors:
                     message_id = error.get('MessageId')
@@ -264,10 +295,17 @@ VFDD\
                             break
 
                     elif constants.IDRAC_JOB_RUNNING in message_id:
-                        pass
+                        job_running = True
 
                 else:
-                    time.sleep(self.RETRY_DELAY)
+                    # Retried as soon as the job queue is clear. Each wait
+                    # takes no longer than the fixed delay, which still
+                    # spaces retries out if the jobs keep running.
+                    started = time.monotonic()
+                    if not (job_running and self._wait_for_running_jobs(
+                            started + self.RETRY_DELAY)):
+                        time.sleep(max(0, self.RETRY_DELAY
+                                       - (time.monotonic() - started)))
 
                 if not attempts:
                     LOG.error('Too many (%d) retries, bailing '
@@ -276,6 +314,111 @@ VFDD\
 
                 attempts -= 1
 
+    def _set_boot_override(self, manager, system, persistent):
+        """Set virtual CD boot through the standard boot override.
+
+        Whether the firmware of the iDRAC supports it is remembered by
+        firmware version, including it rejecting the override.
+
+        :param manager: Manager of the iDRAC.
+        :param system: System to boot.
+        :param persistent: Whether to boot from virtual CD continuously.
+        :returns: True if set, False if the iDRAC does not support it.
+        """
+        firmware_version = manager.firmware_version
+        if not firmware_version:
+            return False
+
+        supported = _boot_override_support.get(firmware_version)
+        if supported is None:
+            version = _parse_firmware_version(firmware_version)
+            supported = (version is not None
+                         and version >= BOOT_OVERRIDE_MIN_FIRMWARE)
+            _boot_override_support[firmware_version] = supported
+
+        if not supported or sushy.BootSource.CD.value not in (
+                system.boot.allowed_values or ()):
+            return False
+
+        try:
+            system.set_system_boot_options(
+                target=sushy.BootSource.CD,
+                enabled=(sushy.BootSourceOverrideEnabled.CONTINUOUS
+                         if persistent
+                         else sushy.BootSourceOverrideEnabled.ONCE))
+
+        except sushy.exceptions.BadRequestError as exc:
+            LOG.warning('iDRAC firmware %(version)s rejected the standard '
+                        'virtual CD boot override, using the Dell OEM way '
+                        'instead: %(error)s',
+                        {'version': firmware_version, 'error': exc})
+            _boot_override_support[firmware_version] = False
+            return False
+
+        LOG.info('Set boot device to virtual CD via standard boot override '
+                 'on iDRAC firmware %s', firmware_version)
+        return True
+
+    def _get_server_boot_attributes(self, fqdd):
+        """Get the current ServerBoot attributes of the iDRAC.
+
+        :param fqdd: FQDD of the iDRAC component.
+        :returns: Dictionary mapping attribute name to value, None if the
+            configuration could not be exported.
+        """
+        try:
+            response = self._export_system_configuration(
+                mgr_cons.ExportTarget.IDRAC)
+
+        except sushy.exceptions.SushyError as exc:
+            LOG.warning('Could not export iDRAC configuration to check '
+                        'the boot device: %s', exc)
+            return
+
+        if response.status_code != _RESPONSE_OK_CODE:
+            return
+
+        configuration = scp.Configuration.from_response(response)
+        component = (configuration.get_component(fqdd)
+                     if configuration is not None else None)
+        if component is None:
+            return {}
+
+        return {attribute.name: attribute.value
+                for attribute in component.find('ServerBoot.1#')}
+
+    def _wait_for_running_jobs(self, give_up_at):
+        """Wait for the jobs running on the iDRAC to finish.
+
+        :param give_up_at: Monotonic time to stop waiting at.
+        :returns: True once no jobs are running, including when the queue
+            is already clear, False if jobs are still running at
+            `give_up_at`, None if the job queue could not be read.
+        """
+        attempt = 0
+        while True:
+            try:
+                running_jobs = self.job_collection.get_running_jobs()
+
+            except (sushy.exceptions.SushyError, KeyError) as exc:
+                LOG.debug('Cannot check iDRAC job queue: %s', exc)
+                return None
+
+            if not running_jobs:
+                return True
+
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            delay = min(self.JOB_QUEUE_POLL_POLICY.get_delay(attempt),
+                        remaining)
+            LOG.debug('Waiting %(delay).1fs for running iDRAC jobs '
+                      '%(jobs)s to finish', {'delay': delay,
+                                             'jobs': running_jobs})
+            time.sleep(delay)
+            attempt += 1
+
     def get_allowed_export_target_values(self):
         """Get the allowed targets of export system configuration.
 
@@ -399,7 +542,8 @@ VFDD\
                 self._conn,
                 'post',
                 self.export_system_configuration_uri,
-                data=action_data)
+                data=action_data,
+                sushy_task_operation='export_system_configuration')
 
             LOG.info("Successfully exported system configuration "
                      "for %(target)s", {'target': target})
@@ -435,17 +579,7 @@ VFDD\
 
         if (response.status_code == _RESPONSE_OK_CODE
                 and not include_destructive_fields):
-            conf = response.json()
-            if _SYSTEM_CONFIG_TAG in conf.keys():
-                for fqdd, values in _DESTRUCTIVE_CONF_KEYS.items():
-                    for comp in conf[_SYSTEM_CONFIG_TAG]['Components']:
-                        if comp['FQDD'] == fqdd:
-                            attributes_copy = comp['Attributes'].copy()
-                            for child in comp['Attributes']:
-                                if child.get('Name').startswith(values):
-                                    attributes_copy.remove(child)
-                            comp['Attributes'] = attributes_copy
-            response._content = json.dumps(conf).encode()
+            _remove_destructive_fields(response)
 
         return response
 
@@ -471,15 +605,12 @@ VFDD\
             raise sushy.exceptions.ExtensionError(error=error)
         # Parse the exported system configuration for the NIC
         # ports that are set to PXE boot
-        json_data = nic_settings.json()
-        if _SYSTEM_CONFIG_TAG in json_data.keys():
-            for root in json_data[_SYSTEM_CONFIG_TAG]['Components']:
-                nic_id = root['FQDD']
-                for child in root['Attributes']:
-                    if child.get('Name') == "LegacyBootProto":
-                        if child['Value'] == "PXE":
-                            mac_address = ethernet_interfaces_mac[nic_id]
-                            pxe_port_macs.append(mac_address)
+        configuration = scp.Configuration.from_response(nic_settings)
+        if configuration is not None:
+            for component in configuration:
+                if component.get_value("LegacyBootProto") == "PXE":
+                    mac_address = ethernet_interfaces_mac[component.fqdd]
+                    pxe_port_macs.append(mac_address)
             return pxe_port_macs
 
         else:
@@ -528,16 +659,77 @@ VFDD\
         response = self._conn.post(self.import_system_configuration_uri,
                                    data=action_data)
 
-        return TaskMonitor.from_response(
+        return taskmonitor.TaskMonitor.from_response(
             self._conn, response, self.import_system_configuration_uri)
 
-    def reset_idrac(self, wait=True, ready_wait_time=60):
+    def create_change_set(self):
+        """Create a set of configuration changes to import at once.
+
+        :returns: Empty `scp.ChangeSet` instance.
+        """
+        return scp.ChangeSet()
+
+    def add_virtual_boot_device(self, change_set, device, persistent=False,
+                                manager=None):
+        """Add setting the virtual boot device to a change set.
+
+        Unlike `set_virtual_boot_device`, nothing gets submitted until the
+        change set is imported with `import_change_set`.
+
+        :param change_set: `scp.ChangeSet` to add the changes to.
+        :param device: Boot device. Values are vendor-specific.
+        :param persistent: Whether to set next-boot, or make the change
+            permanent. Default: False.
+        :param manager: Manager of OEM extension. Optional.
+        :raises: InvalidParameterValueError if the device is not supported.
+        """
+        try:
+            first_boot_device = self.IDRAC_BOOT_DEVICES[device]
+
+        except KeyError:
+            raise sushy.exceptions.InvalidParameterValueError(
+                parameter='device', value=device,
+                valid_values=list(self.IDRAC_BOOT_DEVICES))
+
+        change_set.set_attributes(
+            manager.identity if manager else self._parent_resource.identity,
+            {'ServerBoot.1#BootOnce': 'Disabled' if persistent else 'Enabled',
+             'ServerBoot.1#FirstBootDevice': first_boot_device})
+
+    def import_change_set(self, change_set):
+        """Import the changes of a change set as a single job.
+
+        Caller needs to handle system reboot separately.
+
+        :param change_set: `scp.ChangeSet` to import.
+        :returns: Task monitor instance to watch for task completion,
+            None if the change set is empty.
+        """
+        if not len(change_set):
+            LOG.debug('No configuration changes to import at %s', self.path)
+            return
+
+        LOG.info('Importing %(count)d configuration change(s) of '
+                 '%(components)s as one job',
+                 {'count': len(change_set),
+                  'components': ', '.join(change_set.components)})
+        return self.import_system_configuration(change_set.to_xml())
+
+    def reset_idrac(self, wait=True, ready_wait_time=None):
         """Reset the iDRAC and wait for it to become ready.
 
+        While waiting, the iDRAC is followed through going down, accepting
+        connections again, responding to Redfish requests and reporting
+        its Lifecycle Controller ready, checking each with short delays.
+
         :param wait: Whether to return immediately or wait for iDRAC to
             become operational.
-        :param ready_wait_time: Amount of time in seconds to wait before
-            starting to check on the iDRAC's status.
+        :param ready_wait_time: Ignored, kept for compatibility. There is
+            no fixed wait after the iDRAC becomes reachable anymore.
+        :returns: Dictionary mapping each phase of
+            `readiness.PHASES` to the time in seconds it took, None if
+            not waiting.
+        :raises: ExtensionError on timeout waiting for iDRAC.
         """
         self.idrac_card_service.reset_idrac()
         if not wait:
@@ -545,117 +737,7 @@ VFDD\
         host = urlparse(self._conn._url).netloc
         LOG.debug("iDRAC %(host)s was reset, "
                   "waiting for return to operational state", {'host': host})
-        self._wait_for_idrac(host, ready_wait_time)
-        self._wait_until_idrac_is_ready(host, self._IDRAC_IS_READY_RETRIES,
-                                        self._IDRAC_IS_READY_RETRY_DELAY_SEC)
-
-    def _wait_for_idrac_state(self, host, alive=True, ping_count=3,
-                              retries=24):
-        """Wait for iDRAC to become pingable or not pingable.
-
-        :param host: Hostname or IP of the iDRAC interface.
-        :param alive: True for pingable state and False for not pingable
-            state.
-        :param ping_count: Number of consecutive ping results, per
-            'alive', for success.
-        :param retries: Number of ping retries.
-        :returns: True on reaching specified host ping state; otherwise,
-            False.
-        """
-        if alive:
-            ping_type = "pingable"
-        else:
-            ping_type = "not pingable"
-        LOG.debug("Waiting for iDRAC %(host)s to become %(ping_type)s",
-                  {'host': host, 'ping_type': ping_type})
-        response_count = 0
-        while retries > 0:
-            response = self._ping_host(host)
-            retries -= 1
-            if response == alive:
-                response_count += 1
-                LOG.debug("iDRAC %(host)s is %(ping_type)s, "
-                          "count=%(response_count)s",
-                          {'host': host, 'ping_type': ping_type,
-                           'response_count': response_count})
-                if response_count == ping_count:
-                    LOG.debug("Reached specified %(alive)s count for iDRAC "
-                              "%(host)s", {'alive': alive, 'host': host})
-                    return True
-            else:
-                response_count = 0
-                if alive:
-                    LOG.debug("iDRAC %(host)s is still not pingable",
-                              {'host': host})
-                else:
-                    LOG.debug("iDRAC %(host)s is still pingable",
-                              {'host': host})
-            time.sleep(10)
-        return False
-
-    def _wait_for_idrac(self, host, post_pingable_wait_time):
-        """Wait for iDRAC to transition from unpingable to pingable.
-
-        :param host: Hostname or IP of the iDRAC interface.
-        :param post_pingable_wait_time: Amount of time in seconds to
-            wait after the host becomes pingable.
-        :raises: ExtensionError on failure to perform requested
-            operation.
-        """
-        state_reached = self._wait_for_idrac_state(
-            host, alive=False, ping_count=2, retries=24)
-        if not state_reached:
-            error_msg = ("Timed out waiting iDRAC %(host)s to become not "
-                         "pingable", {'host': host})
-            LOG.error(error_msg)
-            raise sushy.exceptions.ExtensionError(error=error_msg)
-        LOG.debug("iDRAC %(host)s has become not pingable", {'host': host})
-        state_reached = self._wait_for_idrac_state(host, alive=True,
-                                                   ping_count=3, retries=24)
-        if not state_reached:
-            error_msg = ("Timed out waiting iDRAC %(host)s to become pingable",
-                         {'host': host})
-            LOG.error(error_msg)
-            raise sushy.exceptions.ExtensionError(error=error_msg)
-        LOG.debug("iDRAC %(host)s has become pingable", {'host': host})
-        time.sleep(post_pingable_wait_time)
-
-    def _wait_until_idrac_is_ready(self, host, retries, retry_delay):
-        """Wait until the iDRAC is in a ready state.
-
-        :param host: Hostname or IP of the iDRAC interface.
-        :param retries: The number of times to check if the iDRAC is
-            ready.
-        :param retry_delay: The number of seconds to wait between
-            retries.
-        :raises: ExtensionError on failure to perform requested
-            operation.
-        """
-
-        while retries > 0:
-            LOG.debug("Checking to see if iDRAC %(host)s is ready",
-                      {'host': host})
-            if self.lifecycle_service.is_idrac_ready():
-                LOG.debug("iDRAC %(host)s is ready", {'host': host})
-                return
-            LOG.debug("iDRAC %(host)s is not ready", {'host': host})
-            retries -= 1
-            if retries > 0:
-                time.sleep(retry_delay)
-        if retries == 0:
-            error_msg = ("Timed out waiting iDRAC %(host)s to become "
-                         "ready after reset", {'host': host})
-            LOG.error(error_msg)
-            raise sushy.exceptions.ExtensionError(error=error_msg)
-
-    def _ping_host(self, host):
-        """Ping the hostname or IP of a host.
-
-        :param host: Hostname or IP.
-        :returns: True if host is alive; otherwise, False.
-        """
-        response = subprocess.call(["ping", "-c", "1", host])
-        return response == 0
+        return readiness.IdracReadiness(self, host).wait()
 
 
 def get_extension(*args, **kwargs):
@@ -0,0 +1,339 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import functools
+import heapq
+import itertools
+import logging
+import time
+from urllib.parse import urlparse
+
+import sushy
+
+from sushy_oem_idrac import asynchronous
+from sushy_oem_idrac import reachability
+from sushy_oem_idrac import utils
+
+LOG = logging.getLogger(__name__)
+
+# Only needed by some code paths, imported on first use
+futures = utils.lazy_import('concurrent.futures')
+
+# Phases an iDRAC goes through, in order, after being reset
+PHASE_DOWN = 'down'
+PHASE_TCP_OPEN = 'tcp_open'
+PHASE_REDFISH = 'redfish'
+PHASE_LC_READY = 'lc_ready'
+
+PHASES = (PHASE_DOWN, PHASE_TCP_OPEN, PHASE_REDFISH, PHASE_LC_READY)
+
+# Time, in seconds, each phase may take before giving up
+PHASE_TIMEOUTS = {
+    PHASE_DOWN: 240,
+    PHASE_TCP_OPEN: 240,
+    PHASE_REDFISH: 300,
+    PHASE_LC_READY: 960,
+}
+
+# Consecutive failed probes needed to tell the iDRAC went down, so that
+# a single lost probe of a still running iDRAC is not mistaken for it
+DOWN_CONFIRMATIONS = 2
+
+# Time, in seconds, to wait for the Redfish service root to answer
+REDFISH_TIMEOUT = 10
+
+# iDRACs reset and waited for at once by `reset_idracs`
+FLEET_MAX_RESETS = 32
+
+# Time, in seconds, between two resets issued by `reset_idracs`
+FLEET_STAGGER = 0.5
+
+# Threads issuing the Redfish requests of `reset_idracs`
+FLEET_WORKERS = 16
+
+POLL_POLICY = asynchronous.ExponentialPollPolicy(
+    initial=1, factor=1.5, max_delay=10, jitter=0.1,
+    honor_retry_after=False)
+
+_PHASE_STATES = {
+    PHASE_DOWN: 'not reachable',
+    PHASE_TCP_OPEN: 'accepting connections',
+    PHASE_REDFISH: 'responding to Redfish requests',
+    PHASE_LC_READY: 'ready',
+}
+
+
+class IdracReadiness(object):
+    """Follows an iDRAC being reset until it is ready again.
+
+    The iDRAC is expected to go through `PHASES` in turn: drop off the
+    network, accept connections on its Redfish port again, respond to
+    Redfish requests and finally report its Lifecycle Controller ready.
+    Each phase is checked with short delays growing per `poll_policy`,
+    and the time it took is recorded in `timings`.
+    """
+
+    def __init__(self, manager, host, poll_policy=POLL_POLICY,
+                 timeouts=None):
+        """A class representing the readiness of a resetting iDRAC
+
+        :param manager: `DellManagerExtension` of the iDRAC.
+        :param host: Hostname or IP of the iDRAC interface, optionally
+            followed by ``:port``.
+        :param poll_policy: `asynchronous.PollPolicy` deciding the delay
+            between checks within a phase.
+        :param timeouts: Dictionary overriding some of `PHASE_TIMEOUTS`.
+        """
+        self.manager = manager
+        self.host = host
+        self.poll_policy = poll_policy
+        self.timeouts = dict(PHASE_TIMEOUTS, **(timeouts or {}))
+        self.timings = {}
+        self.phase = PHASES[0]
+        self._attempt = 0
+        self._confirmations = 0
+        self._phase_started = time.monotonic()
+
+    @property
+    def done(self):
+        """Whether the iDRAC is ready."""
+        return self.phase is None
+
+    @property
+    def probes_host(self):
+        """Whether the current phase is checked by probing the host."""
+        return self.phase in (PHASE_DOWN, PHASE_TCP_OPEN)
+
+    @property
+    def port_open(self):
+        """Whether only accepted connections count as the host alive."""
+        return self.phase == PHASE_TCP_OPEN
+
+    def _is_redfish_responding(self):
+        try:
+            self.manager._conn.get('/redfish/v1/', timeout=REDFISH_TIMEOUT)
+        except sushy.exceptions.SushyError as exc:
+            LOG.debug('Redfish service of iDRAC %(host)s is not responding: '
+                      '%(error)s', {'host': self.host, 'error': exc})
+            return False
+        return True
+
+    def _is_lc_ready(self):
+        try:
+            return self.manager.lifecycle_service.is_idrac_ready(max_age=0)
+        except sushy.exceptions.SushyError as exc:
+            LOG.debug('Cannot get Lifecycle Controller status of iDRAC '
+                      '%(host)s: %(error)s', {'host': self.host, 'error': exc})
+            return False
+
+    def _is_phase_reached(self, reachable):
+        if self.phase == PHASE_DOWN:
+            self._confirmations = 0 if reachable else self._confirmations + 1
+            return self._confirmations >= DOWN_CONFIRMATIONS
+
+        if self.phase == PHASE_TCP_OPEN:
+            return reachable
+
+        if self.phase == PHASE_REDFISH:
+            return self._is_redfish_responding()
+
+        return self._is_lc_ready()
+
+    def step(self, reachable=None):
+        """Check the current phase, moving on to the next once reached.
+
+        :param reachable: Result of probing the host, for phases checked
+            that way, when the caller probed it already. Probed here when
+            None.
+        :returns: Delay in seconds before the next step, None once the
+            iDRAC is ready.
+        :raises: ExtensionError when the current phase times out.
+        """
+        if self.probes_host and reachable is None:
+            reachable = reachability.is_reachable(
+                self.host, port_open=self.port_open)
+
+        elapsed = time.monotonic() - self._phase_started
+        if self._is_phase_reached(reachable):
+            LOG.debug('iDRAC %(host)s is %(state)s after %(elapsed).1fs',
+                      {'host': self.host, 'state': _PHASE_STATES[self.phase],
+                       'elapsed': elapsed})
+            self.timings[self.phase] = elapsed
+
+            index = PHASES.index(self.phase) + 1
+            self.phase = PHASES[index] if index < len(PHASES) else None
+            self._attempt = 0
+            self._phase_started = time.monotonic()
+            return None if self.done else 0
+
+        remaining = self.timeouts[self.phase] - elapsed
+        if remaining <= 0:
+            error_msg = ('Timed out waiting iDRAC %(host)s to become '
+                         '%(state)s after reset' %
+                         {'host': self.host,
+                          'state': _PHASE_STATES[self.phase]})
+            LOG.error(error_msg)
+            raise sushy.exceptions.ExtensionError(error=error_msg)
+
+        delay = self.poll_policy.get_delay(self._attempt)
+        self._attempt += 1
+        return min(delay, remaining)
+
+    def wait(self):
+        """Step through the phases until the iDRAC is ready.
+
+        :returns: Dictionary mapping each phase to the time in seconds
+            it took.
+        :raises: ExtensionError when a phase times out.
+        """
+        delay = self.step()
+        while delay is not None:
+            if delay:
+                time.sleep(delay)
+            delay = self.step()
+
+        self._log_ready()
+        return self.timings
+
+    def _log_ready(self):
+        LOG.info('iDRAC %(host)s is ready after reset, phase timings: '
+                 '%(timings)s',
+                 {'host': self.host,
+                  'timings': ', '.join('%s %.1fs' % (phase,
+                                                     self.timings[phase])
+                                       for phase in PHASES)})
+
+
+def _get_host(manager):
+    return urlparse(manager._conn._url).netloc
+
+
+def reset_idracs(managers, max_resets=FLEET_MAX_RESETS,
+                 stagger=FLEET_STAGGER, workers=FLEET_WORKERS,
+                 poll_policy=POLL_POLICY, timeouts=None):
+    """Reset many iDRACs and wait for all of them to become ready.
+
+    Resets are issued `stagger` seconds apart, with at most `max_resets`
+    iDRACs being reset or waited for at any time. All iDRACs are followed
+    through `PHASES` by one shared loop: hosts due for a reachability
+    check are probed together, while Redfish requests are run by a pool
+    of `workers` threads. A failing iDRAC does not affect the others.
+
+    :param managers: Iterable of `DellManagerExtension` of the iDRACs.
+    :param max_resets: Maximum number of iDRACs in progress at once.
+    :param stagger: Minimum time in seconds between two resets.
+    :param workers: Number of threads issuing Redfish requests.
+    :param poll_policy: `asynchronous.PollPolicy` deciding the delay
+        between checks within a phase.
+    :param timeouts: Dictionary overriding some of `PHASE_TIMEOUTS`.
+    :returns: Dictionary mapping the host of each iDRAC to a dictionary
+        with 'timings', mapping the phases reached to the time in seconds
+        each took, and 'error', the exception the iDRAC failed with or
+        None if it is ready.
+    """
+    pending = collections.deque(managers)
+    results = {}
+    schedule = []
+    counter = itertools.count()
+    running = {}
+    in_progress = 0
+    next_reset = time.monotonic()
+
+    def _finish(host, waiter=None, error=None):
+        nonlocal in_progress
+        in_progress -= 1
+        results[host] = {'timings': dict(waiter.timings) if waiter else {},
+                         'error': error}
+        if error is None:
+            waiter._log_ready()
+
+    def _advance(waiter, step):
+        try:
+            delay = step()
+        except sushy.exceptions.SushyError as exc:
+            _finish(waiter.host, waiter, exc)
+            return
+
+        if delay is None:
+            _finish(waiter.host, waiter)
+        else:
+            heapq.heappush(schedule, (time.monotonic() + delay,
+                                      next(counter), waiter))
+
+    with futures.ThreadPoolExecutor(workers) as executor:
+        while pending or schedule or running:
+            now = time.monotonic()
+            while pending and in_progress < max_resets and now >= next_reset:
+                manager = pending.popleft()
+                future = executor.submit(
+                    manager.idrac_card_service.reset_idrac)
+                running[future] = manager
+                in_progress += 1
+                next_reset = now + stagger
+
+            # Group hosts due for a check by how they are checked, before
+            # stepping any of them into its next phase
+            probed = {False: [], True: []}
+            while schedule and schedule[0][0] <= now:
+                waiter = heapq.heappop(schedule)[2]
+                if waiter.probes_host:
+                    probed[waiter.port_open].append(waiter)
+                else:
+                    running[executor.submit(waiter.step)] = waiter
+
+            for port_open, waiters in probed.items():
+                if not waiters:
+                    continue
+
+                reachable = reachability.probe(
+                    [waiter.host for waiter in waiters], port_open=port_open)
+                for waiter in waiters:
+                    _advance(waiter, functools.partial(
+                        waiter.step, reachable[waiter.host]))
+
+            wakeups = [schedule[0][0]] if schedule else []
+            if pending and in_progress < max_resets:
+                wakeups.append(next_reset)
+            timeout = (max(0, min(wakeups) - time.monotonic())
+                       if wakeups else None)
+
+            if not running:
+                if timeout:
+                    time.sleep(timeout)
+                continue
+
+            done, _ = futures.wait(running, timeout=timeout,
+                                   return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                if isinstance(item, IdracReadiness):
+                    _advance(item, future.result)
+                    continue
+
+                host = _get_host(item)
+                try:
+                    future.result()
+                except sushy.exceptions.SushyError as exc:
+                    LOG.error('Failed to reset iDRAC %(host)s: %(error)s',
+                              {'host': host, 'error': exc})
+                    _finish(host, error=exc)
+                    continue
+
+                LOG.debug('iDRAC %(host)s was reset, waiting for return '
+                          'to operational state', {'host': host})
+                waiter = IdracReadiness(item, host, poll_policy=poll_policy,
+                                        timeouts=timeouts)
+                heapq.heappush(schedule, (time.monotonic(), next(counter),
+                                          waiter))
+
+    return results
@@ -0,0 +1,568 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import bisect
+import codecs
+import functools
+import itertools
+import json
+import re
+from xml.sax import saxutils
+
+# Formats of SCP documents
+FORMAT_XML = 'XML'
+FORMAT_JSON = 'JSON'
+
+# Compiled templates kept, one per format and set of components
+TEMPLATE_CACHE_SIZE = 256
+
+# Bytes of an export response parsed at a time
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_DECODER = json.JSONDecoder()
+_DELIMITERS = frozenset(',}] \t\n\r')
+
+# Members of exported attributes `Attribute` has a slot for
+_ATTRIBUTE_KEYS = frozenset(('Name', 'Value', 'Set On Import', 'Comment'))
+
+
+def _escape_xml(value):
+    return saxutils.escape(str(value))
+
+
+def _escape_json(value):
+    # The quotes come with the value, not with the template
+    return json.dumps(str(value))
+
+
+class Template(object):
+    """SCP document of fixed components and attributes, compiled once.
+
+    The document is rendered ahead of time with placeholders for the
+    values, so rendering it for a node takes escaping the values only.
+    Neither format holds insignificant whitespace, which would fail the
+    iDRAC job.
+    """
+
+    def __init__(self, layout, format=FORMAT_XML):
+        """A class representing a compiled SCP document
+
+        :param layout: Tuple of (FQDD, tuple of attribute names) pairs,
+            one per component, in document order.
+        :param format: `FORMAT_XML` or `FORMAT_JSON`.
+        :raises: ValueError on unknown format.
+        """
+        if format == FORMAT_XML:
+            skeleton = self._compile_xml(layout)
+            self._escape = _escape_xml
+        elif format == FORMAT_JSON:
+            skeleton = self._compile_json(layout)
+            self._escape = _escape_json
+        else:
+            raise ValueError('Unknown SCP format %s' % format)
+
+        self.layout = layout
+        self.format = format
+        self.size = sum(len(names) for _, names in layout)
+        self._skeleton = skeleton
+
+    @staticmethod
+    def _compile_xml(layout):
+        parts = ['<SystemConfiguration>']
+        for fqdd, names in layout:
+            parts.append('<Component FQDD=%s>' % saxutils.quoteattr(fqdd))
+            parts.extend('<Attribute Name=%s>\0</Attribute>'
+                         % saxutils.quoteattr(name) for name in names)
+            parts.append('</Component>')
+        parts.append('</SystemConfiguration>')
+        return ''.join(parts).replace('%', '%%').replace('\0', '%s')
+
+    @staticmethod
+    def _compile_json(layout):
+        # Placeholders go in as strings and get unquoted afterwards
+        doc = {'SystemConfiguration': {'Components': [
+            {'FQDD': fqdd, 'Attributes': [{'Name': name, 'Value': '\0'}
+                                          for name in names]}
+            for fqdd, names in layout]}}
+        skeleton = json.dumps(doc, separators=(',', ':'))
+        return skeleton.replace('%', '%%').replace('"\\u0000"', '%s')
+
+    def render(self, values):
+        """Render the document for some values.
+
+        :param values: Sequence of attribute values, in layout order.
+        :returns: Document as a string, to be used as an import buffer.
+        :raises: ValueError if the number of values does not match the
+            number of attributes.
+        """
+        if len(values) != self.size:
+            raise ValueError('Expected %d SCP attribute values, got %d'
+                             % (self.size, len(values)))
+        escape = self._escape
+        return self._skeleton % tuple(escape(value) for value in values)
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_template(layout, format=FORMAT_XML):
+    """Get the compiled template of a set of components.
+
+    :param layout: Tuple of (FQDD, tuple of attribute names) pairs.
+    :param format: `FORMAT_XML` or `FORMAT_JSON`.
+    :returns: `Template` instance, shared by callers of the same layout.
+    """
+    return Template(layout, format)
+
+
+class ChangeSet(object):
+    """Attribute changes of several components, imported at once.
+
+    The iDRAC runs each Server Configuration Profile (SCP) import as a
+    job of its own, one after the other. Changes collected here, e.g.
+    the virtual boot device, BIOS and NIC attributes, get rendered into
+    a single import buffer instead, taking a single job.
+    """
+
+    def __init__(self):
+        # Component FQDD to attribute name to value, in order of setting
+        self._components = {}
+
+    def __len__(self):
+        return sum(len(attributes)
+                   for attributes in self._components.values())
+
+    @property
+    def components(self):
+        """Dictionary mapping component FQDD to its attribute changes."""
+        return {fqdd: dict(attributes)
+                for fqdd, attributes in self._components.items()}
+
+    @property
+    def layout(self):
+        """Components and attribute names changed, as `Template` takes."""
+        return tuple((fqdd, tuple(attributes))
+                     for fqdd, attributes in self._components.items()
+                     if attributes)
+
+    def set_attribute(self, fqdd, name, value):
+        """Change an attribute of a component.
+
+        Setting an attribute again replaces the value set before.
+
+        :param fqdd: FQDD of the component, e.g. 'BIOS.Setup.1-1'.
+        :param name: Name of the attribute, e.g. 'BootMode'.
+        :param value: Value of the attribute.
+        """
+        self._components.setdefault(fqdd, {})[name] = value
+
+    def set_attributes(self, fqdd, attributes):
+        """Change attributes of a component.
+
+        :param fqdd: FQDD of the component.
+        :param attributes: Dictionary mapping attribute name to value.
+        """
+        self._components.setdefault(fqdd, {}).update(attributes)
+
+    def update(self, other):
+        """Merge the changes of another change set into this one.
+
+        :param other: `ChangeSet` whose values take precedence.
+        """
+        for fqdd, attributes in other._components.items():
+            self.set_attributes(fqdd, attributes)
+
+    def render(self, format=FORMAT_XML):
+        """Render the changes as an SCP import buffer.
+
+        Change sets of the same components and attributes share one
+        compiled template.
+
+        :param format: `FORMAT_XML` or `FORMAT_JSON`.
+        :returns: Document as a string.
+        """
+        return get_template(self.layout, format).render(
+            [value for attributes in self._components.values()
+             for value in attributes.values()])
+
+    def to_xml(self):
+        """Render the changes as an XML SCP import buffer."""
+        return self.render(FORMAT_XML)
+
+    def to_json(self):
+        """Render the changes as a JSON SCP import buffer."""
+        return self.render(FORMAT_JSON)
+
+
+class ExportReader(object):
+    """Incremental parser of JSON SCP exports.
+
+    Components of an export are parsed and handed out one at a time, so
+    that the document, which runs to megabytes for a full export, never
+    gets built in memory as a whole. Other members of the
+    SystemConfiguration object, such as Model or ServiceTag, are kept in
+    `header`.
+    """
+
+    def __init__(self, chunks):
+        """A class representing a JSON SCP export being parsed
+
+        :param chunks: Iterable of bytes, e.g. `response.iter_content()`.
+        """
+        self.header = {}
+        self.found = None
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    @classmethod
+    def from_response(cls, response, chunk_size=EXPORT_CHUNK_SIZE):
+        return cls(response.iter_content(chunk_size=chunk_size))
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                break
+        else:
+            text = self._decoder.decode(b'', final=True)
+            self._eof = True
+
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return bool(text)
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of SCP export')
+
+    def _next(self, expected):
+        char = self._peek()
+        if char not in expected:
+            raise ValueError('Expected one of %r in SCP export, got %r'
+                             % (expected, char))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+
+            except ValueError:
+                # Possibly cut short by the end of the chunk
+                if not self._fill():
+                    raise
+                continue
+
+            # Numbers and literals may go on in the next chunk, e.g. a
+            # number split right after its '.' or 'e' decodes short
+            if (self._eof or self._buffer[end - 1] in '"]}'
+                    or (end < len(self._buffer)
+                        and self._buffer[end] in _DELIMITERS)):
+                self._pos = end
+                return value
+
+            if not self._fill():
+                self._pos = end
+                return value
+
+    def _find_member(self, name, skipped=None):
+        """Move to the value of a member of the current object.
+
+        :param skipped: Dictionary to store members passed by into.
+        :returns: Whether the member was found.
+        """
+        if self._peek() == '}':
+            self._pos += 1
+            return False
+
+        while True:
+            key = self._value()
+            self._next(':')
+            if key == name:
+                return True
+
+            value = self._value()
+            if skipped is not None:
+                skipped[key] = value
+            if self._next(',}') == '}':
+                return False
+
+    def components(self):
+        """Parse the components of the export one at a time.
+
+        `found` tells, once done, whether the export holds a
+        SystemConfiguration at all.
+
+        :returns: Generator of component dictionaries, holding 'FQDD'
+            and 'Attributes'.
+        :raises: ValueError on malformed JSON.
+        """
+        self._next('{')
+        self.found = self._find_member('SystemConfiguration')
+        if not self.found:
+            return
+
+        self._next('{')
+        if not self._find_member('Components', self.header):
+            return
+
+        self._next('[')
+        if self._peek() == ']':
+            self._pos += 1
+        else:
+            while True:
+                yield self._value()
+                if self._next(',]') == ']':
+                    break
+
+        if self._next(',}') == ',':
+            self._find_member(None, self.header)
+
+    def attributes(self):
+        """Parse the attributes of the export one at a time.
+
+        :returns: Generator of (FQDD, attribute name, attribute value)
+            tuples.
+        :raises: ValueError on malformed JSON.
+        """
+        for component in self.components():
+            fqdd = component.get('FQDD')
+            for attribute in component.get('Attributes', ()):
+                yield fqdd, attribute.get('Name'), attribute.get('Value')
+
+
+class Attribute(object):
+    """Attribute of a component of an SCP export."""
+
+    __slots__ = ('name', 'value', 'set_on_import', 'comment', 'extra')
+
+    def __init__(self, name, value, set_on_import=None, comment=None,
+                 extra=None):
+        self.name = name
+        self.value = value
+        self.set_on_import = set_on_import
+        self.comment = comment
+        # Members of unknown meaning, None if there are none
+        self.extra = extra
+
+    def __repr__(self):
+        return '<Attribute %s=%r>' % (self.name, self.value)
+
+    @classmethod
+    def from_dict(cls, data):
+        extra = None
+        if not data.keys() <= _ATTRIBUTE_KEYS:
+            extra = {key: value for key, value in data.items()
+                     if key not in _ATTRIBUTE_KEYS}
+        return cls(data.get('Name'), data.get('Value'),
+                   data.get('Set On Import'), data.get('Comment'), extra)
+
+    def to_dict(self):
+        data = {'Name': self.name, 'Value': self.value}
+        if self.set_on_import is not None:
+            data['Set On Import'] = self.set_on_import
+        if self.comment is not None:
+            data['Comment'] = self.comment
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Component(object):
+    """Component of an SCP export, its attributes indexed by name."""
+
+    __slots__ = ('fqdd', 'extra', '_attributes', '_index', '_sorted_names')
+
+    def __init__(self, fqdd, attributes=(), extra=None):
+        """A class representing a component of an SCP export
+
+        :param fqdd: FQDD of the component.
+        :param attributes: Iterable of `Attribute`, in document order.
+        :param extra: Dictionary of other members of the component, e.g.
+            nested components, None if there are none.
+        """
+        self.fqdd = fqdd
+        self.extra = extra
+        self._attributes = list(attributes)
+        self._index = {}
+        for attribute in self._attributes:
+            # Lookups see the first of attributes named the same
+            self._index.setdefault(attribute.name, attribute)
+        # Built on the first prefix query
+        self._sorted_names = None
+
+    def __repr__(self):
+        return '<Component %s, %d attribute(s)>' % (self.fqdd, len(self))
+
+    def __len__(self):
+        return len(self._attributes)
+
+    def __iter__(self):
+        return iter(self._attributes)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def get(self, name, default=None):
+        """Get an attribute by name.
+
+        :returns: `Attribute` or `default` if there is none.
+        """
+        return self._index.get(name, default)
+
+    def get_value(self, name, default=None):
+        """Get the value of an attribute by name."""
+        attribute = self._index.get(name)
+        return default if attribute is None else attribute.value
+
+    def find(self, prefixes):
+        """Find attributes by the beginning of their names.
+
+        :param prefixes: String or tuple of strings, as `str.startswith`
+            takes.
+        :returns: List of `Attribute`, in document order.
+        """
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._index)
+
+        names = set()
+        for prefix in prefixes:
+            position = bisect.bisect_left(self._sorted_names, prefix)
+            for name in itertools.islice(self._sorted_names, position, None):
+                if not name.startswith(prefix):
+                    break
+                names.add(name)
+
+        return [a for a in self._attributes if a.name in names]
+
+    def remove(self, prefixes):
+        """Remove attributes by the beginning of their names.
+
+        :param prefixes: String or tuple of strings.
+        :returns: List of the `Attribute` removed.
+        """
+        removed = self.find(prefixes)
+        if removed:
+            names = {attribute.name for attribute in removed}
+            self._attributes = [a for a in self._attributes
+                                if a.name not in names]
+            for name in names:
+                del self._index[name]
+            self._sorted_names = None
+        return removed
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        fqdd = data.pop('FQDD', None)
+        attributes = [Attribute.from_dict(a)
+                      for a in data.pop('Attributes', ())]
+        return cls(fqdd, attributes, data or None)
+
+    def to_dict(self):
+        data = {'FQDD': self.fqdd,
+                'Attributes': [a.to_dict() for a in self._attributes]}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Configuration(object):
+    """Parsed SCP export, its components indexed by FQDD.
+
+    Consumers of an export can share one instance to look values up,
+    rather than each scanning the document.
+    """
+
+    def __init__(self, components=(), header=None):
+        """A class representing a parsed SCP export
+
+        :param components: Iterable of `Component`, in document order.
+        :param header: Dictionary of the other members of the
+            SystemConfiguration object, e.g. Model or ServiceTag.
+        """
+        self.header = header or {}
+        self._components = list(components)
+        self._index = {}
+        for component in self._components:
+            self._index.setdefault(component.fqdd, component)
+
+    def __len__(self):
+        return len(self._components)
+
+    def __iter__(self):
+        return iter(self._components)
+
+    def __contains__(self, fqdd):
+        return fqdd in self._index
+
+    def get_component(self, fqdd, default=None):
+        """Get a component by FQDD."""
+        return self._index.get(fqdd, default)
+
+    def get_value(self, fqdd, name, default=None):
+        """Get the value of an attribute of a component."""
+        component = self._index.get(fqdd)
+        if component is None:
+            return default
+        return component.get_value(name, default)
+
+    def find(self, prefixes):
+        """Find attributes of all components by the beginning of names.
+
+        :param prefixes: String or tuple of strings.
+        :returns: List of (`Component`, `Attribute`) tuples.
+        """
+        return [(component, attribute) for component in self
+                for attribute in component.find(prefixes)]
+
+    @classmethod
+    def from_reader(cls, reader):
+        """Build the configuration of an export while parsing it.
+
+        :param reader: `ExportReader` of the export.
+        :returns: `Configuration` instance, None if the export holds no
+            SystemConfiguration.
+        :raises: ValueError on malformed JSON.
+        """
+        components = [Component.from_dict(c) for c in reader.components()]
+        if reader.found:
+            return cls(components, reader.header)
+
+    @classmethod
+    def from_response(cls, response, chunk_size=EXPORT_CHUNK_SIZE):
+        return cls.from_reader(ExportReader.from_response(response,
+                                                          chunk_size))
+
+    def to_dict(self):
+        return {'SystemConfiguration': dict(
+            self.header,
+            Components=[component.to_dict() for component in self])}
+
+    def to_json(self):
+        """Serialize the configuration as a JSON SCP document."""
+        return json.dumps(self.to_dict())
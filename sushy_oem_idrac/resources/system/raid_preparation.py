@@ -0,0 +1,322 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+
+import sushy
+from sushy import exceptions
+from sushy import taskmonitor
+from sushy import utils as sushy_utils
+
+from sushy_oem_idrac.resources.system import constants as sys_cons
+from sushy_oem_idrac.resources.system.storage import constants as s_cons
+from sushy_oem_idrac.resources.system.storage import controller as oem_ctrl
+from sushy_oem_idrac.resources.system import system
+from sushy_oem_idrac.resources.taskservice import constants as ts_cons
+from sushy_oem_idrac import task_group
+from sushy_oem_idrac import utils
+
+LOG = logging.getLogger(__name__)
+
+# Only needed by some code paths, imported on first use
+futures = utils.lazy_import('concurrent.futures')
+
+# Kinds of steps of a plan, in the order they are submitted
+STEP_CONTROLLER_MODE = 'controller_mode'
+STEP_FOREIGN_CONFIG = 'clear_foreign_config'
+STEP_DISK_MODE = 'physical_disk_mode'
+
+# Time, in seconds, to wait for real time jobs clearing foreign
+# configuration before converting disks
+REALTIME_JOB_DEADLINE = 600
+
+# Controllers whose mode change is submitted at once
+CONTROLLER_WORKERS = 4
+
+
+def _is_boss(storage):
+    return any('BOSS' in c.name.upper() for c in storage.storage_controllers)
+
+
+def _get_controller_mode(controller):
+    try:
+        dell_controller = controller.get_oem_extension('Dell')
+    except exceptions.OEMExtensionNotFoundError:
+        return None
+    return dell_controller.dell_storage_controller.controller_mode
+
+
+def _is_realtime(task_monitor):
+    """Whether the job of a task runs without waiting for a reboot."""
+    task = task_monitor.task
+    if task is None:
+        # Not processing any more
+        return True
+
+    try:
+        job_type = task.get_oem_extension('Dell').job_type
+    except exceptions.OEMExtensionNotFoundError:
+        return False
+    return job_type == ts_cons.JobType.RT_NO_REBOOT_CONF
+
+
+def _needs_raid_mode(controller):
+    return _get_controller_mode(controller) not in (
+        None, s_cons.ControllerMode.RAID)
+
+
+def _convert_controller_to_raid(controller):
+    """Change the mode of a controller to RAID on reset.
+
+    :returns: `TaskMonitor` of the job or None if the service did not
+        create one.
+    """
+    conn = controller._conn
+    settings = controller._settings
+    uri = (settings.resource_uri if settings and settings.resource_uri
+           else controller.path)
+    payload = sushy_utils.process_apply_time_input(
+        oem_ctrl.get_controller_mode_payload(s_cons.ControllerMode.RAID),
+        sushy.ApplyTime.ON_RESET, None, None)
+
+    with utils.get_request_slots(conn):
+        # The ETag of the settings, as sushy commits settings with, taken
+        # from @Redfish.Settings of the controller if the service put it
+        # there, so that only settings changed since do not get overwritten
+        etag = settings._etag if settings else None
+        if not etag:
+            etag = conn.get(path=uri).headers.get('ETag')
+
+        response = conn.patch(uri, data=payload, etag=etag)
+
+    LOG.info('Converting controller %s to RAID mode on reset',
+             controller.identity)
+    if response.status_code == 202:
+        return taskmonitor.TaskMonitor.from_response(
+            conn, response, uri, controller.redfish_version,
+            controller.registries)
+
+
+def convert_controllers_to_raid(controllers, workers=CONTROLLER_WORKERS):
+    """Change the mode of storage controllers to RAID on next reset.
+
+    Controllers already in RAID mode, or without a mode such as BOSS,
+    are left alone. The PATCH requests of the others are issued in
+    parallel, each conditional on the ETag of the settings it changes.
+
+    :param controllers: Iterable of sushy `StorageController`.
+    :param workers: Number of threads issuing requests.
+    :returns: `task_group.TaskGroup` of the jobs, requiring a reboot if
+        any controller is converted.
+    """
+    controllers = [c for c in controllers if _needs_raid_mode(c)]
+    if len(controllers) < 2:
+        task_monitors = [_convert_controller_to_raid(c) for c in controllers]
+    else:
+        with futures.ThreadPoolExecutor(
+                min(workers, len(controllers))) as executor:
+            task_monitors = list(executor.map(_convert_controller_to_raid,
+                                              controllers))
+
+    return task_group.TaskGroup([m for m in task_monitors if m],
+                                reboot_required=bool(controllers))
+
+
+class RaidPreparationStep(object):
+    """A change a RAID preparation plan makes to one storage subsystem."""
+
+    def __init__(self, kind, storage, controller=None, drives=None,
+                 mode=None):
+        """A class representing a step of a RAID preparation plan
+
+        :param kind: One of `STEP_CONTROLLER_MODE`, `STEP_FOREIGN_CONFIG`
+            and `STEP_DISK_MODE`.
+        :param storage: `Storage` the step applies to.
+        :param controller: `StorageController` to convert, for
+            `STEP_CONTROLLER_MODE`.
+        :param drives: List of `Drive` to convert, for `STEP_DISK_MODE`.
+        :param mode: Target mode, `ControllerMode` or
+            `PhysicalDiskStateMode` depending on the kind.
+        """
+        self.kind = kind
+        self.storage = storage
+        self.controller = controller
+        self.drives = drives or []
+        self.mode = mode
+
+    def __str__(self):
+        if self.kind == STEP_CONTROLLER_MODE:
+            return ('Convert controller %s to %s mode on reset'
+                    % (self.storage.identity, self.mode.value))
+        if self.kind == STEP_FOREIGN_CONFIG:
+            return ('Clear foreign configuration of %s, if any'
+                    % self.storage.identity)
+        return ('Convert %d physical disk(s) of %s to %s: %s'
+                % (len(self.drives), self.storage.identity, self.mode.value,
+                   ', '.join(d.identity for d in self.drives)))
+
+
+class RaidPreparationPlan(object):
+    """Storage changes preparing a system for RAID, planned together.
+
+    Steps are submitted as jobs in order: controller mode changes, which
+    only apply on reset, then clearing foreign configuration and finally
+    physical disk mode changes. Jobs not running in real time are left
+    staged for one reboot to apply them all.
+
+    Storage whose controller mode changes gets no further steps, as its
+    disks can only be looked at in the new mode. Those are listed in
+    `deferred`, to be planned again after the reboot, so that converting
+    their disks as well takes a second pass and a second reboot.
+    """
+
+    def __init__(self, mode, steps, deferred=None):
+        """A class representing a RAID preparation plan
+
+        :param mode: `PhysicalDiskStateMode` the disks are converted to.
+        :param steps: List of `RaidPreparationStep`.
+        :param deferred: List of `Storage` to plan again after reboot.
+        """
+        self.mode = mode
+        self.steps = steps
+        self.deferred = deferred or []
+
+    @property
+    def empty(self):
+        """Whether there is nothing to submit."""
+        return not self.steps
+
+    @property
+    def needs_reboot(self):
+        """Whether a reboot is known to be needed ahead of submitting.
+
+        Other steps may need it as well, depending on whether their jobs
+        run in real time.
+        """
+        return any(step.kind == STEP_CONTROLLER_MODE for step in self.steps)
+
+    def __str__(self):
+        lines = ['%d. %s' % (index, step)
+                 for index, step in enumerate(self.steps, 1)]
+        lines.extend('Plan again after reboot: %s' % storage.identity
+                     for storage in self.deferred)
+        return '\n'.join(lines) or 'Nothing to do'
+
+    @classmethod
+    def create(cls, topology, mode=sys_cons.PhysicalDiskStateMode.RAID):
+        """Plan preparing the storage of a topology.
+
+        BOSS controllers are left alone, as neither their mode nor the
+        mode of their disks can be changed, nor their foreign
+        configuration cleared. Clearing foreign configuration is planned
+        unless all drives of the storage report they hold none.
+
+        :param topology: `StorageTopology` loaded with controllers.
+        :param mode: `PhysicalDiskStateMode` to convert the disks to.
+        :returns: `RaidPreparationPlan` instance.
+        """
+        steps = []
+        deferred = []
+        for storage in topology.storage:
+            if (not storage.storage_controllers or _is_boss(storage)
+                    or not storage.storage_controllers[0].raid_types):
+                continue
+
+            if mode == sys_cons.PhysicalDiskStateMode.RAID:
+                changes = [c for c in topology.get_controllers(storage)
+                           if _needs_raid_mode(c)]
+                if changes:
+                    steps.extend(RaidPreparationStep(
+                        STEP_CONTROLLER_MODE, storage, controller=c,
+                        mode=s_cons.ControllerMode.RAID) for c in changes)
+                    deferred.append(storage)
+                    continue
+
+            if topology.has_foreign_config(storage) is not False:
+                steps.append(RaidPreparationStep(STEP_FOREIGN_CONFIG,
+                                                 storage))
+
+            controller = storage.storage_controllers[0]
+            drives = system._filter_disks_not_in_mode(
+                {controller: list(topology.get_drives(storage))}, mode,
+                topology)[controller]
+            if drives:
+                steps.append(RaidPreparationStep(
+                    STEP_DISK_MODE, storage, drives=drives, mode=mode))
+
+        steps.sort(key=lambda step: (STEP_CONTROLLER_MODE,
+                                     STEP_FOREIGN_CONFIG,
+                                     STEP_DISK_MODE).index(step.kind))
+        return cls(mode, steps, deferred)
+
+    def apply(self, system_extension, reboot=False):
+        """Submit the jobs of the plan.
+
+        Real time jobs clearing foreign configuration are waited for
+        before any disk gets converted, staged jobs are left for the
+        reboot.
+
+        :param system_extension: `DellSystemExtension` of the system.
+        :param reboot: Whether to reboot the system, once, if any job
+            needs it.
+        :returns: Dictionary with 'task_monitors', the list of task
+            monitors of the submitted jobs, 'reboot_required', whether
+            some of them are staged until the system reboots,
+            'rebooted', whether the system was rebooted, and 'deferred',
+            the `deferred` storage of the plan, which needs planning and
+            applying again once the controller mode jobs are done.
+        """
+        LOG.info('Preparing storage for %s:\n%s', self.mode.value, self)
+        raid_service = system_extension.raid_service
+        blocking = []
+
+        controllers = [step.controller for step in self.steps
+                       if step.kind == STEP_CONTROLLER_MODE]
+        task_monitors = list(convert_controllers_to_raid(controllers))
+        staged = len(controllers)
+
+        for step in self.steps:
+            if step.kind == STEP_CONTROLLER_MODE:
+                continue
+
+            if step.kind == STEP_FOREIGN_CONFIG:
+                task_monitor = raid_service.clear_foreign_config(
+                    step.storage.identity)
+                if task_monitor and _is_realtime(task_monitor):
+                    blocking.append(task_monitor)
+
+            else:
+                if blocking:
+                    task_group.wait_for_tasks(
+                        blocking, deadline=REALTIME_JOB_DEADLINE)
+                    blocking = []
+
+                fqdds = [d.identity for d in step.drives]
+                if step.mode == sys_cons.PhysicalDiskStateMode.RAID:
+                    task_monitor = raid_service.convert_to_raid(fqdds)
+                else:
+                    task_monitor = raid_service.convert_to_nonraid(fqdds)
+
+            if task_monitor:
+                task_monitors.append(task_monitor)
+                if not _is_realtime(task_monitor):
+                    staged += 1
+
+        rebooted = False
+        if staged and reboot:
+            LOG.info('Rebooting to apply %d staged storage job(s)', staged)
+            utils.reboot_system(system_extension._parent_resource)
+            rebooted = True
+
+        return {'task_monitors': task_monitors,
+                'reboot_required': bool(staged), 'rebooted': rebooted,
+                'deferred': list(self.deferred)}
@@ -17,12 +17,18 @@ import logging
 from sushy import exceptions
 from sushy.resources import base
 from sushy.resources import common
-from sushy import taskmonitor
 
 from sushy_oem_idrac import constants
+from sushy_oem_idrac import utils
 
 LOG = logging.getLogger(__name__)
 
+# Only needed by some code paths, imported on first use
+taskmonitor = utils.lazy_import('sushy.taskmonitor')
+
+# URI of a TaskService task, as mandated by Redfish, by task ID
+_TASK_URI = '/redfish/v1/TaskService/Tasks/%s'
+
 
 class ActionsField(base.CompositeField):
     convert_to_raid = common.ActionField("#DellRaidService.ConvertToRAID")
@@ -130,6 +136,25 @@ class DellRaidService(base.ResourceBase):
                       % (response.url))
 
         task_id = location.split('/')[-1]
+
+        # iDRAC creates a TaskService task of the same ID as the Dell job
+        try:
+            return taskmonitor.TaskMonitor(
+                self._conn, _TASK_URI % task_id,
+                redfish_version=self.redfish_version,
+                registries=self.registries)
+        except exceptions.ResourceNotFoundError:
+            LOG.debug('Task %s not found at its usual URI, looking it up '
+                      'in TaskService', task_id)
+
+        return self._find_task_monitor(task_id)
+
+    def _find_task_monitor(self, task_id):
+        """Find task by its ID among all TaskService tasks
+
+        :param task_id: ID of the task
+        :returns: Sushy's TaskMonitor instance for TaskService task
+        """
         task = None
 
         for t in self.root.get_task_service().tasks.get_members():
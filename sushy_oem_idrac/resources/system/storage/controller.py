@@ -19,6 +19,19 @@ from sushy.resources.oem import base as oem_base
 from sushy_oem_idrac.resources.system.storage import constants as s_cons
 
 
+def get_controller_mode_payload(mode):
+    """Get the PATCH payload changing the mode of a controller
+
+    :param mode: `ControllerMode` to change to
+    :returns: dictionary to PATCH the controller settings with
+    """
+    return {
+        "Oem": {
+            "Dell": {
+                "DellStorageController": {
+                    "ControllerMode": mode.value}}}}
+
+
 class DellStorageController(base.CompositeField):
 
     controller_mode = base.MappedField('ControllerMode', s_cons.ControllerMode)
@@ -42,12 +55,7 @@ class DellStorageControllerExtension(oem_base.OEMResourceBase):
 
         # BOSS will have this empty, PERC will have something assigned
         if controller_mode and controller_mode != s_cons.ControllerMode.RAID:
-            patch = {
-                "Oem": {
-                    "Dell": {
-                        "DellStorageController": {
-                            "ControllerMode":
-                                s_cons.ControllerMode.RAID.value}}}}
+            patch = get_controller_mode_payload(s_cons.ControllerMode.RAID)
             return self._parent_resource.update(
                 patch, apply_time=sushy.ApplyTime.ON_RESET)
 
@@ -12,6 +12,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import logging
+import time
+
 import sushy
 from sushy import exceptions
 from sushy.resources.oem import base as oem_base
@@ -19,13 +22,38 @@ from sushy import utils as sushy_utils
 
 from sushy_oem_idrac.resources.system import constants as sys_cons
 from sushy_oem_idrac.resources.system import raid_service
+from sushy_oem_idrac import utils
+
+LOG = logging.getLogger(__name__)
+
+# Only needed by some code paths, imported on first use
+futures = utils.lazy_import('concurrent.futures')
+raid_preparation = utils.lazy_import(
+    'sushy_oem_idrac.resources.system.raid_preparation')
+storage_topology = utils.lazy_import(
+    'sushy_oem_idrac.resources.system.topology')
+
+# Controllers whose disks are submitted for conversion at once
+CONVERSION_WORKERS = 4
+
 
+def _get_volumes(drive, topology=None):
+    if topology is not None:
+        try:
+            return topology.get_volumes(drive)
+        except KeyError:
+            pass
 
-def _filter_disks_not_in_mode(controller_to_disks, mode):
+    return drive.volumes
+
+
+def _filter_disks_not_in_mode(controller_to_disks, mode, topology=None):
     """Filters disks that are not in requested mode
 
     :param controller_to_disks: dictionary of controllers and their drives
     :param mode: constants.PhysicalDiskStateMode
+    :param topology: `StorageTopology` to look volumes of drives up in.
+        Optional, if not provided, volumes are fetched for every drive.
     :returns: dictionary of controllers and their drives that need mode changed
     """
     sushy_raw_device = sushy.VOLUME_TYPE_RAW_DEVICE
@@ -35,7 +63,7 @@ def _filter_disks_not_in_mode(controller_to_disks, mode):
             is_raw_device = False
             volumes = None
             try:
-                volumes = drive.volumes
+                volumes = _get_volumes(drive, topology)
             except exceptions.MissingAttributeError:
                 pass
 
@@ -68,7 +96,20 @@ class DellSystemExtension(oem_base.OEMResourceBase):
             self._conn, path, redfish_version=self.redfish_version,
             registries=self.registries, root=self.root)
 
-    def change_physical_disk_state(self, mode, controller_to_disks=None):
+    def get_storage_topology(self):
+        """Load a snapshot of the storage of the system
+
+        Storage, drives and volumes are loaded together, so that the
+        snapshot can be passed to several operations on the system's
+        storage, e.g. `clear_foreign_config` and then
+        `change_physical_disk_state`, without loading them again.
+
+        :returns: `StorageTopology` instance
+        """
+        return storage_topology.StorageTopology.load(self._parent_resource)
+
+    def change_physical_disk_state(self, mode, controller_to_disks=None,
+                                   topology=None):
         """Converts physical disks RAID status
 
         Converts only those disks that are not already in requested mode.
@@ -77,11 +118,22 @@ class DellSystemExtension(oem_base.OEMResourceBase):
         :param controller_to_disks: dictionary of controllers and their drives.
             Optional, if not provided, processes all RAID, except BOSS,
             controller drives.
+        :param topology: `StorageTopology` of the system, as returned by
+            `get_storage_topology`, to look volumes of drives up in.
+            Optional, if not provided, it is loaded unless
+            `controller_to_disks` is given.
         :returns: List of task monitors for each controller's disks if any
-            drives need changes
+            drives need changes, which `task_group.wait_for_tasks` can
+            wait for together
+        :raises: The error of the first controller whose conversion could
+            not be submitted, once all others have been submitted. Its
+            `task_monitors` attribute holds the task monitors of those
+            that were, as their jobs are queued on the iDRAC regardless.
         """
         if not controller_to_disks:
-            controller_to_disks = self._get_controller_to_disks()
+            if topology is None:
+                topology = self.get_storage_topology()
+            controller_to_disks = self._get_controller_to_disks(topology)
 
         # Do not process BOSS controllers as can't convert their disks
         boss_controllers = [c for c in controller_to_disks
@@ -90,32 +142,79 @@ class DellSystemExtension(oem_base.OEMResourceBase):
             controller_to_disks.pop(c)
 
         controller_to_disks = _filter_disks_not_in_mode(
-            controller_to_disks, mode)
+            controller_to_disks, mode, topology)
 
         # Convert by each controller that have eligible disks
-        task_monitors = []
-        for controller, drives in controller_to_disks.items():
-            if drives:
-                drive_fqdds = [d.identity for d in drives]
-                if mode == sys_cons.PhysicalDiskStateMode.RAID:
-                    task_monitors.append(
-                        self.raid_service.convert_to_raid(drive_fqdds))
-                elif mode == sys_cons.PhysicalDiskStateMode.NONRAID:
-                    task_monitors.append(
-                        self.raid_service.convert_to_nonraid(drive_fqdds))
+        if mode == sys_cons.PhysicalDiskStateMode.RAID:
+            convert = self.raid_service.convert_to_raid
+        elif mode == sys_cons.PhysicalDiskStateMode.NONRAID:
+            convert = self.raid_service.convert_to_nonraid
+        else:
+            return []
+
+        conversions = [(controller, [d.identity for d in drives])
+                       for controller, drives in controller_to_disks.items()
+                       if drives]
+        slots = utils.get_request_slots(self._conn)
+
+        def _convert(conversion):
+            controller, drive_fqdds = conversion
+            start = time.monotonic()
+            try:
+                with slots:
+                    task_monitor = convert(drive_fqdds)
+
+            except Exception as exc:
+                LOG.error('Failed to submit conversion of %(count)d disk(s) '
+                          'of %(controller)s to %(mode)s: %(error)s',
+                          {'count': len(drive_fqdds),
+                           'controller': controller.name,
+                           'mode': mode.value, 'error': exc})
+                return None, exc
+
+            LOG.info('Submitted conversion of %(count)d disk(s) of '
+                     '%(controller)s to %(mode)s in %(elapsed).2fs',
+                     {'count': len(drive_fqdds), 'controller': controller.name,
+                      'mode': mode.value,
+                      'elapsed': time.monotonic() - start})
+            return task_monitor, None
+
+        # Every controller is submitted even if another one fails, as
+        # conversions submitted already can not be taken back
+        if len(conversions) < 2:
+            results = [_convert(conversion) for conversion in conversions]
+        else:
+            with futures.ThreadPoolExecutor(
+                    min(CONVERSION_WORKERS, len(conversions))) as executor:
+                results = list(executor.map(_convert, conversions))
+
+        task_monitors = [task_monitor for task_monitor, error in results
+                         if error is None]
+        errors = [error for _, error in results if error is not None]
+        if errors:
+            errors[0].task_monitors = task_monitors
+            raise errors[0]
 
         return task_monitors
 
-    def clear_foreign_config(self, storage_list=None):
+    def clear_foreign_config(self, storage_list=None, topology=None):
         """Clears foreign config on given controllers
 
         :param storage_list: List of storage objects, each of which
             corresponds to a controller
+        :param topology: `StorageTopology` of the system, as returned by
+            `get_storage_topology`, to take the storage list from and to
+            skip controllers whose drives report no foreign config.
+            Optional, if not provided, it is loaded unless `storage_list`
+            is given.
         :returns: List of task monitors, where each entry is for a
-            controller that has foreign config to clear
+            controller that has foreign config to clear, which
+            `task_group.wait_for_tasks` can wait for together
         """
         if storage_list is None:
-            storage_list = self._get_storage_list()
+            if topology is None:
+                topology = self.get_storage_topology()
+            storage_list = self._get_storage_list(topology)
 
         # Do not process BOSS controllers as not supporting clearing
         boss_storage = [s for s in storage_list
@@ -126,33 +225,103 @@ class DellSystemExtension(oem_base.OEMResourceBase):
 
         task_monitors = []
         for storage in storage_list:
+            # Only ask the iDRAC when drives do not tell
+            if (topology is not None
+                    and topology.has_foreign_config(storage) is False):
+                LOG.debug('No foreign config on %s, not clearing it',
+                          storage.identity)
+                continue
+
             task_mon = self.raid_service.clear_foreign_config(storage.identity)
             if task_mon:
                 task_monitors.append(task_mon)
 
         return task_monitors
 
-    def _get_controller_to_disks(self):
+    def convert_controllers_to_raid(self, topology=None):
+        """Converts all storage controllers not in RAID mode to RAID mode
+
+        Changes the mode of all controllers together, so that they are
+        applied by the same reboot.
+
+        :param topology: `StorageTopology` of the system, loaded with
+            controllers. Optional, if not provided, it is loaded.
+        :returns: `TaskGroup` of the jobs, to wait for after rebooting
+        """
+        if topology is None:
+            topology = storage_topology.StorageTopology.load(
+                self._parent_resource, controllers=True)
+
+        return raid_preparation.convert_controllers_to_raid(
+            [controller for storage in topology.storage
+             for controller in topology.get_controllers(storage)])
+
+    def plan_raid_preparation(
+            self, mode=sys_cons.PhysicalDiskStateMode.RAID, topology=None):
+        """Plans all storage changes preparing the system for RAID
+
+        Controller mode, foreign configuration and physical disk mode
+        changes are planned together, so that applying them takes one
+        reboot. Storage whose controller mode changes is left out of the
+        other changes and listed in the `deferred` of the plan, to be
+        planned again once that reboot has applied the new mode.
+
+        :param mode: constants.PhysicalDiskStateMode to convert disks to
+        :param topology: `StorageTopology` of the system, loaded with
+            controllers. Optional, if not provided, it is loaded.
+        :returns: `RaidPreparationPlan` instance, printable to report it
+        """
+        if topology is None:
+            topology = storage_topology.StorageTopology.load(
+                self._parent_resource, controllers=True)
+
+        return raid_preparation.RaidPreparationPlan.create(topology, mode)
+
+    def prepare_raid(self, plan=None, reboot=False):
+        """Prepares the system for RAID in one go
+
+        Submits the jobs of a plan, staging those that can not run in
+        real time so that a single reboot applies them all. If the plan
+        changes the mode of controllers, their disks are not converted
+        yet: once the jobs are done after the reboot, plan and prepare
+        again, which takes a second reboot if disks need converting.
+
+        :param plan: `RaidPreparationPlan` as returned by
+            `plan_raid_preparation`. Optional, if not provided, one
+            converting disks to RAID mode is made.
+        :param reboot: Whether to reboot the system if any job needs it
+        :returns: Dictionary with 'task_monitors' of the submitted jobs,
+            'reboot_required', 'rebooted' and 'deferred', the storage
+            left for another pass
+        """
+        if plan is None:
+            plan = self.plan_raid_preparation()
+
+        return plan.apply(self, reboot=reboot)
+
+    def _get_controller_to_disks(self, topology):
         """Gets all RAID controllers and their disks on system
 
+        :param topology: `StorageTopology` of the system
         :returns: dictionary of RAID controllers and their disks
         """
         controller_to_disks = {}
-        for storage in self._parent_resource.storage.get_members():
+        for storage in topology.storage:
             controller = (storage.storage_controllers[0]
                           if storage.storage_controllers else None)
             if not controller or controller and not controller.raid_types:
                 continue
-            controller_to_disks[controller] = storage.drives
+            controller_to_disks[controller] = topology.get_drives(storage)
         return controller_to_disks
 
-    def _get_storage_list(self):
+    def _get_storage_list(self, topology):
         """Gets all storage items corresponding to RAID controllers
 
+        :param topology: `StorageTopology` of the system
         :returns: list of storage items
         """
         storage_list = []
-        for storage in self._parent_resource.storage.get_members():
+        for storage in topology.storage:
             controller = (storage.storage_controllers[0]
                           if storage.storage_controllers else None)
             if not controller or controller and not controller.raid_types:
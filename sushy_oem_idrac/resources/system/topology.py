@@ -0,0 +1,312 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+
+from sushy import exceptions
+from sushy.resources.system.storage import controller as sushy_controller
+from sushy.resources.system.storage import drive as sushy_drive
+from sushy.resources.system.storage import storage as sushy_storage
+from sushy.resources.system.storage import volume as sushy_volume
+from sushy import utils as sushy_utils
+
+from sushy_oem_idrac import utils
+
+LOG = logging.getLogger(__name__)
+
+# Only needed by some code paths, imported on first use
+futures = utils.lazy_import('concurrent.futures')
+
+# Asks the service to embed the members of a collection in its response
+EXPAND_QUERY = '?$expand=.($levels=1)'
+
+# Threads fetching resources the service did not embed
+TOPOLOGY_WORKERS = 8
+
+# RAID status of drives holding a foreign configuration
+_FOREIGN_RAID_STATUS = 'Foreign'
+
+
+def _is_expanded(member):
+    return any(key != '@odata.id' for key in member)
+
+
+def _get_raid_status(drive):
+    doc = drive.json
+    if not isinstance(doc, dict):
+        return None
+
+    status = doc.get('Oem', {}).get('Dell', {}).get(
+        'DellPhysicalDisk', {}).get('RaidStatus')
+    return status if isinstance(status, str) else None
+
+
+def _supports_expand(root):
+    """Whether a service supports $expand, as far as it tells.
+
+    :param root: Sushy root of the service, if known.
+    :returns: False if the service tells it does not support expanding
+        the members of collections, True otherwise.
+    """
+    features = getattr(root, 'protocol_features_supported', None)
+    if features is None:
+        return True
+
+    expand = features.expand_query
+    return bool(expand) and (not isinstance(expand, dict)
+                             or expand.get('Levels') is not False)
+
+
+def _get_paths(links):
+    return [link['@odata.id'] for link in links or ()
+            if '@odata.id' in link]
+
+
+class _Loader(object):
+    """Fetches resources, embedded in their collection where possible.
+
+    Resources are fetched by up to `workers` threads, holding one of the
+    request slots of the iDRAC for each request. Collections are
+    requested with $expand unless the service does not support it,
+    including by rejecting the query.
+    """
+
+    def __init__(self, conn, workers, expand=True):
+        self._conn = conn
+        self._workers = workers
+        self._expand = expand
+        self._slots = utils.get_request_slots(conn)
+        self.docs = {}
+
+    def _get(self, path):
+        with self._slots:
+            return self._conn.get(path=path).json()
+
+    def _get_collection(self, path):
+        if self._expand:
+            try:
+                return self._get(path + EXPAND_QUERY)
+
+            except exceptions.HTTPError as exc:
+                LOG.debug('Requesting %(path)s expanded failed, requesting '
+                          'members individually: %(error)s',
+                          {'path': path, 'error': exc})
+                self._expand = False
+
+        return self._get(path)
+
+    def _map(self, func, items):
+        if len(items) < 2:
+            return [func(item) for item in items]
+
+        with futures.ThreadPoolExecutor(
+                min(self._workers, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def add(self, members):
+        """Keep the members already embedded in a response."""
+        for member in members or ():
+            if _is_expanded(member):
+                self.docs[member['@odata.id']] = member
+
+    def add_collections(self, paths):
+        """Fetch collections in parallel, keeping any members embedded.
+
+        :returns: List of the paths of the members of each collection.
+        """
+        member_paths = []
+        for collection in self._map(self._get_collection, paths):
+            members = collection.get('Members', [])
+            self.add(members)
+            member_paths.append(_get_paths(members))
+        return member_paths
+
+    def fetch(self, paths):
+        """Fetch the given resources not known yet, in parallel."""
+        missing = [path for path in dict.fromkeys(paths)
+                   if path not in self.docs]
+        if not missing:
+            return
+
+        LOG.debug('Fetching %d storage resources individually', len(missing))
+        self.docs.update(zip(missing, self._map(self._get, missing)))
+
+
+class StorageTopology(object):
+    """Snapshot of the storage of a system.
+
+    Holds the storage subsystems of a system along with their drives and
+    the volumes of those drives, loaded together so that they can be
+    looked at many times over within one operation without further
+    requests. Changes made to the storage afterwards are not reflected.
+    """
+
+    def __init__(self, storage, drives, volumes, controllers=None):
+        """A class representing the storage topology of a system
+
+        :param storage: List of `Storage` of the system.
+        :param drives: Dictionary mapping storage path to its list of
+            `Drive`.
+        :param volumes: Dictionary mapping drive path to its list of
+            `Volume`, None if the drive does not link volumes.
+        :param controllers: Dictionary mapping storage path to its list
+            of `StorageController`, if loaded.
+        """
+        self.storage = storage
+        self._drives = drives
+        self._volumes = volumes
+        self._controllers = controllers or {}
+
+    def get_controllers(self, storage):
+        """Get the controller resources of a storage subsystem.
+
+        :param storage: `Storage` from this snapshot.
+        :returns: List of `StorageController`, empty if the storage does
+            not link them.
+        :raises: KeyError if controllers were not loaded.
+        """
+        return self._controllers[storage.path]
+
+    def get_drives(self, storage):
+        """Get the drives of a storage subsystem.
+
+        :param storage: `Storage` from this snapshot.
+        :returns: List of `Drive`.
+        """
+        return self._drives[storage.path]
+
+    def has_foreign_config(self, storage):
+        """Tell from its drives whether a storage has foreign configuration.
+
+        :param storage: `Storage` from this snapshot.
+        :returns: True or False, None if not known as some drive does not
+            report its RAID status, e.g. with older iDRAC firmware, or
+            the storage is not part of this snapshot.
+        """
+        drives = self._drives.get(storage.path)
+        if drives is None:
+            return None
+
+        statuses = [_get_raid_status(drive) for drive in drives]
+        if _FOREIGN_RAID_STATUS in statuses:
+            return True
+        if None in statuses:
+            return None
+        return False
+
+    def get_volumes(self, drive):
+        """Get the volumes a drive is part of.
+
+        :param drive: `Drive` from this snapshot.
+        :returns: List of `Volume`.
+        :raises: MissingAttributeError if the drive does not link volumes,
+            as `Drive.volumes` does.
+        :raises: KeyError if the drive is not part of this snapshot.
+        """
+        volumes = self._volumes[drive.path]
+        if volumes is None:
+            raise exceptions.MissingAttributeError(
+                attribute='Links/Volumes', resource=drive.path)
+        return volumes
+
+    @classmethod
+    def load(cls, system, workers=TOPOLOGY_WORKERS, controllers=False):
+        """Load the storage topology of a system.
+
+        Collections are requested with $expand so that services
+        supporting it return their members at once. Any resource not
+        returned that way is then fetched, in parallel, with no more than
+        `utils.IDRAC_MAX_CONCURRENT_REQUESTS` requests to the iDRAC at
+        once, including those of other operations running alongside.
+
+        :param system: Sushy `System` instance.
+        :param workers: Number of threads fetching resources.
+        :param controllers: Whether to load the controller resources of
+            each storage as well.
+        :returns: `StorageTopology` instance.
+        """
+        conn = system._conn
+        kwargs = {'redfish_version': system.redfish_version,
+                  'registries': system.registries}
+        loader = _Loader(conn, workers, _supports_expand(system.root))
+
+        storage_paths, = loader.add_collections(
+            [sushy_utils.get_sub_resource_path_by(system, 'Storage')])
+        loader.fetch(storage_paths)
+
+        controller_paths = {}
+        if controllers:
+            collection_paths = {}
+            for path in storage_paths:
+                collection_paths[path] = loader.docs[path].get(
+                    'Controllers', {}).get('@odata.id')
+                controller_paths[path] = []
+            linked = [path for path in storage_paths
+                      if collection_paths[path]]
+            controller_paths.update(zip(linked, loader.add_collections(
+                [collection_paths[path] for path in linked])))
+            loader.fetch(path for paths in controller_paths.values()
+                         for path in paths)
+
+        drive_paths = {}
+        for path in storage_paths:
+            drives = loader.docs[path].get('Drives')
+            loader.add(drives)
+            drive_paths[path] = _get_paths(drives)
+        loader.fetch(path for paths in drive_paths.values() for path in paths)
+
+        volume_paths = {}
+        for paths in drive_paths.values():
+            for path in paths:
+                links = loader.docs[path].get('Links', {})
+                volume_paths[path] = (_get_paths(links['Volumes'])
+                                      if 'Volumes' in links else None)
+
+        needed = set()
+        for paths in volume_paths.values():
+            needed.update(paths or ())
+
+        # Volumes are most often listed in the collection of their storage
+        collection_paths = []
+        for path in storage_paths:
+            collection_path = loader.docs[path].get(
+                'Volumes', {}).get('@odata.id')
+            if collection_path and any(
+                    volume.startswith(collection_path + '/')
+                    for volume in needed):
+                collection_paths.append(collection_path)
+        loader.add_collections(collection_paths)
+        loader.fetch(needed)
+
+        volumes = {path: sushy_volume.Volume(
+            conn, path, json_doc=loader.docs[path], **kwargs)
+            for path in needed}
+        storage = []
+        drives = {}
+        for path in storage_paths:
+            storage.append(sushy_storage.Storage(
+                conn, path, json_doc=loader.docs[path], root=system.root,
+                **kwargs))
+            drives[path] = [sushy_drive.Drive(
+                conn, drive_path, json_doc=loader.docs[drive_path],
+                root=system.root, **kwargs)
+                for drive_path in drive_paths[path]]
+
+        controllers = {path: [sushy_controller.StorageController(
+            conn, controller_path, json_doc=loader.docs[controller_path],
+            root=system.root, **kwargs)
+            for controller_path in paths]
+            for path, paths in controller_paths.items()}
+
+        return cls(storage, drives, {
+            path: None if paths is None else [volumes[p] for p in paths]
+            for path, paths in volume_paths.items()}, controllers)
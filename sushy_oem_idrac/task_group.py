@@ -0,0 +1,255 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import logging
+import time
+from urllib.parse import urlparse
+
+import sushy
+
+from sushy_oem_idrac import asynchronous
+from sushy_oem_idrac.resources.taskservice import constants as ts_cons
+from sushy_oem_idrac import utils
+
+LOG = logging.getLogger(__name__)
+
+# Asks the service to embed the members of a collection in its response
+EXPAND_QUERY = '?$expand=.($levels=1)'
+
+POLL_POLICY = asynchronous.ExponentialPollPolicy(
+    initial=1, factor=1.5, max_delay=15, jitter=0.1)
+
+# Task states and Dell job states a task does not leave
+_FAILED_TASK_STATES = {'Cancelled', 'Exception', 'Interrupted', 'Killed'}
+_FINAL_TASK_STATES = _FAILED_TASK_STATES | {'Completed'}
+_FAILED_JOB_STATES = {ts_cons.JobState.FAILED.value,
+                      ts_cons.JobState.COMPLETED_ERRORS.value,
+                      ts_cons.JobState.REBOOT_FAILED.value}
+_FINAL_JOB_STATES = _FAILED_JOB_STATES | {ts_cons.JobState.COMPLETED.value}
+
+
+class TaskGroupError(sushy.exceptions.ExtensionError):
+    """A task of a group being waited for failed.
+
+    `location` holds the URI of the failed task and `results` the state
+    of all the tasks of the group, as returned by `wait_for_tasks`.
+    """
+
+    message = 'Task at %(location)s failed in state %(state)s: %(reason)s'
+
+    def __init__(self, location=None, state=None, reason=None,
+                 results=None):
+        self.location = location
+        self.results = results
+        super(TaskGroupError, self).__init__(
+            location=location, state=state, reason=reason)
+
+
+class TaskGroup(object):
+    """Task monitors of jobs submitted together, to wait for together."""
+
+    def __init__(self, task_monitors, reboot_required=False):
+        """A class representing a group of tasks
+
+        :param task_monitors: List of sushy `TaskMonitor`.
+        :param reboot_required: Whether the jobs only run once the
+            system reboots, in which case waiting makes sense afterwards
+            only.
+        """
+        self.task_monitors = task_monitors
+        self.reboot_required = reboot_required
+
+    def __len__(self):
+        return len(self.task_monitors)
+
+    def __iter__(self):
+        return iter(self.task_monitors)
+
+    def wait(self, **kwargs):
+        """Wait for all tasks of the group to finish.
+
+        Takes the arguments of `wait_for_tasks` but the task monitors.
+
+        :returns: Results as returned by `wait_for_tasks`.
+        """
+        return wait_for_tasks(self.task_monitors, **kwargs)
+
+
+def _get_job_state(doc):
+    return doc.get('Oem', {}).get('Dell', {}).get('JobState')
+
+
+def _get_message(doc):
+    message = doc.get('Oem', {}).get('Dell', {}).get('Message')
+    if message:
+        return message
+
+    messages = [m.get('Message') for m in doc.get('Messages', ())]
+    return '; '.join(m for m in messages if m) or None
+
+
+def _get_task_docs(conn, collection, paths, expand=True):
+    """Get the documents of some tasks of one iDRAC.
+
+    A single task is requested directly, several are requested through
+    their collection expanded. Tasks the collection does not embed, e.g.
+    as the service ignores $expand, are requested directly, as are all
+    of them if the service rejects the query.
+
+    :param expand: Whether to request the collection expanded.
+    :returns: Tuple of a dictionary mapping task path to its JSON
+        document and whether the service accepted $expand, None if not
+        tried.
+    """
+    docs = {}
+    expanded = None
+    with utils.get_request_slots(conn):
+        if expand and len(paths) > 1:
+            try:
+                members = conn.get(
+                    path=collection + EXPAND_QUERY).json().get('Members', [])
+
+            except sushy.exceptions.HTTPError as exc:
+                LOG.debug('Requesting tasks of %(collection)s expanded '
+                          'failed, requesting them individually: %(error)s',
+                          {'collection': collection, 'error': exc})
+                expanded = False
+
+            else:
+                docs.update((member['@odata.id'], member)
+                            for member in members
+                            if '@odata.id' in member and len(member) > 1)
+                expanded = True
+
+        for path in paths:
+            if path not in docs:
+                docs[path] = conn.get(path=path).json()
+
+    return docs, expanded
+
+
+def wait_for_tasks(task_monitors, deadline=None, poll_policy=POLL_POLICY,
+                   cancel=None):
+    """Wait for a group of iDRAC tasks to finish.
+
+    Meant for the task monitors returned together by operations such as
+    `DellSystemExtension.change_physical_disk_state` or
+    `clear_foreign_config`. Each poll cycle requests the pending tasks of
+    one iDRAC at once, through their expanded collection, rather than
+    each task on its own. Waiting stops as soon as a task fails.
+
+    :param task_monitors: Iterable of sushy `TaskMonitor` of the tasks.
+    :param deadline: Seconds to wait for at most, unlimited if None.
+    :param poll_policy: `asynchronous.PollPolicy` deciding the delay
+        between poll cycles.
+    :param cancel: `threading.Event` aborting the wait once set.
+    :returns: Dictionary mapping the URI of each task to a dictionary
+        with 'task_state' and 'job_state', as last reported by the iDRAC,
+        'message' and 'elapsed', seconds it took the task to finish or
+        None while it has not.
+    :raises: TaskGroupError on the first task failing, reporting the
+        results so far.
+    :raises: TaskTimeoutError when the deadline passes or the wait gets
+        cancelled, with `results` holding the results so far.
+    """
+    start = time.monotonic()
+    groups = {}
+    results = {}
+    for monitor in task_monitors:
+        path = urlparse(monitor.task_monitor_uri).path
+        conn = monitor._connector
+        key = (asynchronous._get_host(conn), path.rsplit('/', 1)[0])
+        groups.setdefault(key, (conn, []))[1].append(path)
+        results[path] = {'task_state': None, 'job_state': None,
+                         'message': None, 'elapsed': None}
+
+    # Task collections rejecting $expand
+    unexpandable = set()
+    attempt = 0
+    while True:
+        failed = None
+        for key, (conn, paths) in groups.items():
+            host = key[0]
+            pending = [path for path in paths
+                       if results[path]['elapsed'] is None]
+            if not pending:
+                continue
+
+            docs, expanded = _get_task_docs(
+                conn, key[1], pending, expand=key not in unexpandable)
+            if expanded is False:
+                unexpandable.add(key)
+            elapsed = time.monotonic() - start
+            for path in pending:
+                result = results[path]
+                result.update(task_state=docs[path].get('TaskState'),
+                              job_state=_get_job_state(docs[path]),
+                              message=_get_message(docs[path]))
+
+                if (result['task_state'] in _FINAL_TASK_STATES
+                        or result['job_state'] in _FINAL_JOB_STATES):
+                    result['elapsed'] = elapsed
+                    LOG.debug('Task %(task)s at %(host)s finished in state '
+                              '%(state)s after %(elapsed).1fs',
+                              {'task': path, 'host': host,
+                               'state': result['job_state']
+                               or result['task_state'],
+                               'elapsed': elapsed})
+
+                if failed is None and (
+                        result['task_state'] in _FAILED_TASK_STATES
+                        or result['job_state'] in _FAILED_JOB_STATES):
+                    failed = path
+
+        if failed is not None:
+            result = results[failed]
+            error = TaskGroupError(
+                location=failed,
+                state=result['job_state'] or result['task_state'],
+                reason=result['message'], results=results)
+            LOG.error(error)
+            raise error
+
+        pending = [path for path, result in results.items()
+                   if result['elapsed'] is None]
+        if not pending:
+            LOG.info('Tasks finished, timings: %s',
+                     ', '.join('%s %.1fs' % (path, result['elapsed'])
+                               for path, result in results.items()))
+            return results
+
+        reason = None
+        remaining = None
+        if cancel is not None and cancel.is_set():
+            reason = 'cancelled'
+        elif deadline is not None:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                reason = 'deadline exceeded'
+
+        if reason is not None:
+            error = asynchronous.TaskTimeoutError(
+                location=', '.join(pending), reason=reason)
+            error.results = results
+            raise error
+
+        delay = poll_policy.get_delay(attempt)
+        attempt += 1
+        if remaining is not None:
+            delay = min(delay, remaining)
+
+        LOG.debug('Waiting %(delay).1fs for %(count)d pending task(s)',
+                  {'delay': delay, 'count': len(pending)})
+        if cancel is None:
+            time.sleep(delay)
+        else:
+            cancel.wait(delay)
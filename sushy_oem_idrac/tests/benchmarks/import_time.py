@@ -0,0 +1,63 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure how long loading each sushy OEM entry point takes.
+
+Every sample imports the entry point in a fresh interpreter, after sushy
+itself has been imported, as it would be by sushy's OEM lookup.
+
+    python -m sushy_oem_idrac.tests.benchmarks.import_time [samples]
+"""
+
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = (
+    'sushy_oem_idrac.resources.manager.manager',
+    'sushy_oem_idrac.resources.system.system',
+    'sushy_oem_idrac.resources.system.storage.controller',
+    'sushy_oem_idrac.resources.taskservice.task',
+)
+
+SAMPLES = 20
+
+_PROBE = """\
+import time
+import sushy.resources.oem.base
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module_name, samples=SAMPLES):
+    """Get import times of a module in seconds, one per sample."""
+    return [float(subprocess.check_output(
+        [sys.executable, '-c', _PROBE % module_name]))
+        for _ in range(samples)]
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else SAMPLES
+
+    for module_name in ENTRY_POINTS:
+        timings = measure(module_name, samples)
+        print('%-55s median %6.2f ms, min %6.2f ms' % (
+            module_name, statistics.median(timings) * 1000,
+            min(timings) * 1000))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare loading a whole SCP export to parsing it incrementally.
+
+The NIC and BIOS export sample gets its components repeated until it
+reaches the given size, in MB, like a full export with password hashes
+of a loaded server. PXE enabled ports are then looked up in it, as
+`get_pxe_port_macs_bios` does, reporting throughput and peak memory
+allocated on top of the response content. The indexed lookup keeps the
+whole export, as `scp.Configuration`.
+
+    python -m sushy_oem_idrac.tests.benchmarks.scp_export [megabytes]
+"""
+
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sushy_oem_idrac.resources.manager import scp
+
+MEGABYTES = 8
+
+SAMPLES = 5
+
+_SAMPLE = ('sushy_oem_idrac/tests/unit/json_samples/'
+           'export_configuration_nic_bios.json')
+
+
+def _scale(megabytes):
+    with open(_SAMPLE) as f:
+        doc = json.load(f)
+
+    components = doc['SystemConfiguration']['Components']
+    sample = json.dumps(components, indent=2)
+    copies = max(1, int(megabytes * 1024 * 1024 / len(sample)))
+    doc['SystemConfiguration']['Components'] = [
+        dict(component, FQDD='%s-%d' % (component['FQDD'], copy))
+        for copy in range(copies) for component in components]
+    return json.dumps(doc, indent=2).encode()
+
+
+def _loaded(content):
+    doc = json.loads(content)
+    return [component['FQDD']
+            for component in doc['SystemConfiguration']['Components']
+            for attribute in component['Attributes']
+            if attribute['Name'] == 'LegacyBootProto'
+            and attribute['Value'] == 'PXE']
+
+
+def _streamed(content):
+    chunk_size = scp.EXPORT_CHUNK_SIZE
+    reader = scp.ExportReader(content[i:i + chunk_size]
+                              for i in range(0, len(content), chunk_size))
+    return [fqdd for fqdd, name, value in reader.attributes()
+            if name == 'LegacyBootProto' and value == 'PXE']
+
+
+def _indexed(content):
+    chunk_size = scp.EXPORT_CHUNK_SIZE
+    configuration = scp.Configuration.from_reader(scp.ExportReader(
+        content[i:i + chunk_size]
+        for i in range(0, len(content), chunk_size)))
+    return [component.fqdd for component in configuration
+            if component.get_value('LegacyBootProto') == 'PXE']
+
+
+def measure(content, parse):
+    """Get the times in seconds parsing took and the peak memory."""
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        parse(content)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings, peak
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else MEGABYTES
+    content = _scale(megabytes)
+    assert _loaded(content) == _streamed(content) == _indexed(content)
+
+    for name, parse in (('json.loads', _loaded), ('streamed', _streamed),
+                        ('indexed', _indexed)):
+        timings, peak = measure(content, parse)
+        median = statistics.median(timings)
+        print('%-10s %6.1f MB: median %8.2f ms, %6.1f MB/s, peak memory '
+              '%8.2f MB' % (name, len(content) / 1024 / 1024,
+                            median * 1000,
+                            len(content) / 1024 / 1024 / median,
+                            peak / 1024 / 1024))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
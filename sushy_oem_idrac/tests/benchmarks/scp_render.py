@@ -0,0 +1,82 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure how fast SCP import buffers of many nodes get rendered.
+
+Every node gets the same components and attributes set, the virtual boot
+device plus BIOS and NIC attributes, with values of its own. Rendering
+through the compiled templates change sets share is compared to
+compiling the document again for every node.
+
+    python -m sushy_oem_idrac.tests.benchmarks.scp_render [nodes]
+"""
+
+import statistics
+import sys
+import time
+
+from sushy_oem_idrac.resources.manager import scp
+
+NODES = 10000
+
+SAMPLES = 5
+
+
+def _change_set(node):
+    change_set = scp.ChangeSet()
+    change_set.set_attributes('iDRAC.Embedded.1', {
+        'ServerBoot.1#BootOnce': 'Enabled',
+        'ServerBoot.1#FirstBootDevice': 'VCD-DVD'})
+    change_set.set_attributes('BIOS.Setup.1-1', {
+        'BootMode': 'Uefi', 'SriovGlobalEnable': 'Enabled',
+        'AssetTag': 'node-%05d' % node})
+    change_set.set_attributes('NIC.Integrated.1-1-1', {
+        'LegacyBootProto': 'PXE', 'VLanId': str(node % 4096)})
+    return change_set
+
+
+def _render_uncompiled(change_set, format):
+    values = [value for attributes in change_set.components.values()
+              for value in attributes.values()]
+    return scp.Template(change_set.layout, format).render(values)
+
+
+def measure(change_sets, render, format):
+    """Get the times in seconds rendering all change sets took."""
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        for change_set in change_sets:
+            render(change_set, format)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else NODES
+    change_sets = [_change_set(node) for node in range(nodes)]
+
+    for format in (scp.FORMAT_XML, scp.FORMAT_JSON):
+        for name, render in (
+                ('uncompiled', _render_uncompiled),
+                ('compiled', lambda change_set, format: change_set.render(
+                    format))):
+            timings = measure(change_sets, render, format)
+            median = statistics.median(timings)
+            print('%-4s %-10s %6d nodes: median %8.2f ms, %9.0f buffers/s'
+                  % (format, name, nodes, median * 1000, nodes / median))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare ways of finding the drives to convert on JBOD chassis.
+
+Runs against a local stand-in Redfish service answering every request
+after the given latency, serving two controllers sharing the given
+number of drives, each of them a raw device with its volume.
+
+``serial`` reads each storage, drive and volume in turn through sushy,
+as `_filter_disks_not_in_mode` did on its own. ``parallel`` and
+``expanded`` load a `StorageTopology` from a service without and with
+$expand support.
+
+    python -m sushy_oem_idrac.tests.benchmarks.storage_topology \\
+        [latency_ms [drives ...]]
+"""
+
+import json
+import sys
+import time
+
+from sushy import connector
+from sushy.resources.system import system
+
+from sushy_oem_idrac.resources.system import constants as sys_cons
+from sushy_oem_idrac.resources.system import system as oem_system
+from sushy_oem_idrac.resources.system import topology
+from sushy_oem_idrac.tests.unit import redfish_server
+
+LATENCY = 0.01
+
+DRIVES = (8, 60, 90, 250, 1000)
+
+_SYSTEM_PATH = '/redfish/v1/Systems/System.Embedded.1'
+
+_CONTROLLERS = ('RAID.Integrated.1-1', 'NonRAID.Slot.6-1')
+
+
+def _delayed(response, latency):
+    def _handle(data, path):
+        time.sleep(latency)
+        return response
+    return _handle
+
+
+def _collection(path, members):
+    return {'@odata.id': path, 'Name': 'Collection', 'Members': members,
+            'Members@odata.count': len(members)}
+
+
+def serve(server, drives, latency, expand):
+    """Serve the system with its drives on the stand-in service."""
+    docs = {}
+    collections = {_SYSTEM_PATH + '/Storage': []}
+    for index, controller in enumerate(_CONTROLLERS):
+        path = '%s/Storage/%s' % (_SYSTEM_PATH, controller)
+        collections[_SYSTEM_PATH + '/Storage'].append(path)
+        collections[path + '/Volumes'] = []
+        docs[path] = {
+            '@odata.id': path, 'Id': controller, 'Name': controller,
+            'Drives': [], 'Volumes': {'@odata.id': path + '/Volumes'},
+            'StorageControllers': [{'MemberId': controller,
+                                    'Name': controller}]}
+
+        for bay in range(index, drives, len(_CONTROLLERS)):
+            drive = '%s/Drives/Disk.Bay.%d:%s' % (path, bay, controller)
+            volume = '%s/Volumes/Disk.Bay.%d:%s' % (path, bay, controller)
+            docs[path]['Drives'].append({'@odata.id': drive})
+            collections[path + '/Volumes'].append(volume)
+            docs[drive] = {'@odata.id': drive, 'Id': drive.split('/')[-1],
+                           'Name': 'Disk.Bay.%d' % bay,
+                           'Links': {'Volumes': [{'@odata.id': volume}]}}
+            docs[volume] = {'@odata.id': volume,
+                            'Id': volume.split('/')[-1],
+                            'Name': 'Disk.Bay.%d' % bay,
+                            'VolumeType': 'RawDevice',
+                            'Links': {'Drives': [{'@odata.id': drive}]}}
+
+    with open('sushy_oem_idrac/tests/unit/json_samples/system.json') as f:
+        server.add_route('GET', _SYSTEM_PATH,
+                         _delayed((200, {}, json.load(f)), latency))
+    for path, doc in docs.items():
+        server.add_route('GET', path, _delayed((200, {}, doc), latency))
+    for path, members in collections.items():
+        server.add_route('GET', path, _delayed((200, {}, _collection(
+            path, [{'@odata.id': m} for m in members])), latency))
+        server.add_route('GET', path + topology.EXPAND_QUERY, _delayed(
+            (200, {}, _collection(path, [
+                docs[m] if expand else {'@odata.id': m}
+                for m in members])), latency))
+
+
+def _serial(sushy_system):
+    controller_to_disks = {}
+    for storage in sushy_system.storage.get_members():
+        controller_to_disks[storage.storage_controllers[0]] = storage.drives
+    return oem_system._filter_disks_not_in_mode(
+        controller_to_disks, sys_cons.PhysicalDiskStateMode.RAID)
+
+
+def _topology(sushy_system):
+    snapshot = topology.StorageTopology.load(sushy_system)
+    controller_to_disks = {}
+    for storage in snapshot.storage:
+        controller_to_disks[storage.storage_controllers[0]] = (
+            snapshot.get_drives(storage))
+    return oem_system._filter_disks_not_in_mode(
+        controller_to_disks, sys_cons.PhysicalDiskStateMode.RAID, snapshot)
+
+
+def measure(drives, latency, name):
+    """Get requests issued finding the drives to convert and the time."""
+    server = redfish_server.RedfishServer()
+    server.setUp()
+    try:
+        serve(server, drives, latency, expand=name == 'expanded')
+        conn = connector.Connector(server.url, verify=False)
+        sushy_system = system.System(conn, _SYSTEM_PATH,
+                                     redfish_version='1.0.2')
+        find = _serial if name == 'serial' else _topology
+
+        del server.requests[:]
+        start = time.perf_counter()
+        controller_to_disks = find(sushy_system)
+        elapsed = time.perf_counter() - start
+
+        assert sum(map(len, controller_to_disks.values())) == drives
+        conn.close()
+    finally:
+        server.cleanUp()
+
+    return len(server.requests), elapsed
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else LATENCY
+    sizes = [int(arg) for arg in sys.argv[2:]] or DRIVES
+
+    for drives in sizes:
+        for name in ('serial', 'parallel', 'expanded'):
+            requests, elapsed = measure(drives, latency, name)
+            print('%-9s %5d drives: %5d requests, %9.2f ms' % (
+                name, drives, requests, elapsed * 1000))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare resolving the task of a Dell job directly to enumerating tasks.
+
+Runs against a local stand-in Redfish service holding the given number of
+TaskService tasks, looking up the most recent one.
+
+    python -m sushy_oem_idrac.tests.benchmarks.task_lookup [tasks]
+"""
+
+import json
+import statistics
+import sys
+import time
+
+import sushy
+
+from sushy_oem_idrac.resources.system import raid_service
+from sushy_oem_idrac.tests.unit import redfish_server
+
+TASKS = 500
+
+SAMPLES = 5
+
+_SAMPLES_DIR = 'sushy_oem_idrac/tests/unit/json_samples/'
+
+_RAID_SERVICE = ('/redfish/v1/Systems/System.Embedded.1/Oem/Dell/'
+                 'DellRaidService')
+
+
+def _load(name):
+    with open(_SAMPLES_DIR + name) as f:
+        return json.load(f)
+
+
+def measure(server, lookup, samples=SAMPLES):
+    """Get requests issued by one lookup and its times in seconds."""
+    timings = []
+    for _ in range(samples):
+        del server.requests[:]
+        start = time.perf_counter()
+        lookup()
+        timings.append(time.perf_counter() - start)
+
+    return len(server.requests), timings
+
+
+def main():
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else TASKS
+
+    server = redfish_server.RedfishServer()
+    server.setUp()
+    try:
+        server.add_route('GET', '/redfish/v1/', (200, {}, _load('root.json')))
+        server.add_route('GET', _RAID_SERVICE,
+                         (200, {}, _load('raid_service.json')))
+        task_ids = ['JID_%012d' % i for i in range(tasks)]
+        server.add_tasks(task_ids, _load('task.json'))
+
+        root = sushy.Sushy(server.url, verify=False,
+                           auth=sushy.auth.BasicAuth('user', 'password'))
+        service = raid_service.DellRaidService(
+            root._conn, _RAID_SERVICE, root=root)
+
+        response = type('Response', (), {
+            'url': server.url,
+            'headers': {'Location': '/redfish/v1/Managers/iDRAC.Embedded.1/'
+                                    'Oem/Dell/Jobs/%s' % task_ids[-1]}})
+
+        for name, lookup in (
+                ('enumerate', lambda: service._find_task_monitor(
+                    task_ids[-1])),
+                ('direct', lambda: service._get_task_monitor_from_dell_job(
+                    response))):
+            requests, timings = measure(server, lookup)
+            print('%-10s %5d tasks: %5d requests, median %8.2f ms' % (
+                name, tasks, requests, statistics.median(timings) * 1000))
+
+    finally:
+        server.cleanUp()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
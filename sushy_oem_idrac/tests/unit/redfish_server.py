@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Minimal local stand-in for a Redfish service used by the unit tests."""
+
+import collections
+from http import server
+import json
+import threading
+
+import fixtures
+
+
+class _RequestHandler(server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        data = json.loads(body) if body else None
+
+        status, headers, payload = self.server.stand_in.dispatch(
+            self.command, self.path, data)
+
+        content = b''
+        if payload is not None:
+            content = (payload if isinstance(payload, bytes)
+                       else json.dumps(payload).encode())
+
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+class RedfishServer(fixtures.Fixture):
+    """Serves canned Redfish responses on a local HTTP port.
+
+    Routes are registered per HTTP method and path. A route is either a
+    ``(status, headers, payload)`` tuple, a callable taking ``(data, path)``
+    and returning such a tuple, or a list of either served in turn (the
+    last one repeats). Every request is recorded in ``requests``.
+    """
+
+    def __init__(self):
+        super(RedfishServer, self).__init__()
+        self.requests = []
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _setUp(self):
+        self._httpd = server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), _RequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self.port = self._httpd.server_address[1]
+        self.url = 'http://127.0.0.1:%d' % self.port
+
+        thread = threading.Thread(target=self._httpd.serve_forever,
+                                  kwargs={'poll_interval': 0.05},
+                                  daemon=True)
+        thread.start()
+
+        self.addCleanup(thread.join)
+        self.addCleanup(self._httpd.server_close)
+        self.addCleanup(self._httpd.shutdown)
+
+    def add_route(self, method, path, response):
+        with self._lock:
+            if isinstance(response, list):
+                response = collections.deque(response)
+            self._routes[(method.upper(), path)] = response
+
+    def add_tasks(self, task_ids, task):
+        """Serve a TaskService holding a task for each of the given IDs.
+
+        :param task_ids: IDs of the tasks.
+        :param task: JSON document every task is made from.
+        :returns: List of the task URIs.
+        """
+        service_path = '/redfish/v1/TaskService'
+        tasks_path = service_path + '/Tasks'
+        paths = ['%s/%s' % (tasks_path, task_id) for task_id in task_ids]
+
+        self.add_route('GET', service_path, (200, {}, {
+            '@odata.id': service_path, 'Id': 'TaskService',
+            'Name': 'Task Service', 'Tasks': {'@odata.id': tasks_path}}))
+        self.add_route('GET', tasks_path, (200, {}, {
+            '@odata.id': tasks_path, 'Name': 'Task Collection',
+            'Members': [{'@odata.id': path} for path in paths],
+            'Members@odata.count': len(paths)}))
+        for task_id, path in zip(task_ids, paths):
+            self.add_route('GET', path, (200, {}, dict(
+                task, **{'@odata.id': path, 'Id': task_id})))
+
+        return paths
+
+    def count(self, method=None, path=None):
+        return len([r for r in self.requests
+                    if (method is None or r[0] == method.upper())
+                    and (path is None or r[1] == path)])
+
+    def dispatch(self, method, path, data):
+        with self._lock:
+            self.requests.append((method, path))
+            route = self._routes.get((method, path))
+
+            if route is None:
+                return 404, {}, {'error': {'message': 'Not found: %s' % path}}
+
+            if isinstance(route, collections.deque):
+                route = route.popleft() if len(route) > 1 else route[0]
+
+        if callable(route):
+            return route(data, path)
+
+        return route
@@ -44,3 +44,10 @@ class DellJobCollectionTestCase(BaseTestCase):
                       '/Jobs?$expand=.($levels=1)')
         self.conn.get.assert_called_with(target_uri)
         self.assertEqual(expected_unfinished_jobs, actual_unfinished_jobs)
+
+    def test_get_running_jobs(self):
+        actual_running_jobs = self.job_collection.get_running_jobs()
+        target_uri = ('/redfish/v1/Managers/iDRAC.Embedded.1'
+                      '/Jobs?$expand=.($levels=1)')
+        self.conn.get.assert_called_with(target_uri)
+        self.assertEqual(['RID_878460711202'], actual_running_jobs)
@@ -101,3 +101,69 @@ class DellLCServiceTestCase(BaseTestCase):
                       '/DellLCService'
                       '/Actions/DellLCService.GetRemoteServicesAPIStatus')
         self.conn.post.assert_called_once_with(target_uri, data={})
+
+    def _set_status(self, **status):
+        mock_response = self.conn.post.return_value
+        mock_response.status_code = 200
+        mock_response.json.return_value = dict({
+            "LCStatus": "Ready",
+            "RTStatus": "Ready",
+            "ServerStatus": "OutOfPOST",
+            "Status": "Ready"
+            }, **status)
+
+    def test_get_remote_services_api_status(self):
+        self._set_status(RTStatus="NotReady")
+
+        status = self.lifecycle_service.get_remote_services_api_status()
+
+        self.assertEqual('Ready', status.lc_status)
+        self.assertEqual('NotReady', status.rt_status)
+        self.assertEqual('OutOfPOST', status.server_status)
+        self.assertEqual('Ready', status.status)
+        self.assertTrue(status.lc_ready)
+        self.assertFalse(status.rt_ready)
+
+    def test_get_remote_services_api_status_not_ok(self):
+        status = self.lifecycle_service.get_remote_services_api_status()
+
+        self.assertIsNone(status.lc_status)
+        self.assertFalse(status.lc_ready)
+        self.assertFalse(status.rt_ready)
+
+    def test_get_remote_services_api_status_cached(self):
+        self._set_status()
+
+        self.assertTrue(self.lifecycle_service.is_idrac_ready())
+        self.assertTrue(self.lifecycle_service.is_realtime_ready())
+        self.assertIs(self.lifecycle_service.get_remote_services_api_status(),
+                      self.lifecycle_service.get_remote_services_api_status())
+        self.conn.post.assert_called_once_with(mock.ANY, data={})
+
+    @mock.patch.object(lifecycle_service.time, 'monotonic', autospec=True)
+    def test_get_remote_services_api_status_expired(self, mock_monotonic):
+        self._set_status()
+        mock_monotonic.return_value = 100
+
+        self.lifecycle_service.get_remote_services_api_status()
+        mock_monotonic.return_value += self.lifecycle_service.status_ttl
+        self.lifecycle_service.get_remote_services_api_status()
+
+        self.assertEqual(2, self.conn.post.call_count)
+
+    def test_get_remote_services_api_status_max_age(self):
+        self._set_status()
+
+        self.lifecycle_service.is_idrac_ready()
+        self.lifecycle_service.is_idrac_ready(max_age=0)
+
+        self.assertEqual(2, self.conn.post.call_count)
+
+    def test_get_remote_services_api_status_refresh(self):
+        self._set_status()
+
+        self.lifecycle_service.is_idrac_ready()
+        self.lifecycle_service.refresh()
+        self.lifecycle_service.is_idrac_ready()
+
+        self.assertEqual(2, self.conn.post.call_count)
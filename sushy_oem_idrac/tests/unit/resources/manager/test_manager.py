@@ -28,6 +28,8 @@ from sushy_oem_idrac.resources.manager import job_collection as jc
 from sushy_oem_idrac.resources.manager import job_service as job
 from sushy_oem_idrac.resources.manager import lifecycle_service as lifecycle
 from sushy_oem_idrac.resources.manager import manager as oem_manager
+from sushy_oem_idrac.resources.manager import readiness
+from sushy_oem_idrac.resources.manager import scp
 
 
 class ManagerTestCase(BaseTestCase):
@@ -94,6 +96,160 @@ class ManagerTestCase(BaseTestCase):
                   '#FirstBootDevice">VCD-DVD</Attribute></Component>'
                   '</SystemConfiguration>'})
 
+    def _boot_override_system(self, firmware_version):
+        self.manager.firmware_version = firmware_version
+        system = mock.Mock()
+        system.boot.allowed_values = ['None', 'Pxe', 'Cd', 'Hdd']
+        return system
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.dict(oem_manager._boot_override_support, clear=True)
+    def test_set_virtual_boot_device_cd_boot_override(self):
+        oem = self.manager.get_oem_extension('Dell')
+        system = self._boot_override_system('6.10.30.00')
+
+        result = oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, persistent=True, manager=self.manager,
+            system=system)
+
+        self.assertIsNone(result)
+        system.set_system_boot_options.assert_called_once_with(
+            target=sushy.BootSource.CD,
+            enabled=sushy.BootSourceOverrideEnabled.CONTINUOUS)
+        self.conn.post.assert_not_called()
+        self.assertEqual({'6.10.30.00': True},
+                         oem_manager._boot_override_support)
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.dict(oem_manager._boot_override_support, clear=True)
+    def test_set_virtual_boot_device_cd_old_firmware(self):
+        oem = self.manager.get_oem_extension('Dell')
+        system = self._boot_override_system('4.40.00.00')
+
+        oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, manager=self.manager, system=system)
+
+        system.set_system_boot_options.assert_not_called()
+        self.assertEqual(1, self.conn.post.call_count)
+        self.assertEqual({'4.40.00.00': False},
+                         oem_manager._boot_override_support)
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.dict(oem_manager._boot_override_support, clear=True)
+    def test_set_virtual_boot_device_floppy_no_boot_override(self):
+        oem = self.manager.get_oem_extension('Dell')
+        system = self._boot_override_system('6.10.30.00')
+
+        oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_FLOPPY, manager=self.manager, system=system)
+
+        system.set_system_boot_options.assert_not_called()
+        self.assertEqual(1, self.conn.post.call_count)
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.dict(oem_manager._boot_override_support, clear=True)
+    def test_set_virtual_boot_device_cd_boot_override_rejected(self):
+        oem = self.manager.get_oem_extension('Dell')
+        system = self._boot_override_system('6.10.30.00')
+        system.set_system_boot_options.side_effect = (
+            sushy.exceptions.BadRequestError(
+                'PATCH', '/redfish/v1/Systems/System.Embedded.1',
+                mock.Mock(status_code=400)))
+
+        oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, manager=self.manager, system=system)
+        oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, manager=self.manager, system=system)
+
+        # Not tried again once rejected by the same firmware version
+        system.set_system_boot_options.assert_called_once_with(
+            target=sushy.BootSource.CD,
+            enabled=sushy.BootSourceOverrideEnabled.ONCE)
+        self.assertEqual(2, self.conn.post.call_count)
+        self.assertEqual({'6.10.30.00': False},
+                         oem_manager._boot_override_support)
+
+    def _mock_server_boot_export(self, oem, first_boot_device, boot_once):
+        oem._export_system_configuration = mock.Mock()
+        mock_response = oem._export_system_configuration.return_value
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [json.dumps(
+            {'SystemConfiguration': {'Components': [
+                {'FQDD': 'System.Embedded.1', 'Attributes': [
+                    {'Name': 'ServerBoot.1#BootOnce', 'Value': 'Other'}]},
+                {'FQDD': 'iDRAC.Embedded.1', 'Attributes': [
+                    {'Name': 'ServerBoot.1#BootOnce', 'Value': boot_once},
+                    {'Name': 'ServerBoot.1#FirstBootDevice',
+                     'Value': first_boot_device},
+                    {'Name': 'NIC.1#Enable', 'Value': 'Enabled'}]}]}}
+        ).encode()]
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test__get_server_boot_attributes(self):
+        oem = self.manager.get_oem_extension('Dell')
+        self._mock_server_boot_export(oem, 'VCD-DVD', 'Enabled')
+
+        with mock.patch.object(scp.Component, 'find',
+                               autospec=True,
+                               side_effect=scp.Component.find) as mock_find:
+            attributes = oem._get_server_boot_attributes('iDRAC.Embedded.1')
+
+        self.assertEqual({'ServerBoot.1#BootOnce': 'Enabled',
+                          'ServerBoot.1#FirstBootDevice': 'VCD-DVD'},
+                         attributes)
+        # Only the component looked up by FQDD gets searched
+        mock_find.assert_called_once_with(mock.ANY, 'ServerBoot.1#')
+        self.assertEqual('iDRAC.Embedded.1', mock_find.call_args[0][0].fqdd)
+        response = oem._export_system_configuration.return_value
+        response.json.assert_not_called()
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test__get_server_boot_attributes_no_component(self):
+        oem = self.manager.get_oem_extension('Dell')
+        self._mock_server_boot_export(oem, 'VCD-DVD', 'Enabled')
+
+        self.assertEqual(
+            {}, oem._get_server_boot_attributes('iDRAC.Embedded.2'))
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_set_virtual_boot_device_skip_if_set(self):
+        oem = self.manager.get_oem_extension('Dell')
+        self._mock_server_boot_export(oem, 'VCD-DVD', 'Enabled')
+
+        result = oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, manager=self.manager, skip_if_set=True)
+
+        self.assertIsNone(result)
+        oem._export_system_configuration.assert_called_once_with(
+            mgr_cons.ExportTarget.IDRAC)
+        self.conn.post.assert_not_called()
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_set_virtual_boot_device_skip_if_set_differs(self):
+        oem = self.manager.get_oem_extension('Dell')
+        self._mock_server_boot_export(oem, 'VCD-DVD', 'Enabled')
+
+        result = oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_CD, persistent=True, manager=self.manager,
+            skip_if_set=True)
+
+        self.assertIsNotNone(result)
+        self.assertEqual(1, self.conn.post.call_count)
+        self.assertIn('<Attribute Name="ServerBoot.1#BootOnce">Disabled',
+                      self.conn.post.call_args[1]['data']['ImportBuffer'])
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_set_virtual_boot_device_skip_if_set_export_fails(self):
+        oem = self.manager.get_oem_extension('Dell')
+        oem._export_system_configuration = mock.Mock(
+            side_effect=sushy.exceptions.ExtensionError(error='boom'))
+
+        oem.set_virtual_boot_device(
+            sushy.VIRTUAL_MEDIA_FLOPPY, manager=self.manager,
+            skip_if_set=True)
+
+        self.assertEqual(1, self.conn.post.call_count)
+
     @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
     def test_get_allowed_export_target_values(self):
         oem = self.manager.get_oem_extension('Dell')
@@ -303,7 +459,7 @@ class ManagerTestCase(BaseTestCase):
         oem = self.manager.get_oem_extension('Dell')
         oem._export_system_configuration = mock.Mock()
         with open('sushy_oem_idrac/tests/unit/json_samples/'
-                  'export_configuration_idrac.json') as f:
+                  'export_configuration_idrac.json', 'rb') as f:
             mock_response = oem._export_system_configuration.return_value
             mock_response.json.return_value = json.load(f)
             mock_response.status_code = 200
@@ -315,20 +471,56 @@ class ManagerTestCase(BaseTestCase):
         # From 40 items in test data 16 should be removed
         self.assertEqual(24, len(response_json['SystemConfiguration']
                                  ['Components'][0]['Attributes']))
+        self.assertEqual('PowerEdge R640',
+                         response_json['SystemConfiguration']['Model'])
         include_in_export = mgr_cons.INCLUDE_EXPORT_READ_ONLY_PASSWORD_HASHES
         oem._export_system_configuration.assert_called_once_with(
             mgr_cons.EXPORT_TARGET_ALL,
             export_use=mgr_cons.EXPORT_USE_CLONE,
             include_in_export=include_in_export)
 
+    def _export_destructive_fields(self, content):
+        oem = self.manager.get_oem_extension('Dell')
+        oem._export_system_configuration = mock.Mock()
+        mock_response = oem._export_system_configuration.return_value
+        mock_response.json.side_effect = lambda: json.loads(content)
+        mock_response.status_code = 200
+
+        response = oem.export_system_configuration(
+            include_destructive_fields=False)
+
+        return response._content.decode()
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_export_system_configuration_destructive_fields_order(self):
+        content = self._export_destructive_fields(
+            '{"Extra": 1, "SystemConfiguration": {"Model": "R640", '
+            '"Components": [{"FQDD": "iDRAC.Embedded.1", "Attributes": ['
+            '{"Name": "IPv4Static.1#Address", "Value": "1.2.3.4"}, '
+            '{"Name": "Users.2#UserName", "Value": "root"}]}], '
+            '"ServiceTag": "ABC1234"}, "Trailer": {"Size": 2}}')
+
+        self.assertEqual(
+            '{"Extra": 1, "SystemConfiguration": {"Model": "R640", '
+            '"Components": [{"FQDD": "iDRAC.Embedded.1", "Attributes": ['
+            '{"Name": "Users.2#UserName", "Value": "root"}]}], '
+            '"ServiceTag": "ABC1234"}, "Trailer": {"Size": 2}}', content)
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_export_system_configuration_destructive_fields_no_components(
+            self):
+        self.assertRaises(
+            KeyError, self._export_destructive_fields,
+            '{"SystemConfiguration": {"Model": "R640"}}')
+
     @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
     def test_get_pxe_port_macs_bios(self):
         oem = self.manager.get_oem_extension('Dell')
         oem._export_system_configuration = mock.Mock()
         with open('sushy_oem_idrac/tests/unit/json_samples/'
-                  'export_configuration_nic_bios.json') as f:
+                  'export_configuration_nic_bios.json', 'rb') as f:
             mock_response = oem._export_system_configuration.return_value
-            mock_response.json.return_value = json.load(f)
+            mock_response.iter_content.return_value = [f.read()]
             mock_response.status_code = 200
         ethernet_interfaces_mac = {'NIC.Integrated.1-4-1': '68:05:CA:AF:AA:C9',
                                    'NIC.Slot.7-2-1': '3C:FD:FE:CD:67:31',
@@ -345,7 +537,8 @@ class ManagerTestCase(BaseTestCase):
         oem = self.manager.get_oem_extension('Dell')
         oem._export_system_configuration = mock.Mock()
         mock_response = oem._export_system_configuration.return_value
-        mock_response.json.return_value = {'Model': 'PowerEdge R7525'}
+        mock_response.iter_content.return_value = [
+            b'{"Model": "PowerEdge R7525"}']
         mock_response.status_code = 200
         ethernet_interfaces_mac = {'NIC.Integrated.1-4-1': '68:05:CA:AF:AA:C9',
                                    'NIC.Slot.7-2-1': '3C:FD:FE:CD:67:31',
@@ -457,6 +650,54 @@ class ManagerTestCase(BaseTestCase):
         self.assertEqual(expected_values, allowed_values)
         mock_log.warning.assert_called_once()
 
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_import_change_set(self):
+        oem = self.manager.get_oem_extension('Dell')
+        change_set = oem.create_change_set()
+        oem.add_virtual_boot_device(change_set, sushy.VIRTUAL_MEDIA_CD,
+                                    persistent=True)
+        change_set.set_attributes('BIOS.Setup.1-1', {'BootMode': 'Uefi'})
+
+        result = oem.import_change_set(change_set)
+
+        self.conn.post.assert_called_once_with(
+            '/redfish/v1/Managers/iDRAC.Embedded.1/Actions/Oem/EID_674_Manager'
+            '.ImportSystemConfiguration',
+            data={'ShareParameters': {'Target': 'ALL'},
+                  'ImportBuffer':
+                  '<SystemConfiguration><Component FQDD="iDRAC.Embedded.1">'
+                  '<Attribute Name="ServerBoot.1#BootOnce">Disabled'
+                  '</Attribute><Attribute Name="ServerBoot.1'
+                  '#FirstBootDevice">VCD-DVD</Attribute></Component>'
+                  '<Component FQDD="BIOS.Setup.1-1">'
+                  '<Attribute Name="BootMode">Uefi</Attribute></Component>'
+                  '</SystemConfiguration>',
+                  'ShutdownType': 'NoReboot'})
+        self.assertIsInstance(result, TaskMonitor)
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_import_change_set_empty(self):
+        oem = self.manager.get_oem_extension('Dell')
+
+        self.assertIsNone(oem.import_change_set(oem.create_change_set()))
+        self.conn.post.assert_not_called()
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_set_virtual_boot_device_unsupported(self):
+        oem = self.manager.get_oem_extension('Dell')
+
+        self.assertRaises(sushy.exceptions.InvalidParameterValueError,
+                          oem.set_virtual_boot_device, 'bogus')
+        self.conn.post.assert_not_called()
+
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    def test_add_virtual_boot_device_unsupported(self):
+        oem = self.manager.get_oem_extension('Dell')
+
+        self.assertRaises(sushy.exceptions.InvalidParameterValueError,
+                          oem.add_virtual_boot_device,
+                          oem.create_change_set(), 'bogus')
+
     def test_import_system_configuration(self):
         oem = self.manager.get_oem_extension('Dell')
 
@@ -473,109 +714,132 @@ class ManagerTestCase(BaseTestCase):
         self.assertEqual('/redfish/v1/TaskService/Tasks/JID_905749031119',
                          result.task_monitor_uri)
 
-    def test_reset_idrac_with_wait_true(self):
+    @mock.patch.object(readiness.IdracReadiness, 'wait', autospec=True)
+    def test_reset_idrac_with_wait_true(self, mock_wait):
         oem_manager = self.manager.get_oem_extension('Dell')
         oem_manager.idrac_card_service.reset_idrac = mock.Mock()
         oem_manager._conn._url = "https://1.2.3.4"
-        oem_manager._wait_for_idrac = mock.Mock()
-        oem_manager._wait_until_idrac_is_ready = mock.Mock()
-        oem_manager.reset_idrac(wait=True)
+        mock_wait.return_value = {'down': 1.0}
+
+        result = oem_manager.reset_idrac(wait=True)
+
+        self.assertEqual({'down': 1.0}, result)
         oem_manager.idrac_card_service.reset_idrac.assert_called()
-        oem_manager._wait_for_idrac.assert_called_with('1.2.3.4', 60)
-        oem_manager._wait_until_idrac_is_ready.assert_called_with(
-            '1.2.3.4', 96, 10)
+        waiter = mock_wait.call_args[0][0]
+        self.assertIs(oem_manager, waiter.manager)
+        self.assertEqual('1.2.3.4', waiter.host)
 
-    def test_reset_idrac_with_wait_false(self):
+    @mock.patch.object(readiness.IdracReadiness, 'wait', autospec=True)
+    def test_reset_idrac_with_wait_false(self, mock_wait):
         oem_manager = self.manager.get_oem_extension('Dell')
         oem_manager.idrac_card_service.reset_idrac = mock.Mock()
-        oem_manager._wait_for_idrac = mock.Mock()
-        oem_manager._wait_until_idrac_is_ready = mock.Mock()
-        oem_manager.reset_idrac(wait=False)
-        oem_manager.idrac_card_service.reset_idrac.assert_called()
-        oem_manager._wait_for_idrac.assert_not_called()
-        oem_manager._wait_until_idrac_is_ready.assert_not_called()
 
-    def test__wait_until_idrac_is_ready(self):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager.lifecycle_service.is_idrac_ready = mock.Mock()
-        oem_manager.lifecycle_service.is_idrac_ready.side_effect = \
-            [False, True]
-        oem_manager._wait_until_idrac_is_ready('1.2.3.4', 96, 10)
-        oem_manager.lifecycle_service.is_idrac_ready.assert_called_with()
-
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_until_idrac_is_ready_with_timeout(self, mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager.lifecycle_service.is_idrac_ready = mock.Mock()
-        oem_manager.lifecycle_service.is_idrac_ready.return_value = False
-        self.assertRaises(sushy.exceptions.ExtensionError,
-                          oem_manager._wait_until_idrac_is_ready,
-                          '1.2.3.4', 96, 10)
+        result = oem_manager.reset_idrac(wait=False)
 
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_for_idrac_with_state_reached(self, mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager._wait_for_idrac_state = mock.Mock()
-        oem_manager._wait_for_idrac_state.return_value = True
-        oem_manager._wait_for_idrac('1.2.3.4', 30)
-        oem_manager._wait_for_idrac_state.assert_called_with(
-            '1.2.3.4', alive=True, ping_count=3, retries=24)
-        oem_manager._wait_for_idrac_state.assert_any_call(
-            '1.2.3.4', alive=False, ping_count=2, retries=24)
-        self.assertEqual(2, oem_manager._wait_for_idrac_state.call_count)
-
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_for_idrac_with_first_state_not_reached(self,
-                                                          mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager._wait_for_idrac_state = mock.Mock()
-        oem_manager._wait_for_idrac_state.return_value = False
-        self.assertRaises(sushy.exceptions.ExtensionError,
-                          oem_manager._wait_for_idrac, '1.2.3.4', 30)
+        self.assertIsNone(result)
+        oem_manager.idrac_card_service.reset_idrac.assert_called()
+        mock_wait.assert_not_called()
 
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_for_idrac_with_second_state_not_reached(self,
-                                                           mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager._wait_for_idrac_state = mock.Mock()
-        oem_manager._wait_for_idrac_state.side_effect = [True, False]
-        self.assertRaises(sushy.exceptions.ExtensionError,
-                          oem_manager._wait_for_idrac, '1.2.3.4', 30)
+    def _job_running_error(self):
+        return sushy.exceptions.BadRequestError(
+            'POST', '/ImportSystemConfiguration', mock.Mock(
+                status_code=400, json=mock.Mock(return_value={
+                    'error': {'@Message.ExtendedInfo': [{
+                        'MessageId': 'IDRAC.2.5.RAC0679',
+                        'Message': 'A job is already running.'}]}})))
 
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_for_idrac_state_with_pingable(self, mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager._ping_host = mock.Mock()
-        oem_manager._ping_host.return_value = True
-        response = oem_manager._wait_for_idrac_state('1.2.3.4')
-        self.assertEqual(True, response)
-        self.assertEqual(3, oem_manager._ping_host.call_count)
-
-    @mock.patch('time.sleep', autospec=True)
-    def test__wait_for_idrac_state_without_pingable(self, mock_time_sleep):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        oem_manager._ping_host = mock.Mock()
-        oem_manager._ping_host.return_value = False
-        response = oem_manager._wait_for_idrac_state('1.2.3.4')
-        self.assertEqual(False, response)
-        self.assertEqual(24, oem_manager._ping_host.call_count)
-
-    @mock.patch('subprocess.call', autospec=True)
-    def test__ping_host_alive(self, mock_call):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        mock_call.return_value = 0
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.object(oem_manager, 'time', autospec=True)
+    @mock.patch.object(oem_manager.asynchronous, 'http_call', autospec=True)
+    def test_set_virtual_boot_device_waits_for_running_jobs(
+            self, mock_http_call, mock_time):
+        oem = self.manager.get_oem_extension('Dell')
+        oem.JOB_QUEUE_POLL_POLICY = mock.Mock()
+        oem.JOB_QUEUE_POLL_POLICY.get_delay.side_effect = [1, 1.5]
+        mock_time.monotonic.return_value = 0
+        mock_http_call.side_effect = [self._job_running_error(),
+                                      mock.sentinel.response]
+        mock_jobs = mock.Mock()
+        mock_jobs.get_running_jobs.side_effect = [
+            ['JID_1'], ['JID_1'], []]
+
+        with mock.patch.object(oem_manager.DellManagerExtension,
+                               'job_collection', mock_jobs):
+            result = oem.set_virtual_boot_device(sushy.VIRTUAL_MEDIA_CD)
+
+        self.assertIs(mock.sentinel.response, result)
+        self.assertEqual(2, mock_http_call.call_count)
+        mock_time.sleep.assert_has_calls([mock.call(1), mock.call(1.5)])
+        self.assertEqual(2, mock_time.sleep.call_count)
 
-        result = oem_manager._ping_host('1.2.3.4')
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.object(oem_manager, 'time', autospec=True)
+    @mock.patch.object(oem_manager.asynchronous, 'http_call', autospec=True)
+    def test_set_virtual_boot_device_jobs_keep_running(
+            self, mock_http_call, mock_time):
+        oem = self.manager.get_oem_extension('Dell')
+        oem.RETRY_COUNT = 3
+        clock = [0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda delay: clock.__setitem__(
+            0, clock[0] + delay)
+        posted_at = []
+
+        def post(*args, **kwargs):
+            posted_at.append(clock[0])
+            raise self._job_running_error()
+
+        mock_http_call.side_effect = post
+        mock_jobs = mock.Mock()
+        mock_jobs.get_running_jobs.return_value = ['JID_1']
+
+        with mock.patch.object(oem_manager.DellManagerExtension,
+                               'job_collection', mock_jobs):
+            self.assertRaises(sushy.exceptions.BadRequestError,
+                              oem.set_virtual_boot_device,
+                              sushy.VIRTUAL_MEDIA_CD)
+
+        self.assertEqual(4, len(posted_at))
+        # Retries stay spaced out by the fixed delay
+        for before, after in zip(posted_at, posted_at[1:]):
+            self.assertAlmostEqual(oem.RETRY_DELAY, after - before)
 
-        self.assertTrue(result)
-        mock_call.assert_called_with(["ping", "-c", "1", '1.2.3.4'])
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.object(oem_manager, 'time', autospec=True)
+    @mock.patch.object(oem_manager.asynchronous, 'http_call', autospec=True)
+    def test_set_virtual_boot_device_job_queue_already_clear(
+            self, mock_http_call, mock_time):
+        oem = self.manager.get_oem_extension('Dell')
+        mock_time.monotonic.return_value = 0
+        mock_http_call.side_effect = [self._job_running_error(),
+                                      mock.sentinel.response]
+        mock_jobs = mock.Mock()
+        mock_jobs.get_running_jobs.return_value = []
 
-    @mock.patch('subprocess.call', autospec=True)
-    def test__ping_host_not_alive(self, mock_call):
-        oem_manager = self.manager.get_oem_extension('Dell')
-        mock_call.return_value = 1
+        with mock.patch.object(oem_manager.DellManagerExtension,
+                               'job_collection', mock_jobs):
+            result = oem.set_virtual_boot_device(sushy.VIRTUAL_MEDIA_CD)
 
-        result = oem_manager._ping_host('1.2.3.4')
+        self.assertIs(mock.sentinel.response, result)
+        self.assertEqual(2, mock_http_call.call_count)
+        mock_jobs.get_running_jobs.assert_called_once_with()
+        mock_time.sleep.assert_not_called()
 
-        self.assertFalse(result)
-        mock_call.assert_called_with(["ping", "-c", "1", '1.2.3.4'])
+    @mock.patch('sushy.resources.oem.common._global_extn_mgrs_by_resource', {})
+    @mock.patch.object(oem_manager, 'time', autospec=True)
+    @mock.patch.object(oem_manager.asynchronous, 'http_call', autospec=True)
+    def test_set_virtual_boot_device_job_queue_unreadable(
+            self, mock_http_call, mock_time):
+        oem = self.manager.get_oem_extension('Dell')
+        mock_time.monotonic.return_value = 0
+        mock_http_call.side_effect = [self._job_running_error(),
+                                      mock.sentinel.response]
+        mock_jobs = mock.Mock()
+        mock_jobs.get_running_jobs.side_effect = (
+            sushy.exceptions.ConnectionError(url='/Jobs', error='refused'))
+
+        with mock.patch.object(oem_manager.DellManagerExtension,
+                               'job_collection', mock_jobs):
+            oem.set_virtual_boot_device(sushy.VIRTUAL_MEDIA_CD)
+
+        mock_time.sleep.assert_called_once_with(oem.RETRY_DELAY)
@@ -0,0 +1,241 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import threading
+import time
+from unittest import mock
+
+import fixtures
+from oslotest.base import BaseTestCase
+import sushy
+from sushy import connector
+from sushy.resources.manager import manager
+
+from sushy_oem_idrac import asynchronous
+from sushy_oem_idrac.resources.manager import readiness
+from sushy_oem_idrac.tests.unit import redfish_server
+
+MANAGER_PATH = '/redfish/v1/Managers/iDRAC.Embedded.1'
+DELL_MANAGER_PATH = '/redfish/v1/Dell/Managers/iDRAC.Embedded.1'
+RESET_PATH = (DELL_MANAGER_PATH + '/DelliDRACCardService/Actions/'
+              'DelliDRACCardService.iDRACReset')
+LC_STATUS_PATH = (DELL_MANAGER_PATH + '/DellLCService/Actions/'
+                  'DellLCService.GetRemoteServicesAPIStatus')
+
+
+def _load(name):
+    with open('sushy_oem_idrac/tests/unit/json_samples/%s' % name) as f:
+        return json.load(f)
+
+
+class IdracReadinessTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(IdracReadinessTestCase, self).setUp()
+        self.now = 0.0
+        mock_time = self.useFixture(
+            fixtures.MockPatchObject(readiness, 'time')).mock
+        mock_time.monotonic.side_effect = lambda: self.now
+        mock_time.sleep.side_effect = self._sleep
+        self.sleeps = []
+
+        self.mock_reachable = self.useFixture(
+            fixtures.MockPatchObject(readiness.reachability,
+                                     'is_reachable')).mock
+
+        self.manager = mock.Mock()
+        self.is_idrac_ready = self.manager.lifecycle_service.is_idrac_ready
+        self.policy = asynchronous.ExponentialPollPolicy(
+            initial=1, factor=2, max_delay=10, jitter=0)
+
+    def _sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+    def _readiness(self, **kwargs):
+        return readiness.IdracReadiness(
+            self.manager, '1.2.3.4', poll_policy=self.policy, **kwargs)
+
+    def test_wait(self):
+        self.mock_reachable.side_effect = [True, False, False,
+                                           False, False, True]
+        self.manager._conn.get.side_effect = [
+            sushy.exceptions.ConnectionError(url='/redfish/v1/',
+                                             error='refused'),
+            mock.Mock()]
+        self.is_idrac_ready.side_effect = [False, True]
+
+        timings = self._readiness().wait()
+
+        self.assertEqual(list(readiness.PHASES), list(timings))
+        self.assertEqual({'down': 3, 'tcp_open': 3, 'redfish': 1,
+                          'lc_ready': 1}, timings)
+        self.assertEqual([1, 2, 1, 2, 1, 1], self.sleeps)
+        self.mock_reachable.assert_has_calls(
+            [mock.call('1.2.3.4', port_open=False)] * 3
+            + [mock.call('1.2.3.4', port_open=True)] * 3)
+        self.manager._conn.get.assert_called_with(
+            '/redfish/v1/', timeout=readiness.REDFISH_TIMEOUT)
+
+    def test_step_down_needs_confirmations(self):
+        waiter = self._readiness()
+
+        for reachable, delay in ((False, 1), (True, 2), (False, 4)):
+            self.assertEqual(delay, waiter.step(reachable))
+            self.assertEqual(readiness.PHASE_DOWN, waiter.phase)
+
+        self.assertEqual(0, waiter.step(False))
+        self.assertEqual(readiness.PHASE_TCP_OPEN, waiter.phase)
+        self.assertTrue(waiter.port_open)
+        self.mock_reachable.assert_not_called()
+
+    def test_step_backoff(self):
+        self.mock_reachable.return_value = True
+        waiter = self._readiness()
+
+        delays = [waiter.step() for _ in range(6)]
+
+        self.assertEqual([1, 2, 4, 8, 10, 10], delays)
+
+    def test_step_delay_capped_by_timeout(self):
+        self.mock_reachable.return_value = True
+        waiter = self._readiness(timeouts={readiness.PHASE_DOWN: 5})
+        self.now = 4.5
+
+        self.assertEqual(0.5, waiter.step())
+
+    def test_step_timeout(self):
+        self.mock_reachable.return_value = True
+        waiter = self._readiness()
+        self.now = readiness.PHASE_TIMEOUTS[readiness.PHASE_DOWN]
+
+        exc = self.assertRaises(sushy.exceptions.ExtensionError, waiter.step)
+        self.assertIn('Timed out waiting iDRAC 1.2.3.4 to become not '
+                      'reachable after reset', str(exc))
+
+    def test_step_lc_ready_error(self):
+        waiter = self._readiness()
+        waiter.phase = readiness.PHASE_LC_READY
+        self.is_idrac_ready.side_effect = sushy.exceptions.ServerSideError(
+            'POST', '/GetRemoteServicesAPIStatus',
+            mock.Mock(status_code=503, json=mock.Mock(return_value={})))
+
+        self.assertEqual(1, waiter.step())
+        self.assertFalse(waiter.done)
+
+        self.is_idrac_ready.side_effect = None
+        self.is_idrac_ready.return_value = True
+        self.assertIsNone(waiter.step())
+        self.assertTrue(waiter.done)
+
+
+class ResetIdracsTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ResetIdracsTestCase, self).setUp()
+        self.policy = asynchronous.ExponentialPollPolicy(
+            initial=0.01, max_delay=0.01, jitter=0)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.resets = {}
+        self.probes = {}
+        self.useFixture(fixtures.MockPatchObject(
+            readiness.reachability, 'probe', side_effect=self._probe))
+
+    def _probe(self, hosts, port_open=False):
+        # A reset iDRAC drops off the network for two probes, then comes
+        # back up; one not reset yet stays reachable
+        return {host: next(self.probes[host]) if host in self.resets
+                else True for host in hosts}
+
+    def _reset_handler(self, host):
+        def _handle(data, path):
+            with self.lock:
+                self.resets[host] = time.monotonic()
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            return 204, {}, None
+        return _handle
+
+    def _lc_status_handler(self, status):
+        def _handle(data, path):
+            if status == 'Ready':
+                with self.lock:
+                    self.active -= 1
+            return 200, {}, {'LCStatus': status}
+        return _handle
+
+    def _add_idrac(self, probes=(False, False, True)):
+        server = self.useFixture(redfish_server.RedfishServer())
+        host = '127.0.0.1:%d' % server.port
+        self.probes[host] = iter(probes)
+
+        server.add_route('GET', MANAGER_PATH, (200, {}, _load('manager.json')))
+        server.add_route('GET', DELL_MANAGER_PATH + '/DelliDRACCardService',
+                         (200, {}, _load('idrac_card_service.json')))
+        server.add_route('GET', DELL_MANAGER_PATH + '/DellLCService',
+                         (200, {}, _load('lifecycle_service.json')))
+        server.add_route('POST', RESET_PATH, self._reset_handler(host))
+        server.add_route('GET', '/redfish/v1/', [
+            (503, {}, {'error': {'message': 'Starting'}}),
+            (200, {}, _load('root.json'))])
+        server.add_route('POST', LC_STATUS_PATH, [
+            self._lc_status_handler('NotReady'),
+            self._lc_status_handler('Ready')])
+
+        conn = connector.Connector(server.url, verify=False)
+        self.addCleanup(conn.close)
+        idrac = manager.Manager(conn, MANAGER_PATH, redfish_version='1.0.2')
+        return host, server, idrac.get_oem_extension('Dell')
+
+    def test_reset_idracs(self):
+        idracs = [self._add_idrac() for _ in range(5)]
+
+        results = readiness.reset_idracs(
+            [oem for _, _, oem in idracs], max_resets=2, stagger=0.02,
+            poll_policy=self.policy)
+
+        self.assertEqual({host for host, _, _ in idracs}, set(results))
+        for host, server, _ in idracs:
+            self.assertIsNone(results[host]['error'])
+            self.assertEqual(list(readiness.PHASES),
+                             sorted(results[host]['timings'],
+                                    key=readiness.PHASES.index))
+            self.assertEqual(1, server.count('POST', RESET_PATH))
+            self.assertEqual(2, server.count('GET', '/redfish/v1/'))
+            self.assertEqual(2, server.count('POST', LC_STATUS_PATH))
+
+        self.assertEqual(2, self.max_active)
+        resets = sorted(self.resets.values())
+        for previous, current in zip(resets, resets[1:]):
+            self.assertGreaterEqual(current - previous, 0.015)
+
+    def test_reset_idracs_failures(self):
+        good_host, _, good = self._add_idrac()
+        stuck_host, _, stuck = self._add_idrac(probes=iter(lambda: True, 0))
+        broken_host, broken_server, broken = self._add_idrac()
+        broken_server.add_route('POST', RESET_PATH, (
+            500, {}, {'error': {'message': 'Internal error'}}))
+
+        results = readiness.reset_idracs(
+            [good, stuck, broken], stagger=0, poll_policy=self.policy,
+            timeouts={readiness.PHASE_DOWN: 0.1})
+
+        self.assertIsNone(results[good_host]['error'])
+        self.assertIsInstance(results[stuck_host]['error'],
+                              sushy.exceptions.ExtensionError)
+        self.assertEqual({}, results[stuck_host]['timings'])
+        self.assertIsInstance(results[broken_host]['error'],
+                              sushy.exceptions.ServerSideError)
+        self.assertEqual({}, results[broken_host]['timings'])
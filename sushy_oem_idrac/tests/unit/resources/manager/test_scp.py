@@ -0,0 +1,308 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+from unittest import mock
+
+from oslotest.base import BaseTestCase
+
+from sushy_oem_idrac.resources.manager import scp
+
+
+class ChangeSetTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ChangeSetTestCase, self).setUp()
+        self.change_set = scp.ChangeSet()
+        self.change_set.set_attribute(
+            'iDRAC.Embedded.1', 'ServerBoot.1#FirstBootDevice', 'VCD-DVD')
+        self.change_set.set_attributes(
+            'BIOS.Setup.1-1', {'BootMode': 'Uefi', 'SriovGlobalEnable':
+                               'Enabled'})
+
+    def test_len(self):
+        self.assertEqual(3, len(self.change_set))
+        self.assertEqual(0, len(scp.ChangeSet()))
+
+    def test_set_attribute_replaces(self):
+        self.change_set.set_attribute('BIOS.Setup.1-1', 'BootMode', 'Bios')
+
+        self.assertEqual(3, len(self.change_set))
+        self.assertEqual('Bios',
+                         self.change_set.components['BIOS.Setup.1-1'][
+                             'BootMode'])
+
+    def test_update(self):
+        other = scp.ChangeSet()
+        other.set_attributes('BIOS.Setup.1-1', {'BootMode': 'Bios'})
+        other.set_attribute('NIC.Integrated.1-1-1', 'LegacyBootProto', 'PXE')
+
+        self.change_set.update(other)
+
+        self.assertEqual(
+            {'iDRAC.Embedded.1': {'ServerBoot.1#FirstBootDevice': 'VCD-DVD'},
+             'BIOS.Setup.1-1': {'BootMode': 'Bios',
+                                'SriovGlobalEnable': 'Enabled'},
+             'NIC.Integrated.1-1-1': {'LegacyBootProto': 'PXE'}},
+            self.change_set.components)
+
+    def test_to_xml(self):
+        self.assertEqual(
+            '<SystemConfiguration>'
+            '<Component FQDD="iDRAC.Embedded.1">'
+            '<Attribute Name="ServerBoot.1#FirstBootDevice">VCD-DVD'
+            '</Attribute></Component>'
+            '<Component FQDD="BIOS.Setup.1-1">'
+            '<Attribute Name="BootMode">Uefi</Attribute>'
+            '<Attribute Name="SriovGlobalEnable">Enabled</Attribute>'
+            '</Component></SystemConfiguration>', self.change_set.to_xml())
+
+    def test_to_xml_escapes(self):
+        change_set = scp.ChangeSet()
+        change_set.set_attribute('iDRAC.Embedded.1', 'Users.2#Password',
+                                 'a<b&"c"')
+
+        self.assertEqual(
+            '<SystemConfiguration><Component FQDD="iDRAC.Embedded.1">'
+            '<Attribute Name="Users.2#Password">a&lt;b&amp;"c"</Attribute>'
+            '</Component></SystemConfiguration>', change_set.to_xml())
+
+    def test_to_json(self):
+        self.change_set.set_attribute('BIOS.Setup.1-1', 'Percent', '100%')
+
+        buffer = self.change_set.to_json()
+
+        self.assertNotIn(' ', buffer)
+        self.assertEqual(
+            {'SystemConfiguration': {'Components': [
+                {'FQDD': 'iDRAC.Embedded.1', 'Attributes': [
+                    {'Name': 'ServerBoot.1#FirstBootDevice',
+                     'Value': 'VCD-DVD'}]},
+                {'FQDD': 'BIOS.Setup.1-1', 'Attributes': [
+                    {'Name': 'BootMode', 'Value': 'Uefi'},
+                    {'Name': 'SriovGlobalEnable', 'Value': 'Enabled'},
+                    {'Name': 'Percent', 'Value': '100%'}]}]}},
+            json.loads(buffer))
+
+    def test_render_shares_template(self):
+        other = scp.ChangeSet()
+        other.set_attribute(
+            'iDRAC.Embedded.1', 'ServerBoot.1#FirstBootDevice', 'VFDD')
+        other.set_attributes(
+            'BIOS.Setup.1-1', {'BootMode': 'Bios', 'SriovGlobalEnable':
+                               'Disabled'})
+
+        self.assertEqual(self.change_set.layout, other.layout)
+        self.assertIs(scp.get_template(self.change_set.layout),
+                      scp.get_template(other.layout))
+        self.assertIn('<Attribute Name="BootMode">Bios</Attribute>',
+                      other.to_xml())
+
+
+class TemplateTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(TemplateTestCase, self).setUp()
+        self.layout = (('NIC.Integrated.1-1-1', ('LegacyBootProto',)),
+                       ('BIOS.Setup.1-1', ('BootMode', 'Name%s')))
+
+    def test_render_xml(self):
+        template = scp.Template(self.layout)
+
+        self.assertEqual(
+            '<SystemConfiguration><Component FQDD="NIC.Integrated.1-1-1">'
+            '<Attribute Name="LegacyBootProto">PXE</Attribute></Component>'
+            '<Component FQDD="BIOS.Setup.1-1">'
+            '<Attribute Name="BootMode">Uefi</Attribute>'
+            '<Attribute Name="Name%s">&lt;%d&gt;</Attribute>'
+            '</Component></SystemConfiguration>',
+            template.render(['PXE', 'Uefi', '<%d>']))
+
+    def test_render_json(self):
+        template = scp.Template(self.layout, scp.FORMAT_JSON)
+
+        doc = json.loads(template.render(['PXE', 'Uefi', 'a"b']))
+
+        components = doc['SystemConfiguration']['Components']
+        self.assertEqual(['NIC.Integrated.1-1-1', 'BIOS.Setup.1-1'],
+                         [c['FQDD'] for c in components])
+        self.assertEqual({'Name': 'Name%s', 'Value': 'a"b'},
+                         components[1]['Attributes'][1])
+
+    def test_render_wrong_count(self):
+        template = scp.Template(self.layout)
+
+        self.assertRaises(ValueError, template.render, ['PXE'])
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, scp.Template, self.layout, 'YAML')
+
+
+class ExportReaderTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ExportReaderTestCase, self).setUp()
+        with open('sushy_oem_idrac/tests/unit/json_samples/'
+                  'export_configuration_nic_bios.json', 'rb') as f:
+            self.content = f.read()
+        self.doc = json.loads(self.content)
+
+    def _chunks(self, content, size):
+        return [content[i:i + size] for i in range(0, len(content), size)]
+
+    def test_components(self):
+        for size in (1, 7, 4096, len(self.content)):
+            reader = scp.ExportReader(self._chunks(self.content, size))
+
+            self.assertEqual(self.doc['SystemConfiguration']['Components'],
+                             list(reader.components()))
+            self.assertTrue(reader.found)
+            header = dict(self.doc['SystemConfiguration'])
+            header.pop('Components')
+            self.assertEqual(header, reader.header)
+
+    def test_components_one_at_a_time(self):
+        reader = scp.ExportReader(self._chunks(self.content, 512))
+        components = reader.components()
+
+        first = next(components)
+
+        self.assertEqual('NIC.Integrated.1-4-1', first['FQDD'])
+        # Most of the 80 chunks are left unread
+        self.assertGreater(reader._chunks.__length_hint__(), 70)
+
+    def test_attributes(self):
+        content = ('{"SystemConfiguration": {"Components": [{"FQDD": "X.1",'
+                   ' "Attributes": [{"Name": "Count", "Value": 1234},'
+                   ' {"Name": "Label", "Value": "café"}]}],'
+                   ' "TimeStamp": "now"}, "Extra": 12345}').encode()
+
+        reader = scp.ExportReader(self._chunks(content, 1))
+
+        self.assertEqual([('X.1', 'Count', 1234), ('X.1', 'Label', 'caf\xe9')],
+                         list(reader.attributes()))
+        self.assertEqual({'TimeStamp': 'now'}, reader.header)
+
+    def test_numbers_split(self):
+        content = (b'{"SystemConfiguration": {"Version": 2.5e-3,'
+                   b' "Components": [{"FQDD": "X.1", "Attributes":'
+                   b' [{"Name": "Size", "Value": 1.25},'
+                   b' {"Name": "Count", "Value": -17E+2}]}],'
+                   b' "Ratio": 0.125}, "Extra": 1e10}')
+        doc = json.loads(content)
+        header = dict(doc['SystemConfiguration'])
+        header.pop('Components')
+
+        for split in range(1, len(content)):
+            reader = scp.ExportReader([content[:split], content[split:]])
+
+            self.assertEqual(doc['SystemConfiguration']['Components'],
+                             list(reader.components()), split)
+            self.assertEqual(header, reader.header, split)
+
+    def test_no_system_configuration(self):
+        reader = scp.ExportReader([b'{"Model": "PowerEdge R7525"}'])
+
+        self.assertEqual([], list(reader.components()))
+        self.assertFalse(reader.found)
+
+    def test_no_components(self):
+        reader = scp.ExportReader([b'{"SystemConfiguration": {"Model": "R"}}'])
+
+        self.assertEqual([], list(reader.components()))
+        self.assertTrue(reader.found)
+        self.assertEqual({'Model': 'R'}, reader.header)
+
+    def test_malformed(self):
+        for content in (b'{"SystemConfiguration": {"Components": [{"FQDD"',
+                        b'["SystemConfiguration"]',
+                        b'{"SystemConfiguration": {"Components": [{}} ]}}'):
+            reader = scp.ExportReader(self._chunks(content, 3))
+            self.assertRaises(ValueError, list, reader.components())
+
+    def test_from_response(self):
+        response = mock.Mock()
+        response.iter_content.return_value = [self.content]
+
+        reader = scp.ExportReader.from_response(response)
+
+        self.assertEqual(10, len(list(reader.components())))
+        response.iter_content.assert_called_once_with(
+            chunk_size=scp.EXPORT_CHUNK_SIZE)
+
+
+class ConfigurationTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ConfigurationTestCase, self).setUp()
+        with open('sushy_oem_idrac/tests/unit/json_samples/'
+                  'export_configuration_idrac.json', 'rb') as f:
+            self.content = f.read()
+        self.configuration = scp.Configuration.from_reader(
+            scp.ExportReader([self.content]))
+        self.idrac = self.configuration.get_component('iDRAC.Embedded.1')
+
+    def test_lookup(self):
+        self.assertEqual(1, len(self.configuration))
+        self.assertIn('iDRAC.Embedded.1', self.configuration)
+        self.assertIsNone(self.configuration.get_component('NIC.Slot.1-1-1'))
+        self.assertEqual(40, len(self.idrac))
+        self.assertIn('IPv4.1#Enable', self.idrac)
+        self.assertEqual('Enabled', self.configuration.get_value(
+            'iDRAC.Embedded.1', 'IPv4.1#Enable'))
+        self.assertEqual('n/a', self.configuration.get_value(
+            'iDRAC.Embedded.1', 'Bogus', 'n/a'))
+        self.assertEqual('n/a', self.configuration.get_value(
+            'NIC.Slot.1-1-1', 'IPv4.1#Enable', 'n/a'))
+
+    def test_find(self):
+        attributes = self.idrac.find(('IPv4Static', 'IPv4.1#Enable'))
+
+        self.assertEqual(
+            ['IPv4.1#Enable', 'IPv4Static.1#Address', 'IPv4Static.1#Netmask',
+             'IPv4Static.1#Gateway', 'IPv4Static.1#DNS1',
+             'IPv4Static.1#DNS2', 'IPv4Static.1#DNSFromDHCP'],
+            [a.name for a in attributes])
+        self.assertEqual(
+            [(self.idrac, attributes[0])],
+            self.configuration.find('IPv4.1#Enable'))
+
+    def test_remove(self):
+        removed = self.idrac.remove('IPv4Static')
+
+        self.assertEqual(6, len(removed))
+        self.assertEqual(34, len(self.idrac))
+        self.assertNotIn('IPv4Static.1#Address', self.idrac)
+        self.assertEqual([], self.idrac.find('IPv4Static'))
+        self.assertEqual([], self.idrac.remove('IPv4Static'))
+
+    def test_to_json(self):
+        self.assertEqual(json.dumps(json.loads(self.content)),
+                         self.configuration.to_json())
+
+    def test_attribute_extra(self):
+        component = scp.Component.from_dict({
+            'FQDD': 'RAID.Integrated.1-1', 'Components': [],
+            'Attributes': [{'Name': 'RAIDMode', 'Value': 'None',
+                            'Unknown': 1}]})
+
+        self.assertEqual({'Unknown': 1}, component.get('RAIDMode').extra)
+        self.assertIsNone(component.get('RAIDMode').comment)
+        self.assertEqual(
+            {'FQDD': 'RAID.Integrated.1-1',
+             'Attributes': [{'Name': 'RAIDMode', 'Value': 'None',
+                             'Unknown': 1}],
+             'Components': []}, component.to_dict())
+
+    def test_no_system_configuration(self):
+        self.assertIsNone(scp.Configuration.from_reader(
+            scp.ExportReader([b'{"Model": "PowerEdge R7525"}'])))
@@ -0,0 +1,289 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+import fixtures
+from oslotest.base import BaseTestCase
+
+from sushy_oem_idrac.resources.system import constants as sys_cons
+from sushy_oem_idrac.resources.system import raid_preparation
+from sushy_oem_idrac.resources.system.storage import constants as s_cons
+from sushy_oem_idrac.resources.system import system as oem_system
+from sushy_oem_idrac.resources.system import topology
+from sushy_oem_idrac.resources.taskservice import constants as ts_cons
+
+
+def _storage(identity, name, drives=(), raid_types=('RAID1',)):
+    controller = mock.Mock(raid_types=list(raid_types))
+    controller.name = name
+    return mock.Mock(identity=identity, path='/Storage/' + identity,
+                     storage_controllers=[controller], drives=list(drives))
+
+
+def _controller(mode, identity='RAID.Slot.6-1', etag='W/"gen-1"'):
+    controller = mock.Mock(identity=identity,
+                           json={'@odata.etag': 'W/"controller"'})
+    controller._settings.resource_uri = (
+        '/Storage/%s/Controllers/%s/Settings' % (identity, identity))
+    controller._settings._etag = etag
+    controller.get_oem_extension.return_value.dell_storage_controller\
+        .controller_mode = mode
+    return controller
+
+
+def _task_monitor(job_type=ts_cons.JobType.RAID_CONF):
+    task_monitor = mock.Mock()
+    task_monitor.task.get_oem_extension.return_value.job_type = job_type
+    return task_monitor
+
+
+class RaidPreparationTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(RaidPreparationTestCase, self).setUp()
+        self.raw_drive = mock.Mock(identity='Disk.Bay.0:RAID.Integrated.1-1')
+        self.raid_drive = mock.Mock(identity='Disk.Bay.1:RAID.Integrated.1-1')
+        self.hba = _storage('RAID.Slot.6-1', 'PERC H730P')
+        self.perc = _storage('RAID.Integrated.1-1', 'PERC H740P',
+                             [self.raw_drive, self.raid_drive])
+        boss = _storage('AHCI.Slot.2-1', 'BOSS-S1', [mock.Mock()])
+        nonraid = _storage('AHCI.Embedded.1-1', 'S140', raid_types=())
+        self.hba_controller = _controller(s_cons.ControllerMode.EHBA)
+
+        storage = [self.hba, self.perc, boss, nonraid]
+        self.topology = topology.StorageTopology(
+            storage, {s.path: s.drives for s in storage},
+            {self.raw_drive.path: [mock.Mock(volume_type='rawdevice',
+                                             raid_type=None)],
+             self.raid_drive.path: [mock.Mock(volume_type='Mirrored',
+                                              raid_type='RAID1')]},
+            {self.hba.path: [self.hba_controller],
+             self.perc.path: [_controller(s_cons.ControllerMode.RAID)],
+             boss.path: [_controller(None)],
+             nonraid.path: []})
+
+        self.system = oem_system.DellSystemExtension(
+            mock.Mock(), '/redfish/v1/Systems/System.Embedded.1')
+        self.system._parent_resource = mock.Mock()
+        self.raid_service = mock.Mock()
+        self.useFixture(fixtures.MockPatchObject(
+            oem_system.DellSystemExtension, 'raid_service',
+            self.raid_service))
+        self.mock_wait = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation.task_group, 'wait_for_tasks')).mock
+        self.mock_reboot = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation.utils, 'reboot_system')).mock
+
+    def test_create(self):
+        plan = raid_preparation.RaidPreparationPlan.create(self.topology)
+
+        self.assertEqual(
+            [(raid_preparation.STEP_CONTROLLER_MODE, self.hba),
+             (raid_preparation.STEP_FOREIGN_CONFIG, self.perc),
+             (raid_preparation.STEP_DISK_MODE, self.perc)],
+            [(step.kind, step.storage) for step in plan.steps])
+        self.assertIs(self.hba_controller, plan.steps[0].controller)
+        self.assertEqual([self.raw_drive], plan.steps[2].drives)
+        self.assertEqual([self.hba], plan.deferred)
+        self.assertTrue(plan.needs_reboot)
+        self.assertEqual(
+            '1. Convert controller RAID.Slot.6-1 to RAID mode on reset\n'
+            '2. Clear foreign configuration of RAID.Integrated.1-1, if any\n'
+            '3. Convert 1 physical disk(s) of RAID.Integrated.1-1 to RAID: '
+            'Disk.Bay.0:RAID.Integrated.1-1\n'
+            'Plan again after reboot: RAID.Slot.6-1', str(plan))
+
+    def test_create_nonraid(self):
+        plan = raid_preparation.RaidPreparationPlan.create(
+            self.topology, sys_cons.PhysicalDiskStateMode.NONRAID)
+
+        # No drives on the HBA, so no foreign config to clear either
+        self.assertEqual(
+            [(raid_preparation.STEP_FOREIGN_CONFIG, self.perc),
+             (raid_preparation.STEP_DISK_MODE, self.perc)],
+            [(step.kind, step.storage) for step in plan.steps])
+        self.assertEqual([self.raid_drive], plan.steps[1].drives)
+        self.assertFalse(plan.needs_reboot)
+
+    def test_create_no_foreign_config(self):
+        for drive in self.perc.drives:
+            drive.json = {'Oem': {'Dell': {'DellPhysicalDisk': {
+                'RaidStatus': 'Ready'}}}}
+
+        plan = raid_preparation.RaidPreparationPlan.create(self.topology)
+
+        self.assertEqual(
+            [raid_preparation.STEP_CONTROLLER_MODE,
+             raid_preparation.STEP_DISK_MODE],
+            [step.kind for step in plan.steps])
+
+    def test_create_empty(self):
+        plan = raid_preparation.RaidPreparationPlan.create(
+            topology.StorageTopology([], {}, {}, {}))
+
+        self.assertTrue(plan.empty)
+        self.assertEqual('Nothing to do', str(plan))
+
+    def test_convert_controllers_to_raid(self):
+        controllers = [_controller(s_cons.ControllerMode.EHBA),
+                       _controller(s_cons.ControllerMode.HBA,
+                                   'RAID.Slot.7-1', etag=None),
+                       _controller(s_cons.ControllerMode.RAID),
+                       _controller(None)]
+        for controller in controllers:
+            controller._conn.patch.return_value.status_code = 202
+        controllers[1]._conn.get.return_value.headers = {'ETag': '"gen-2"'}
+        mock_from_response = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation.taskmonitor.TaskMonitor,
+            'from_response')).mock
+
+        group = raid_preparation.convert_controllers_to_raid(controllers)
+
+        self.assertEqual(2, len(group))
+        self.assertTrue(group.reboot_required)
+        for controller, etag in zip(controllers, ['W/"gen-1"', '"gen-2"']):
+            uri = controller._settings.resource_uri
+            controller._conn.patch.assert_called_once_with(
+                uri, etag=etag, data={
+                    'Oem': {'Dell': {'DellStorageController': {
+                        'ControllerMode': 'RAID'}}},
+                    '@Redfish.SettingsApplyTime': {
+                        '@odata.type': '#Settings.v1_0_0.PreferredApplyTime',
+                        'ApplyTime': 'OnReset'}})
+            mock_from_response.assert_any_call(
+                controller._conn, controller._conn.patch.return_value, uri,
+                controller.redfish_version, controller.registries)
+        controllers[0]._conn.get.assert_not_called()
+        controllers[1]._conn.get.assert_called_once_with(
+            path=controllers[1]._settings.resource_uri)
+        for controller in controllers[2:]:
+            controller._conn.patch.assert_not_called()
+
+    def test_convert_controllers_to_raid_none(self):
+        group = raid_preparation.convert_controllers_to_raid(
+            [_controller(s_cons.ControllerMode.RAID)])
+
+        self.assertEqual(0, len(group))
+        self.assertFalse(group.reboot_required)
+
+    def test_convert_controllers_to_raid_system(self):
+        mock_load = self.useFixture(fixtures.MockPatchObject(
+            topology.StorageTopology, 'load',
+            return_value=self.topology)).mock
+        mock_convert = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation, '_convert_controller_to_raid')).mock
+
+        group = self.system.convert_controllers_to_raid()
+
+        mock_load.assert_called_once_with(self.system._parent_resource,
+                                          controllers=True)
+        mock_convert.assert_called_once_with(self.hba_controller)
+        self.assertEqual([mock_convert.return_value], list(group))
+
+    def test_prepare_raid(self):
+        mode_monitor = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation, '_convert_controller_to_raid')).mock\
+            .return_value
+        foreign_monitor = _task_monitor(ts_cons.JobType.RT_NO_REBOOT_CONF)
+        disk_monitor = _task_monitor()
+        self.raid_service.clear_foreign_config.return_value = foreign_monitor
+        self.raid_service.convert_to_raid.return_value = disk_monitor
+
+        result = self.system.prepare_raid(
+            self.system.plan_raid_preparation(topology=self.topology),
+            reboot=True)
+
+        self.assertEqual({'task_monitors': [mode_monitor, foreign_monitor,
+                                            disk_monitor],
+                          'reboot_required': True, 'rebooted': True,
+                          'deferred': [self.hba]}, result)
+        self.raid_service.clear_foreign_config.assert_called_once_with(
+            'RAID.Integrated.1-1')
+        self.raid_service.convert_to_raid.assert_called_once_with(
+            ['Disk.Bay.0:RAID.Integrated.1-1'])
+        self.mock_wait.assert_called_once_with(
+            [foreign_monitor],
+            deadline=raid_preparation.REALTIME_JOB_DEADLINE)
+        self.mock_reboot.assert_called_once_with(
+            self.system._parent_resource)
+
+    def test_prepare_raid_realtime_only(self):
+        self.topology._controllers[self.hba.path] = []
+        self.raid_service.clear_foreign_config.return_value = None
+        self.raid_service.convert_to_raid.return_value = _task_monitor(
+            ts_cons.JobType.RT_NO_REBOOT_CONF)
+
+        result = self.system.prepare_raid(
+            self.system.plan_raid_preparation(topology=self.topology),
+            reboot=True)
+
+        self.assertFalse(result['reboot_required'])
+        self.assertFalse(result['rebooted'])
+        self.mock_wait.assert_not_called()
+        self.mock_reboot.assert_not_called()
+
+    def test_prepare_raid_deferred(self):
+        drive = mock.Mock(identity='Disk.Bay.0:RAID.Slot.6-1')
+        self.hba.drives = [drive]
+        hba_topology = topology.StorageTopology(
+            [self.hba], {self.hba.path: [drive]},
+            {drive.path: [mock.Mock(volume_type='rawdevice',
+                                    raid_type=None)]},
+            {self.hba.path: [self.hba_controller]})
+        mock_convert = self.useFixture(fixtures.MockPatchObject(
+            raid_preparation, '_convert_controller_to_raid')).mock
+        disk_monitor = _task_monitor()
+        self.raid_service.clear_foreign_config.return_value = None
+        self.raid_service.convert_to_raid.return_value = disk_monitor
+
+        # First pass only changes the controller mode
+        first = self.system.prepare_raid(
+            self.system.plan_raid_preparation(topology=hba_topology),
+            reboot=True)
+
+        self.assertEqual({'task_monitors': [mock_convert.return_value],
+                          'reboot_required': True, 'rebooted': True,
+                          'deferred': [self.hba]}, first)
+        mock_convert.assert_called_once_with(self.hba_controller)
+        self.raid_service.clear_foreign_config.assert_not_called()
+        self.raid_service.convert_to_raid.assert_not_called()
+
+        # The reboot has applied RAID mode, the second pass converts disks
+        self.hba_controller.get_oem_extension.return_value\
+            .dell_storage_controller.controller_mode = (
+                s_cons.ControllerMode.RAID)
+        second = self.system.prepare_raid(
+            self.system.plan_raid_preparation(topology=hba_topology),
+            reboot=True)
+
+        self.assertEqual({'task_monitors': [disk_monitor],
+                          'reboot_required': True, 'rebooted': True,
+                          'deferred': []}, second)
+        mock_convert.assert_called_once_with(self.hba_controller)
+        self.raid_service.clear_foreign_config.assert_called_once_with(
+            'RAID.Slot.6-1')
+        self.raid_service.convert_to_raid.assert_called_once_with(
+            ['Disk.Bay.0:RAID.Slot.6-1'])
+        # Converting disks behind a controller changing mode takes two
+        self.assertEqual(2, self.mock_reboot.call_count)
+
+    def test_plan_raid_preparation_loads_controllers(self):
+        mock_load = self.useFixture(fixtures.MockPatchObject(
+            topology.StorageTopology, 'load',
+            return_value=self.topology)).mock
+
+        plan = self.system.plan_raid_preparation()
+
+        mock_load.assert_called_once_with(self.system._parent_resource,
+                                          controllers=True)
+        self.assertEqual(3, len(plan.steps))
@@ -16,10 +16,12 @@ import json
 from unittest import mock
 
 from oslotest.base import BaseTestCase
+from sushy import connector
 from sushy import exceptions
 from sushy import taskmonitor
 
 from sushy_oem_idrac.resources.system import raid_service
+from sushy_oem_idrac.tests.unit import redfish_server
 
 
 class DellRaidService(BaseTestCase):
@@ -168,6 +170,27 @@ class DellRaidService(BaseTestCase):
                           'RAID.Integrated.999')
 
     def test__get_task_monitor_from_dell_job(self):
+        task_mon = self.raid_service._get_task_monitor_from_dell_job(
+            self.mock_response)
+
+        self.assertIsInstance(task_mon, taskmonitor.TaskMonitor)
+        self.assertEqual('/redfish/v1/TaskService/Tasks/JID_999888777666',
+                         task_mon.task_monitor_uri)
+        self.conn.get.assert_called_with(
+            path='/redfish/v1/TaskService/Tasks/JID_999888777666')
+        self.root.get_task_service.assert_not_called()
+
+    def _task_not_found(self):
+        response = mock.Mock(status_code=404)
+        response.json.return_value = {}
+        self.conn.get.side_effect = [
+            exceptions.ResourceNotFoundError(
+                'GET', '/redfish/v1/TaskService/Tasks/JID_999888777666',
+                response),
+            mock.Mock(status_code=200)]
+
+    def test__get_task_monitor_from_dell_job_fallback(self):
+        self._task_not_found()
         mock_task1 = mock.Mock(identity='JID_111222333444',
                                path='/TaskService/Task/JID_111222333444')
         mock_task2 = mock.Mock(identity='JID_999888777666',
@@ -196,6 +219,7 @@ class DellRaidService(BaseTestCase):
             self.raid_service._get_task_monitor_from_dell_job, mock_response)
 
     def test__get_task_monitor_from_dell_job_task_not_found(self):
+        self._task_not_found()
         mock_task1 = mock.Mock(identity='JID_000000000000',
                                path='/TaskService/Task/JID_000000000000')
         mock_tasks = mock.Mock()
@@ -207,3 +231,42 @@ class DellRaidService(BaseTestCase):
             'not find task by id',
             self.raid_service._get_task_monitor_from_dell_job,
             self.mock_response)
+
+
+class DellRaidServiceStandInTestCase(BaseTestCase):
+
+    RAID_SERVICE = ('/redfish/v1/Systems/System.Embedded.1/Oem/Dell/'
+                    'DellRaidService')
+    CONVERT_TO_RAID = RAID_SERVICE + '/Actions/DellRaidService.ConvertToRAID'
+
+    def setUp(self):
+        super(DellRaidServiceStandInTestCase, self).setUp()
+        self.server = self.useFixture(redfish_server.RedfishServer())
+        with open('sushy_oem_idrac/tests/unit/json_samples/'
+                  'raid_service.json') as f:
+            self.server.add_route('GET', self.RAID_SERVICE,
+                                  (200, {}, json.load(f)))
+        with open('sushy_oem_idrac/tests/unit/json_samples/'
+                  'task.json') as f:
+            task = json.load(f)
+
+        task_ids = ['JID_%012d' % i for i in range(500)]
+        self.paths = self.server.add_tasks(task_ids, task)
+        self.server.add_route('POST', self.CONVERT_TO_RAID, (202, {
+            'Location': '/redfish/v1/Managers/iDRAC.Embedded.1/Oem/Dell/'
+                        'Jobs/JID_000000000499'}, None))
+
+        conn = connector.Connector(self.server.url, verify=False)
+        self.addCleanup(conn.close)
+        self.root = mock.Mock()
+        self.raid_service = raid_service.DellRaidService(
+            conn, self.RAID_SERVICE, root=self.root)
+        del self.server.requests[:]
+
+    def test_convert_to_raid_requests(self):
+        task_mon = self.raid_service.convert_to_raid(
+            ['Disk.Bay.0:Enclosure.Internal.0-1:RAID.Integrated.1-1'])
+
+        self.assertEqual(self.paths[-1], task_mon.task_monitor_uri)
+        self.assertEqual([('POST', self.CONVERT_TO_RAID),
+                          ('GET', self.paths[-1])], self.server.requests)
@@ -13,14 +13,17 @@
 #    under the License.
 
 import json
+import threading
 from unittest import mock
 
+import fixtures
 from oslotest.base import BaseTestCase
 from sushy import exceptions
 
 from sushy_oem_idrac.resources.system import constants as sys_cons
 from sushy_oem_idrac.resources.system import raid_service
 from sushy_oem_idrac.resources.system import system as oem_system
+from sushy_oem_idrac.resources.system import topology
 
 
 class SystemTestCase(BaseTestCase):
@@ -61,11 +64,18 @@ class SystemTestCase(BaseTestCase):
             storage_controllers=[mock.Mock(raid_types=[])])
         mock_storage_boss = mock_boss
         mock_storage_raid = mock_perc
-        mock_system.storage.get_members.return_value = [
-            mock_storage_nocontroller, mock_storage_nonraid, mock_storage_boss,
-            mock_storage_raid]
+        storage = [mock_storage_nocontroller, mock_storage_nonraid,
+                   mock_storage_boss, mock_storage_raid]
+        self.topology = topology.StorageTopology(
+            storage, {s.path: s.drives for s in storage},
+            {mock_perc_raid.path: None,
+             mock_perc_nonraid.path: mock_perc_nonraid.volumes})
         self.oem_system._parent_resource = mock_system
 
+        self.mock_load = self.useFixture(fixtures.MockPatchObject(
+            topology.StorageTopology, 'load',
+            return_value=self.topology)).mock
+
     def test_raid_service(self):
         with open('sushy_oem_idrac/tests/unit/json_samples/'
                   'raid_service.json') as f:
@@ -111,6 +121,77 @@ class SystemTestCase(BaseTestCase):
         mock_nonraid.assert_called_once_with(
             ['Disk.Bay.0:Enclosure.Internal.0-1:RAID.Integrated.1-1'])
 
+    def test_change_physical_disk_state_concurrent(self):
+        logger = self.useFixture(fixtures.FakeLogger(level='INFO'))
+        controllers = []
+        controller_to_disks = {}
+        for index in range(3):
+            controller = mock.MagicMock(raid_types=['RAID1'])
+            controller.name = 'PERC %d' % index
+            controllers.append(controller)
+            controller_to_disks[controller] = [mock.Mock(
+                identity='Disk.Bay.0:RAID.Slot.%d-1' % index,
+                volumes=[mock.Mock(volume_type='rawdevice',
+                                   raid_type=None)])]
+
+        # Every submission waits for all others to be in flight
+        barrier = threading.Barrier(3, timeout=5)
+
+        def _convert(drive_fqdds):
+            barrier.wait()
+            return drive_fqdds[0]
+
+        self.oem_system.raid_service.convert_to_raid = mock.Mock(
+            side_effect=_convert)
+
+        task_mons = self.oem_system.change_physical_disk_state(
+            sys_cons.PhysicalDiskStateMode.RAID,
+            controller_to_disks=controller_to_disks, topology=self.topology)
+
+        self.assertEqual(['Disk.Bay.0:RAID.Slot.%d-1' % index
+                          for index in range(3)], task_mons)
+        self.assertIn('Submitted conversion of 1 disk(s) of PERC 2 to RAID '
+                      'in ', logger.output)
+
+    def test_change_physical_disk_state_concurrent_one_fails(self):
+        logger = self.useFixture(fixtures.FakeLogger(level='INFO'))
+        controller_to_disks = {}
+        for index in range(3):
+            controller = mock.MagicMock(raid_types=['RAID1'])
+            controller.name = 'PERC %d' % index
+            controller_to_disks[controller] = [mock.Mock(
+                identity='Disk.Bay.0:RAID.Slot.%d-1' % index,
+                volumes=[mock.Mock(volume_type='rawdevice',
+                                   raid_type=None)])]
+        error = exceptions.ServerSideError(
+            method='POST', url='/ConvertToRAID', response=mock.MagicMock(
+                status_code=500, json=mock.Mock(return_value={})))
+
+        def _convert(drive_fqdds):
+            if drive_fqdds[0].endswith('Slot.1-1'):
+                raise error
+            return drive_fqdds[0]
+
+        self.oem_system.raid_service.convert_to_raid = mock.Mock(
+            side_effect=_convert)
+
+        exc = self.assertRaises(
+            exceptions.ServerSideError,
+            self.oem_system.change_physical_disk_state,
+            sys_cons.PhysicalDiskStateMode.RAID,
+            controller_to_disks=controller_to_disks, topology=self.topology)
+
+        self.assertIs(error, exc)
+        # Conversions of the other controllers are submitted regardless
+        self.assertEqual(3, self.oem_system.raid_service.convert_to_raid
+                         .call_count)
+        self.assertEqual(['Disk.Bay.0:RAID.Slot.0-1',
+                          'Disk.Bay.0:RAID.Slot.2-1'], exc.task_monitors)
+        self.assertIn('Failed to submit conversion of 1 disk(s) of PERC 1 '
+                      'to RAID', logger.output)
+        self.assertIn('Submitted conversion of 1 disk(s) of PERC 2 to RAID '
+                      'in ', logger.output)
+
     def test_clear_foreign_config(self):
         mock_taskmon = mock.Mock()
         mock_clear_foreign_config = mock.Mock()
@@ -121,3 +202,82 @@ class SystemTestCase(BaseTestCase):
         task_mons = self.oem_system.clear_foreign_config()
 
         self.assertEqual([mock_taskmon], task_mons)
+
+    def test_clear_foreign_config_none_reported(self):
+        for drive in self.topology.get_drives(self.topology.storage[3]):
+            drive.json = {'Oem': {'Dell': {'DellPhysicalDisk': {
+                'RaidStatus': 'Online'}}}}
+        self.oem_system.raid_service.clear_foreign_config = mock.Mock()
+
+        task_mons = self.oem_system.clear_foreign_config()
+
+        self.assertEqual([], task_mons)
+        self.oem_system.raid_service.clear_foreign_config.assert_not_called()
+
+    def test_clear_foreign_config_storage_list(self):
+        for drive in self.topology.get_drives(self.topology.storage[3]):
+            drive.json = {'Oem': {'Dell': {'DellPhysicalDisk': {
+                'RaidStatus': 'Online'}}}}
+        mock_taskmon = mock.Mock()
+        self.oem_system.raid_service.clear_foreign_config = mock.Mock(
+            return_value=mock_taskmon)
+
+        task_mons = self.oem_system.clear_foreign_config(
+            [self.topology.storage[3]])
+
+        self.assertEqual([mock_taskmon], task_mons)
+        self.mock_load.assert_not_called()
+
+    def test_get_storage_topology(self):
+        result = self.oem_system.get_storage_topology()
+
+        self.assertIs(self.topology, result)
+        self.mock_load.assert_called_once_with(
+            self.oem_system._parent_resource)
+
+    def test_change_physical_disk_state_drive_not_in_topology(self):
+        mock_drive = mock.Mock(
+            identity='Disk.Bay.2',
+            volumes=[mock.Mock(volume_type='rawdevice', raid_type=None)])
+        mock_controller = mock.MagicMock(raid_types=['RAID1'])
+        mock_controller.name = 'PERC'
+        self.oem_system.raid_service.convert_to_raid = mock.Mock()
+
+        self.oem_system.change_physical_disk_state(
+            sys_cons.PhysicalDiskStateMode.RAID,
+            controller_to_disks={mock_controller: [mock_drive]},
+            topology=self.topology)
+
+        self.oem_system.raid_service.convert_to_raid.assert_called_once_with(
+            ['Disk.Bay.2'])
+
+    def test_change_physical_disk_state_given_disks(self):
+        mock_drive = mock.Mock(
+            identity='Disk.Bay.2',
+            volumes=[mock.Mock(volume_type='rawdevice', raid_type=None)])
+        mock_controller = mock.MagicMock(raid_types=['RAID1'])
+        mock_controller.name = 'PERC'
+        self.oem_system.raid_service.convert_to_raid = mock.Mock()
+
+        self.oem_system.change_physical_disk_state(
+            sys_cons.PhysicalDiskStateMode.RAID,
+            controller_to_disks={mock_controller: [mock_drive]})
+
+        self.mock_load.assert_not_called()
+        self.oem_system.raid_service.convert_to_raid.assert_called_once_with(
+            ['Disk.Bay.2'])
+
+    def test_topology_reused(self):
+        self.oem_system.raid_service.clear_foreign_config = mock.Mock(
+            return_value=None)
+        self.oem_system.raid_service.convert_to_raid = mock.Mock()
+
+        snapshot = self.oem_system.get_storage_topology()
+        self.oem_system.clear_foreign_config(topology=snapshot)
+        self.oem_system.change_physical_disk_state(
+            sys_cons.PhysicalDiskStateMode.RAID, topology=snapshot)
+
+        self.mock_load.assert_called_once_with(
+            self.oem_system._parent_resource)
+        self.oem_system.raid_service.convert_to_raid.assert_called_once_with(
+            ['Disk.Bay.1:Enclosure.Internal.0-1:RAID.Integrated.1-1'])
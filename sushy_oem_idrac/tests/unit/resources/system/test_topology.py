@@ -0,0 +1,265 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import threading
+import time
+from unittest import mock
+
+import fixtures
+from oslotest.base import BaseTestCase
+import sushy
+from sushy import connector
+from sushy import exceptions
+from sushy.resources.system import system
+
+from sushy_oem_idrac.resources.system.storage import constants as s_cons
+from sushy_oem_idrac.resources.system import topology
+from sushy_oem_idrac.tests.unit import redfish_server
+from sushy_oem_idrac import utils
+
+SYSTEM_PATH = '/redfish/v1/Systems/System.Embedded.1'
+STORAGE_PATH = SYSTEM_PATH + '/Storage'
+
+
+def _ref(path):
+    return {'@odata.id': path}
+
+
+def _collection(path, members):
+    return {'@odata.id': path, 'Name': 'Collection', 'Members': members,
+            'Members@odata.count': len(members)}
+
+
+class StorageTopologyTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(StorageTopologyTestCase, self).setUp()
+        self.server = self.useFixture(redfish_server.RedfishServer())
+        self.docs = {}
+        self.collections = {}
+
+        perc = self._add_storage('RAID.Integrated.1-1', 'PERC H740P')
+        self._add_volume(perc, 'Disk.Virtual.0:RAID.Integrated.1-1',
+                         [self._add_drive(perc, 'Disk.Bay.0'),
+                          self._add_drive(perc, 'Disk.Bay.1')],
+                         raid_type='RAID1')
+        self._add_volume(perc, 'Disk.Bay.2:RAID.Integrated.1-1',
+                         [self._add_drive(perc, 'Disk.Bay.2')],
+                         volume_type='RawDevice')
+        self._add_drive(perc, 'Disk.Bay.3', volumes=None,
+                        raid_status='Foreign')
+        self._add_controller(perc, 'RAID.Integrated.1-1', 'EnhancedHBA')
+        boss = self._add_storage('AHCI.Slot.2-1', 'BOSS-S1')
+        self._add_drive(boss, 'Disk.Direct.0-0', raid_status='Online')
+        hba = self._add_storage('NonRAID.Slot.6-1', 'HBA330')
+        self._add_drive(hba, 'Disk.Bay.0')
+
+        with open('sushy_oem_idrac/tests/unit/json_samples/'
+                  'system.json') as f:
+            self.server.add_route('GET', SYSTEM_PATH, (200, {}, json.load(f)))
+
+        conn = connector.Connector(self.server.url, verify=False)
+        self.addCleanup(conn.close)
+        self.system = system.System(conn, SYSTEM_PATH,
+                                    redfish_version='1.0.2')
+
+    def _add_storage(self, identity, name):
+        path = '%s/%s' % (STORAGE_PATH, identity)
+        self.docs[path] = {
+            '@odata.id': path, 'Id': identity, 'Name': name, 'Drives': [],
+            'StorageControllers': [{
+                'MemberId': identity, 'Name': name,
+                'SupportedRAIDTypes': ['RAID0', 'RAID1']}],
+            'Volumes': _ref(path + '/Volumes')}
+        self.collections.setdefault(STORAGE_PATH, []).append(path)
+        self.collections[path + '/Volumes'] = []
+        return path
+
+    def _add_controller(self, storage, identity, mode):
+        collection = storage + '/Controllers'
+        path = '%s/%s' % (collection, identity)
+        self.docs[storage]['Controllers'] = _ref(collection)
+        self.docs[path] = {
+            '@odata.id': path, 'Id': identity, 'Name': identity,
+            'Oem': {'Dell': {'DellStorageController': {
+                'ControllerMode': mode}}}}
+        self.collections.setdefault(collection, []).append(path)
+        return path
+
+    def _add_drive(self, storage, identity, volumes=(), raid_status=None):
+        path = '%s/Drives/%s:%s' % (storage, identity, storage.split('/')[-1])
+        self.docs[path] = {'@odata.id': path, 'Id': path.split('/')[-1],
+                           'Name': identity}
+        if raid_status:
+            self.docs[path]['Oem'] = {'Dell': {'DellPhysicalDisk': {
+                'RaidStatus': raid_status}}}
+        if volumes is not None:
+            self.docs[path]['Links'] = {'Volumes': list(volumes)}
+        self.docs[storage]['Drives'].append(_ref(path))
+        return path
+
+    def _add_volume(self, storage, identity, drives, volume_type=None,
+                    raid_type=None):
+        path = '%s/Volumes/%s' % (storage, identity)
+        self.docs[path] = {'@odata.id': path, 'Id': identity,
+                           'Name': identity, 'VolumeType': volume_type,
+                           'RAIDType': raid_type,
+                           'Links': {'Drives': [_ref(d) for d in drives]}}
+        self.collections[storage + '/Volumes'].append(path)
+        for drive in drives:
+            self.docs[drive]['Links']['Volumes'].append(_ref(path))
+        return path
+
+    def _serve(self, expand, wrap=lambda response: response):
+        for path, doc in self.docs.items():
+            self.server.add_route('GET', path, wrap((200, {}, doc)))
+        for path, members in self.collections.items():
+            self.server.add_route('GET', path + topology.EXPAND_QUERY, (
+                200, {}, _collection(path, [
+                    self.docs[m] if expand else _ref(m) for m in members])))
+        del self.server.requests[:]
+
+    def _assert_topology(self, snapshot):
+        self.assertEqual(['PERC H740P', 'BOSS-S1', 'HBA330'],
+                         [s.name for s in snapshot.storage])
+        perc, boss, hba = snapshot.storage
+        self.assertEqual(['PERC H740P'],
+                         [c.name for c in perc.storage_controllers])
+
+        drives = snapshot.get_drives(perc)
+        self.assertEqual(['Disk.Bay.0', 'Disk.Bay.1', 'Disk.Bay.2',
+                          'Disk.Bay.3'], [d.name for d in drives])
+        self.assertEqual(['Disk.Direct.0-0'],
+                         [d.name for d in snapshot.get_drives(boss)])
+
+        volumes = snapshot.get_volumes(drives[0])
+        self.assertEqual(['Disk.Virtual.0:RAID.Integrated.1-1'],
+                         [v.identity for v in volumes])
+        self.assertEqual(sushy.RAIDType.RAID1, volumes[0].raid_type)
+        self.assertIs(volumes[0], snapshot.get_volumes(drives[1])[0])
+        self.assertEqual(sushy.VOLUME_TYPE_RAW_DEVICE,
+                         snapshot.get_volumes(drives[2])[0].volume_type)
+        self.assertRaises(exceptions.MissingAttributeError,
+                          snapshot.get_volumes, drives[3])
+        self.assertEqual([], snapshot.get_volumes(
+            snapshot.get_drives(boss)[0]))
+
+        self.assertTrue(snapshot.has_foreign_config(perc))
+        self.assertFalse(snapshot.has_foreign_config(boss))
+        self.assertIsNone(snapshot.has_foreign_config(hba))
+
+    def test_load_expanded(self):
+        self._serve(expand=True)
+
+        snapshot = topology.StorageTopology.load(self.system)
+
+        self._assert_topology(snapshot)
+        # Storage and PERC volume collections, then the 6 drives
+        self.assertEqual(2 + 6, len(self.server.requests))
+        self.assertEqual(1, self.server.count(
+            'GET', STORAGE_PATH + topology.EXPAND_QUERY))
+
+    def test_load_not_expanded(self):
+        self._serve(expand=False)
+
+        snapshot = topology.StorageTopology.load(self.system)
+
+        self._assert_topology(snapshot)
+        # Storage and PERC volume collections, then the 3 storage, the 6
+        # drives and the 2 volumes
+        self.assertEqual(2 + 3 + 6 + 2, len(self.server.requests))
+        self.assertEqual(1, max(self.server.count('GET', path)
+                                for _, path in self.server.requests))
+
+    def test_load_expand_rejected(self):
+        self._serve(expand=False)
+        for path, members in self.collections.items():
+            self.server.add_route('GET', path + topology.EXPAND_QUERY, (
+                501, {}, {'error': {'message': 'Not implemented'}}))
+            self.server.add_route('GET', path, (
+                200, {}, _collection(path, [_ref(m) for m in members])))
+
+        snapshot = topology.StorageTopology.load(self.system)
+
+        self._assert_topology(snapshot)
+        # The query is given up on once rejected
+        self.assertEqual(
+            [('GET', STORAGE_PATH + topology.EXPAND_QUERY),
+             ('GET', STORAGE_PATH)], self.server.requests[:2])
+        self.assertEqual(1, len([path for _, path in self.server.requests
+                                 if topology.EXPAND_QUERY in path]))
+
+    def test_load_expand_not_supported(self):
+        self._serve(expand=False)
+        for path, members in self.collections.items():
+            self.server.add_route('GET', path, (
+                200, {}, _collection(path, [_ref(m) for m in members])))
+        root = mock.Mock()
+        root.protocol_features_supported.expand_query = None
+        self.system._root = root
+
+        snapshot = topology.StorageTopology.load(self.system)
+
+        self._assert_topology(snapshot)
+        self.assertFalse([path for _, path in self.server.requests
+                          if topology.EXPAND_QUERY in path])
+
+    def test_load_controllers(self):
+        self._serve(expand=True)
+
+        snapshot = topology.StorageTopology.load(self.system,
+                                                 controllers=True)
+
+        self._assert_topology(snapshot)
+        # The expanded PERC controller collection on top
+        self.assertEqual(2 + 6 + 1, len(self.server.requests))
+        perc, boss, _ = snapshot.storage
+        controller, = snapshot.get_controllers(perc)
+        self.assertEqual('RAID.Integrated.1-1', controller.identity)
+        self.assertEqual(
+            s_cons.ControllerMode.EHBA,
+            controller.get_oem_extension('Dell').dell_storage_controller
+            .controller_mode)
+        self.assertEqual([], snapshot.get_controllers(boss))
+
+    def test_load_concurrent_requests_capped(self):
+        self.useFixture(fixtures.MockPatchObject(
+            utils, 'IDRAC_MAX_CONCURRENT_REQUESTS', 2))
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def _slow(response):
+            def _handle(data, path):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active)
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+                return response
+            return _handle
+
+        self._serve(expand=False, wrap=_slow)
+        snapshots = []
+        threads = [threading.Thread(target=lambda: snapshots.append(
+            topology.StorageTopology.load(self.system)))
+            for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, len(snapshots))
+        for snapshot in snapshots:
+            self._assert_topology(snapshot)
+        self.assertEqual(2, active[1])
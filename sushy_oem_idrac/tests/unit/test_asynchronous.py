@@ -14,12 +14,24 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from email import utils as email_utils
+import threading
+import time
 from unittest import mock
 
+import fixtures
 from oslotest.base import BaseTestCase
 import sushy
+from sushy import connector
 
+from sushy_oem_idrac import asynchronous
+from sushy_oem_idrac.asynchronous import async_http_call
 from sushy_oem_idrac.asynchronous import http_call
+from sushy_oem_idrac.tests.unit import redfish_server
 
 
 class AsychronousTestCase(BaseTestCase):
@@ -53,3 +65,572 @@ class AsychronousTestCase(BaseTestCase):
 
         self.assertRaises(sushy.exceptions.ExtensionError,
                           http_call, self.conn, 'POST')
+
+    def test_http_call_task_poller(self):
+        mock_poller = mock.Mock()
+        mock_future = mock_poller.http_call.return_value
+
+        resp = http_call(self.conn, 'POST', '/action', data={},
+                         sushy_task_poller=mock_poller)
+
+        self.assertIs(mock_future.result.return_value, resp)
+        mock_poller.http_call.assert_called_once_with(
+            self.conn, 'POST', '/action', data={})
+        self.conn.post.assert_not_called()
+
+    @mock.patch('time.sleep', autospec=True)
+    def test_http_call_poll_policy(self, mock_sleep):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers = {'Location': '/task'}
+        mock_get_202_response = mock.Mock(status_code=202, headers={})
+        mock_get_200_response = mock.Mock(status_code=200)
+        self.conn.get.side_effect = [
+            mock_get_202_response, mock_get_202_response,
+            mock_get_200_response]
+        policy = asynchronous.ExponentialPollPolicy(
+            initial=2, factor=3, max_delay=10, jitter=0)
+        asynchronous.poll_stats.reset()
+        self.addCleanup(asynchronous.poll_stats.reset)
+
+        resp = http_call(self.conn, 'POST', sushy_poll_policy=policy,
+                         sushy_task_operation='test')
+
+        self.assertIs(resp, mock_get_200_response)
+        self.assertEqual([mock.call(2), mock.call(6), mock.call(10)],
+                         mock_sleep.call_args_list)
+        self.assertEqual({'operations': 1, 'polls': 3, 'max_polls': 3},
+                         asynchronous.poll_stats.get('test'))
+
+    @mock.patch('time.sleep', autospec=True)
+    def test_http_call_operation_poll_policy(self, mock_sleep):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers = {'Location': '/task'}
+        self.conn.get.return_value = mock.Mock(status_code=200)
+        mock_policy = mock.Mock(spec=asynchronous.PollPolicy)
+        mock_policy.get_delay.return_value = 7
+        asynchronous.set_poll_policy(mock_policy, 'test')
+        self.addCleanup(asynchronous.set_poll_policy, None, 'test')
+
+        http_call(self.conn, 'POST', sushy_task_operation='test')
+
+        mock_policy.get_delay.assert_called_once_with(0, None)
+        mock_sleep.assert_called_once_with(7)
+
+    def _setup_pending(self):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers = {'Location': '/task'}
+        self.conn.get.return_value = mock.Mock(
+            status_code=202, headers={'Location': '/task/1'})
+
+    def test_http_call_deadline(self):
+        self._setup_pending()
+
+        start = time.monotonic()
+        exc = self.assertRaises(
+            asynchronous.TaskTimeoutError, http_call, self.conn, 'POST',
+            sushy_task_poll_period=0.05, sushy_task_deadline=0.2)
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual('/task/1', exc.location)
+        self.assertEqual('deadline exceeded', exc.reason)
+        self.assertIsInstance(exc, sushy.exceptions.ExtensionError)
+
+    def test_http_call_cancel(self):
+        self._setup_pending()
+        cancel = threading.Event()
+        timer = threading.Timer(0.1, cancel.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        start = time.monotonic()
+        exc = self.assertRaises(
+            asynchronous.TaskTimeoutError, http_call, self.conn, 'POST',
+            sushy_task_poll_period=60, sushy_task_cancel=cancel)
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual('/task', exc.location)
+        self.assertEqual('cancelled', exc.reason)
+        self.conn.get.assert_not_called()
+
+    def test_http_call_cancelled_already(self):
+        self._setup_pending()
+        cancel = threading.Event()
+        cancel.set()
+
+        self.assertRaises(
+            asynchronous.TaskTimeoutError, http_call, self.conn, 'POST',
+            sushy_task_cancel=cancel)
+
+        self.conn.get.assert_not_called()
+
+    @mock.patch.object(asynchronous, '_default_task_poller', autospec=True)
+    def test_http_call_default_task_poller(self, mock_poller):
+        resp = http_call(self.conn, 'POST', '/action',
+                         sushy_task_poll_period=0)
+
+        mock_future = mock_poller.http_call.return_value
+        self.assertIs(mock_future.result.return_value, resp)
+        mock_poller.http_call.assert_called_once_with(
+            self.conn, 'POST', '/action', sushy_task_poll_period=0)
+
+
+class RetryAfterTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(RetryAfterTestCase, self).setUp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'sushy_oem_idrac.asynchronous._clock_skews', {}))
+
+    def _response(self, retry_after, server_now=None):
+        headers = {'Retry-After': retry_after}
+        if server_now is not None:
+            headers['Date'] = email_utils.format_datetime(server_now,
+                                                          usegmt=True)
+        return mock.Mock(headers=headers)
+
+    def test_seconds(self):
+        self.assertEqual(
+            120, asynchronous._get_retry_after(self._response('120')))
+
+    def test_none(self):
+        self.assertIsNone(
+            asynchronous._get_retry_after(mock.Mock(headers={})))
+
+    def test_malformed(self):
+        self.assertIsNone(
+            asynchronous._get_retry_after(self._response('soon-ish')))
+
+    def test_http_date_server_clock(self):
+        # iDRAC clock is an hour ahead of ours
+        server_now = (datetime.now(timezone.utc) + timedelta(hours=1)
+                      ).replace(microsecond=0)
+        retry_at = email_utils.format_datetime(
+            server_now + timedelta(seconds=30), usegmt=True)
+
+        delay = asynchronous._get_retry_after(
+            self._response(retry_at, server_now), '1.2.3.4')
+
+        self.assertAlmostEqual(30, delay, delta=2)
+        self.assertIn('1.2.3.4', asynchronous._clock_skews)
+
+    def test_http_date_cached_skew(self):
+        # iDRAC clock is an hour behind ours
+        server_now = (datetime.now(timezone.utc) - timedelta(hours=1)
+                      ).replace(microsecond=0)
+        retry_at = email_utils.format_datetime(
+            server_now + timedelta(seconds=30), usegmt=True)
+        asynchronous._get_retry_after(
+            self._response(retry_at, server_now), '1.2.3.4')
+
+        with mock.patch.object(asynchronous, '_parse_http_date',
+                               wraps=asynchronous._parse_http_date
+                               ) as mock_parse:
+            delay = asynchronous._get_retry_after(
+                self._response(retry_at, server_now), '1.2.3.4')
+
+        self.assertAlmostEqual(30, delay, delta=2)
+        # Only Retry-After gets parsed, Date is not
+        mock_parse.assert_called_once_with(retry_at)
+
+    def test_http_date_no_date_header(self):
+        retry_at = email_utils.format_datetime(
+            datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+        delay = asynchronous._get_retry_after(self._response(retry_at))
+
+        self.assertAlmostEqual(30, delay, delta=2)
+
+    def test_http_date_unknown_host(self):
+        for hours in (1, -1):
+            server_now = (datetime.now(timezone.utc)
+                          + timedelta(hours=hours)).replace(microsecond=0)
+            retry_at = email_utils.format_datetime(
+                server_now + timedelta(seconds=30), usegmt=True)
+
+            delay = asynchronous._get_retry_after(
+                self._response(retry_at, server_now))
+
+            self.assertAlmostEqual(30, delay, delta=2)
+
+        self.assertEqual({}, asynchronous._clock_skews)
+
+    def test_clamped(self):
+        server_now = datetime.now(timezone.utc)
+        past = email_utils.format_datetime(
+            server_now - timedelta(seconds=30), usegmt=True)
+        future = email_utils.format_datetime(
+            server_now + timedelta(days=1), usegmt=True)
+
+        self.assertEqual(
+            asynchronous.RETRY_AFTER_MIN_DELAY,
+            asynchronous._get_retry_after(self._response(past, server_now)))
+        self.assertEqual(
+            asynchronous.RETRY_AFTER_MAX_DELAY,
+            asynchronous._get_retry_after(self._response(future, server_now)))
+
+    @mock.patch.object(asynchronous, 'RETRY_AFTER_MAX_DELAY', 10)
+    def test_clamped_configured(self):
+        self.assertEqual(
+            10, asynchronous._get_retry_after(self._response('120')))
+
+
+class PollPolicyTestCase(BaseTestCase):
+
+    def test_fixed(self):
+        policy = asynchronous.FixedPollPolicy(3)
+
+        self.assertEqual([3, 3, 3], [policy.get_delay(i) for i in range(3)])
+        self.assertEqual(5, policy.get_delay(0, retry_after=5))
+
+    def test_exponential(self):
+        policy = asynchronous.ExponentialPollPolicy(
+            initial=1, factor=2, max_delay=15, jitter=0)
+
+        self.assertEqual([1, 2, 4, 8, 15, 15],
+                         [policy.get_delay(i) for i in range(6)])
+        self.assertEqual(30, policy.get_delay(0, retry_after=30))
+
+    def test_exponential_ignore_retry_after(self):
+        policy = asynchronous.ExponentialPollPolicy(
+            initial=1, jitter=0, honor_retry_after=False)
+
+        self.assertEqual(1, policy.get_delay(0, retry_after=30))
+
+    def test_exponential_jitter(self):
+        policy = asynchronous.ExponentialPollPolicy(
+            initial=4, factor=2, max_delay=10, jitter=0.5)
+
+        for _ in range(100):
+            self.assertTrue(2 <= policy.get_delay(0) <= 6)
+            self.assertTrue(5 <= policy.get_delay(5) <= 10)
+
+    def test_get_poll_policy(self):
+        self.assertIsInstance(
+            asynchronous.get_poll_policy('export_system_configuration'),
+            asynchronous.ExponentialPollPolicy)
+        self.assertIs(asynchronous.get_poll_policy(),
+                      asynchronous.get_poll_policy('unknown'))
+
+    def test_set_poll_policy_default(self):
+        default = asynchronous.get_poll_policy()
+        self.addCleanup(asynchronous.set_poll_policy, default)
+        policy = asynchronous.FixedPollPolicy(5)
+
+        asynchronous.set_poll_policy(policy)
+
+        self.assertIs(policy, asynchronous.get_poll_policy('unknown'))
+
+
+class PollStatsTestCase(BaseTestCase):
+
+    def test_record(self):
+        stats = asynchronous.PollStats()
+
+        stats.record('export', 3)
+        stats.record('export', 5)
+        stats.record(None, 1)
+
+        self.assertEqual({'operations': 2, 'polls': 8, 'max_polls': 5},
+                         stats.get('export'))
+        self.assertEqual(
+            {'export': {'operations': 2, 'polls': 8, 'max_polls': 5},
+             'default': {'operations': 1, 'polls': 1, 'max_polls': 1}},
+            stats.get())
+
+        stats.reset()
+
+        self.assertEqual({'operations': 0, 'polls': 0, 'max_polls': 0},
+                         stats.get('export'))
+
+
+class AsyncHttpCallTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(AsyncHttpCallTestCase, self).setUp()
+        self.conn = mock.Mock()
+
+    def test_async_http_call_post_accepted(self):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers.get.return_value = '0'
+
+        mock_get_202_response = mock.Mock()
+        mock_get_202_response.status_code = 202
+        mock_get_202_response.headers.get.return_value = '0'
+
+        mock_get_200_response = mock.Mock()
+        mock_get_200_response.status_code = 200
+
+        self.conn.get.side_effect = [
+            mock_get_202_response, mock_get_200_response]
+
+        resp = asyncio.run(async_http_call(self.conn, 'POST'))
+
+        self.assertIs(resp, mock_get_200_response)
+        self.conn.get.assert_called_with('0')
+
+    def test_async_http_call_post_accepted_no_location(self):
+        mock_response = self.conn.post.return_value
+        mock_response.status_code = 202
+        mock_response.headers.get.return_value = None
+
+        self.assertRaises(sushy.exceptions.ExtensionError,
+                          asyncio.run, async_http_call(self.conn, 'POST'))
+
+    def test_async_http_call_deadline(self):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers = {'Location': '/task'}
+        self.conn.get.return_value = mock.Mock(status_code=202, headers={})
+
+        exc = self.assertRaises(
+            asynchronous.TaskTimeoutError, asyncio.run,
+            async_http_call(self.conn, 'POST', sushy_task_poll_period=0.05,
+                            sushy_task_deadline=0.2))
+
+        self.assertEqual('/task', exc.location)
+
+    def test_async_http_call_cancel(self):
+        mock_post_response = self.conn.post.return_value
+        mock_post_response.status_code = 202
+        mock_post_response.headers = {'Location': '/task'}
+
+        async def _run():
+            cancel = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, cancel.set)
+            return await async_http_call(
+                self.conn, 'POST', sushy_task_poll_period=60,
+                sushy_task_cancel=cancel)
+
+        start = time.monotonic()
+        exc = self.assertRaises(asynchronous.TaskTimeoutError,
+                                asyncio.run, _run())
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual('cancelled', exc.reason)
+        self.conn.get.assert_not_called()
+
+    def test_async_http_call_failed(self):
+        mock_response = self.conn.post.return_value
+        mock_response.status_code = 500
+
+        self.assertRaises(sushy.exceptions.ExtensionError,
+                          asyncio.run, async_http_call(self.conn, 'POST'))
+
+
+class AsyncHttpCallStandInTestCase(BaseTestCase):
+
+    ACTION = '/redfish/v1/Managers/iDRAC.Embedded.1/Actions/Export'
+
+    def setUp(self):
+        super(AsyncHttpCallStandInTestCase, self).setUp()
+        self.server = self.useFixture(redfish_server.RedfishServer())
+        self.conn = connector.Connector(self.server.url, verify=False)
+        self.addCleanup(self.conn.close)
+
+    def _add_task(self, job_id, polls):
+        location = '/redfish/v1/TaskService/Tasks/%s' % job_id
+        accepted = (202, {'Location': location, 'Retry-After': '0'}, None)
+        self.server.add_route(
+            'GET', location,
+            [accepted] * polls + [(200, {}, {'Id': job_id})])
+        return location
+
+    def test_concurrent_tasks(self):
+        tasks = {'JID_%03d' % i: self._add_task('JID_%03d' % i, i % 3)
+                 for i in range(20)}
+
+        def _post(data, path):
+            location = tasks[data['JobId']]
+            return 202, {'Location': location}, None
+
+        self.server.add_route('POST', self.ACTION, _post)
+
+        async def _run():
+            return await asyncio.gather(
+                *[async_http_call(self.conn, 'post', self.ACTION,
+                                  data={'JobId': job_id},
+                                  sushy_task_poll_period=0)
+                  for job_id in tasks])
+
+        responses = asyncio.run(_run())
+
+        self.assertEqual(list(tasks), [r.json()['Id'] for r in responses])
+        self.assertEqual(20, self.server.count('POST', self.ACTION))
+        self.assertEqual(3, self.server.count('GET', tasks['JID_002']))
+
+    def test_task_failed(self):
+        location = '/redfish/v1/TaskService/Tasks/JID_001'
+        self.server.add_route(
+            'POST', self.ACTION, (202, {'Location': location}, None))
+        self.server.add_route(
+            'GET', location, (500, {}, {'error': {'message': 'Failed'}}))
+
+        self.assertRaises(
+            sushy.exceptions.ServerSideError, asyncio.run,
+            async_http_call(self.conn, 'post', self.ACTION, data={},
+                            sushy_task_poll_period=0))
+
+    def test_no_location(self):
+        self.server.add_route('POST', self.ACTION, (202, {}, None))
+
+        self.assertRaises(
+            sushy.exceptions.ExtensionError, asyncio.run,
+            async_http_call(self.conn, 'post', self.ACTION, data={},
+                            sushy_task_poll_period=0))
+
+
+class TaskPollerTestCase(BaseTestCase):
+
+    ACTION = '/redfish/v1/Managers/iDRAC.Embedded.1/Actions/Import'
+
+    def setUp(self):
+        super(TaskPollerTestCase, self).setUp()
+        self.poller = asynchronous.TaskPoller(max_workers=2)
+        self.addCleanup(self.poller.shutdown)
+        self.servers = [self.useFixture(redfish_server.RedfishServer())
+                        for _ in range(2)]
+        self.conns = [connector.Connector(s.url, verify=False)
+                      for s in self.servers]
+        for conn in self.conns:
+            self.addCleanup(conn.close)
+
+    def _add_task(self, server, job_id, polls):
+        location = '/redfish/v1/TaskService/Tasks/%s' % job_id
+        accepted = (202, {'Location': location}, None)
+        server.add_route('POST', self.ACTION + job_id, accepted)
+        server.add_route(
+            'GET', location,
+            [accepted] * polls + [(200, {}, {'Id': job_id})])
+        return location
+
+    def test_http_call(self):
+        calls = []
+        for i in range(10):
+            server, conn = self.servers[i % 2], self.conns[i % 2]
+            job_id = 'JID_%03d' % i
+            location = self._add_task(server, job_id, i % 3)
+            calls.append((job_id, location, server, self.poller.http_call(
+                conn, 'post', self.ACTION + job_id, data={},
+                sushy_task_poll_period=0)))
+
+        for job_id, location, server, future in calls:
+            self.assertEqual(job_id, future.result(timeout=10).json()['Id'])
+            self.assertEqual(int(job_id[-3:]) % 3 + 1,
+                             server.count('GET', location))
+
+    def test_http_call_not_accepted(self):
+        self.servers[0].add_route('POST', self.ACTION, (200, {}, {'Id': 1}))
+
+        future = self.poller.http_call(self.conns[0], 'post', self.ACTION)
+
+        self.assertEqual({'Id': 1}, future.result(timeout=10).json())
+        self.assertEqual(0, self.servers[0].count('GET'))
+
+    def test_http_call_no_location(self):
+        self.servers[0].add_route('POST', self.ACTION, (202, {}, None))
+
+        future = self.poller.http_call(self.conns[0], 'post', self.ACTION)
+
+        self.assertRaises(sushy.exceptions.ExtensionError,
+                          future.result, timeout=10)
+
+    def test_http_call_task_failed(self):
+        self._add_task(self.servers[0], 'JID_001', 0)
+        self.servers[0].add_route(
+            'GET', '/redfish/v1/TaskService/Tasks/JID_001',
+            (500, {}, {'error': {'message': 'Failed'}}))
+
+        future = self.poller.http_call(
+            self.conns[0], 'post', self.ACTION + 'JID_001',
+            sushy_task_poll_period=0)
+
+        self.assertRaises(sushy.exceptions.ServerSideError,
+                          future.result, timeout=10)
+
+    def test_poll_grouped_by_host(self):
+        mock_conns = [mock.Mock(_url='https://%s' % h)
+                      for h in ('1.2.3.4', '1.2.3.4', '5.6.7.8')]
+        for conn in mock_conns:
+            conn.post.return_value.status_code = 202
+            conn.post.return_value.headers = {'Location': '/task'}
+            conn.get.return_value.status_code = 200
+
+        with mock.patch.object(self.poller, '_poll_host',
+                               autospec=True) as mock_poll_host:
+            mock_poll_host.side_effect = (
+                lambda host, tasks: [t.future.set_result(host)
+                                     for t in tasks])
+            results = [self.poller.http_call(conn, 'post', self.ACTION,
+                                             sushy_task_poll_period=0.1)
+                       for conn in mock_conns]
+            self.assertEqual(['1.2.3.4', '1.2.3.4', '5.6.7.8'],
+                             [f.result(timeout=10) for f in results])
+
+        hosts = sorted(c[0][0] for c in mock_poll_host.call_args_list)
+        self.assertEqual(['1.2.3.4', '5.6.7.8'], hosts)
+
+    def test_http_call_deadline(self):
+        self._add_task(self.servers[0], 'JID_001', 100)
+
+        future = self.poller.http_call(
+            self.conns[0], 'post', self.ACTION + 'JID_001',
+            sushy_task_poll_period=0.05, sushy_task_deadline=0.3)
+
+        exc = self.assertRaises(asynchronous.TaskTimeoutError,
+                                future.result, timeout=10)
+        self.assertEqual('/redfish/v1/TaskService/Tasks/JID_001',
+                         exc.location)
+
+    def test_http_call_cancelled_future(self):
+        location = self._add_task(self.servers[0], 'JID_001', 0)
+
+        future = self.poller.http_call(
+            self.conns[0], 'post', self.ACTION + 'JID_001',
+            sushy_task_poll_period=0.1)
+        future.cancel()
+        time.sleep(0.5)
+
+        self.assertTrue(future.cancelled())
+        self.assertEqual(0, self.servers[0].count('GET', location))
+
+    def test_http_call_cancel(self):
+        location = self._add_task(self.servers[0], 'JID_001', 0)
+        cancel = threading.Event()
+        timer = threading.Timer(0.1, cancel.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        start = time.monotonic()
+        exc = self.assertRaises(
+            asynchronous.TaskTimeoutError, http_call, self.conns[0], 'post',
+            self.ACTION + 'JID_001', sushy_task_poller=self.poller,
+            sushy_task_poll_period=60, sushy_task_cancel=cancel)
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(location, exc.location)
+        self.assertEqual('cancelled', exc.reason)
+        self.assertEqual(0, self.servers[0].count('GET', location))
+
+    def test_shutdown(self):
+        self._add_task(self.servers[0], 'JID_001', 1)
+
+        future = self.poller.http_call(
+            self.conns[0], 'post', self.ACTION + 'JID_001',
+            sushy_task_poll_period=60)
+        self.poller.shutdown()
+
+        self.assertRaises(sushy.exceptions.ExtensionError,
+                          future.result, timeout=10)
+
+    def test_get_task_poller(self):
+        self.addCleanup(setattr, asynchronous, '_task_poller', None)
+        asynchronous._task_poller = None
+
+        poller = asynchronous.get_task_poller()
+
+        self.assertIsInstance(poller, asynchronous.TaskPoller)
+        self.assertIs(poller, asynchronous.get_task_poller())
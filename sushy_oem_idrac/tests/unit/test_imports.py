@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import subprocess
+import sys
+
+from oslotest.base import BaseTestCase
+
+import sushy_oem_idrac
+from sushy_oem_idrac.resources.manager import constants as mgr_cons
+from sushy_oem_idrac.resources.system import constants as sys_cons
+from sushy_oem_idrac.resources.system.storage import constants as ctrl_cons
+from sushy_oem_idrac.resources.taskservice import constants as ts_cons
+from sushy_oem_idrac import utils
+
+_PROBE = """\
+import sys
+import sushy.resources.oem.base
+before = set(sys.modules)
+import %s
+print('\\n'.join(set(sys.modules) - before))
+"""
+
+_CONSTANTS_MODULES = {
+    'sushy_oem_idrac.resources.manager.constants',
+    'sushy_oem_idrac.resources.system.constants',
+    'sushy_oem_idrac.resources.system.storage.constants',
+    'sushy_oem_idrac.resources.taskservice.constants',
+}
+
+
+class EntryPointImportTestCase(BaseTestCase):
+    """Guards against entry points eagerly importing what they don't use"""
+
+    def _get_imported_modules(self, module_name):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _PROBE % module_name])
+        return set(output.decode().split())
+
+    def _assert_not_imported(self, module_name, unexpected):
+        imported = self._get_imported_modules(module_name)
+        self.assertIn(module_name, imported)
+        self.assertEqual(set(), imported & set(unexpected))
+
+    def test_manager(self):
+        self._assert_not_imported(
+            'sushy_oem_idrac.resources.manager.manager',
+            {'asyncio', 'concurrent.futures',
+             'sushy_oem_idrac.resources.manager.idrac_card_service',
+             'sushy_oem_idrac.resources.manager.job_collection',
+             'sushy_oem_idrac.resources.manager.job_service',
+             'sushy_oem_idrac.resources.manager.lifecycle_service'}
+            | _CONSTANTS_MODULES - {mgr_cons.__name__})
+
+    def test_system(self):
+        self._assert_not_imported(
+            'sushy_oem_idrac.resources.system.system',
+            {'asyncio', 'concurrent.futures'}
+            | _CONSTANTS_MODULES - {sys_cons.__name__})
+
+    def test_storage_controller(self):
+        self._assert_not_imported(
+            'sushy_oem_idrac.resources.system.storage.controller',
+            _CONSTANTS_MODULES - {ctrl_cons.__name__})
+
+    def test_task(self):
+        self._assert_not_imported(
+            'sushy_oem_idrac.resources.taskservice.task',
+            _CONSTANTS_MODULES - {ts_cons.__name__})
+
+
+class PackageConstantsTestCase(BaseTestCase):
+
+    def test_reexported(self):
+        self.assertIs(mgr_cons.ExportTarget, sushy_oem_idrac.ExportTarget)
+        self.assertIs(sys_cons.PHYSICAL_DISK_STATE_MODE_RAID,
+                      sushy_oem_idrac.PHYSICAL_DISK_STATE_MODE_RAID)
+        self.assertIs(ctrl_cons.ControllerMode,
+                      sushy_oem_idrac.ControllerMode)
+        self.assertIs(ts_cons.JobState, sushy_oem_idrac.JobState)
+
+    def test_all(self):
+        self.assertIn('EXPORT_TARGET_ALL', sushy_oem_idrac.__all__)
+        self.assertIn('JobType', sushy_oem_idrac.__all__)
+        self.assertIn('JobType', dir(sushy_oem_idrac))
+
+    def test_missing(self):
+        self.assertRaises(AttributeError, getattr, sushy_oem_idrac,
+                          'NoSuchConstant')
+        self.assertRaises(AttributeError, getattr, sushy_oem_idrac,
+                          'no_such_module')
+
+
+class LazyImportTestCase(BaseTestCase):
+
+    def test_imported(self):
+        self.assertIs(sys, utils.lazy_import('sys'))
+
+    def test_lazy(self):
+        module_name = 'sushy_oem_idrac.tests.unit.no_such_module'
+
+        module = utils.lazy_import(module_name)
+
+        self.assertNotIn(module_name, sys.modules)
+        self.assertRaises(ImportError, getattr, module, 'attribute')
@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import socket
+import struct
+import time
+from unittest import mock
+
+from oslotest.base import BaseTestCase
+import sushy
+
+from sushy_oem_idrac import reachability
+
+
+class ReachabilityTestCase(BaseTestCase):
+
+    def _listen(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(8)
+        return '127.0.0.1:%d' % sock.getsockname()[1]
+
+    def _closed_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return '127.0.0.1:%d' % port
+
+    def test__split_host(self):
+        self.assertEqual(('1.2.3.4', 443),
+                         reachability._split_host('1.2.3.4', 443))
+        self.assertEqual(('1.2.3.4', 8443),
+                         reachability._split_host('1.2.3.4:8443', 443))
+        self.assertEqual(('::1', 8443),
+                         reachability._split_host('[::1]:8443', 443))
+        self.assertEqual(('idrac.example.com', None),
+                         reachability._split_host('idrac.example.com', None))
+
+    def test_probe_listening(self):
+        host = self._listen()
+
+        self.assertEqual({host: True}, reachability.probe([host]))
+
+    def test_probe_refused(self):
+        host = self._closed_port()
+
+        self.assertTrue(reachability.is_reachable(host))
+
+    def test_probe_refused_port_open(self):
+        host = self._closed_port()
+
+        self.assertFalse(reachability.is_reachable(host, port_open=True))
+        self.assertTrue(reachability.is_reachable(self._listen(),
+                                                  port_open=True))
+
+    def test_probe_default_port(self):
+        host = self._listen()
+        address, port = host.split(':')
+
+        self.assertTrue(reachability.is_reachable(address, port=int(port)))
+
+    def test_probe_unresolvable(self):
+        self.assertFalse(reachability.is_reachable('idrac.invalid'))
+
+    @mock.patch.object(reachability.socket, 'socket', autospec=True)
+    def test_probe_unreachable(self, mock_socket):
+        mock_socket.return_value.connect_ex.return_value = (
+            reachability.errno.EHOSTUNREACH)
+
+        self.assertFalse(reachability.is_reachable('192.0.2.1'))
+        mock_socket.return_value.close.assert_called_once_with()
+
+    def test_probe_timeout(self):
+        hosts = ['127.0.0.1:1', '127.0.0.1:2']
+        with mock.patch.object(reachability.selectors.DefaultSelector,
+                               'select', autospec=True, return_value=[]):
+            with mock.patch.object(reachability.socket.socket, 'connect_ex',
+                                   autospec=True) as mock_connect:
+                mock_connect.return_value = reachability.errno.EINPROGRESS
+                result = reachability.probe(hosts, timeout=0.01)
+
+        self.assertEqual(dict.fromkeys(hosts, False), result)
+
+    def test_probe_many(self):
+        alive = [self._listen() for _ in range(5)]
+        refused = [self._closed_port() for _ in range(5)]
+
+        start = time.monotonic()
+        result = reachability.probe(alive + refused + ['idrac.invalid'])
+
+        self.assertLess(time.monotonic() - start, reachability.PROBE_TIMEOUT)
+        self.assertEqual(11, len(result))
+        self.assertTrue(all(result[host] for host in alive + refused))
+        self.assertFalse(result['idrac.invalid'])
+
+    def test__build_echo_request(self):
+        packet = reachability._build_echo_request(0x1234, 7)
+
+        self.assertEqual((8, 0, 0x1234, 7),
+                         struct.unpack('!BBxxHH', packet[:8]))
+        self.assertEqual(0, reachability._checksum(packet))
+
+    def test__parse_echo_reply(self):
+        reply = struct.pack('!BBHHH', 0, 0, 0, 0x1234, 7)
+        ip_header = b'\x45' + b'\x00' * 19
+
+        self.assertEqual(7, reachability._parse_echo_reply(reply))
+        self.assertEqual(7, reachability._parse_echo_reply(ip_header + reply))
+        self.assertIsNone(reachability._parse_echo_reply(
+            struct.pack('!BBHHH', 8, 0, 0, 0x1234, 7)))
+        self.assertIsNone(reachability._parse_echo_reply(b''))
+
+    @mock.patch.object(reachability.socket, 'socket', autospec=True,
+                       side_effect=PermissionError('Operation not permitted'))
+    def test_probe_icmp_not_permitted(self, mock_socket):
+        self.assertRaises(sushy.exceptions.ExtensionError,
+                          reachability.probe, ['127.0.0.1'],
+                          method=reachability.PROBE_ICMP)
+
+    def test_probe_icmp_loopback(self):
+        try:
+            result = reachability.probe(['127.0.0.1'],
+                                        method=reachability.PROBE_ICMP)
+        except sushy.exceptions.ExtensionError:
+            self.skipTest('ICMP sockets are not permitted here')
+
+        self.assertEqual({'127.0.0.1': True}, result)
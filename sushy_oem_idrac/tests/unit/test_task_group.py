@@ -0,0 +1,182 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import copy
+import json
+import threading
+
+from oslotest.base import BaseTestCase
+from sushy import connector
+from sushy import taskmonitor
+
+from sushy_oem_idrac import asynchronous
+from sushy_oem_idrac import task_group
+from sushy_oem_idrac.tests.unit import redfish_server
+
+TASKS_PATH = '/redfish/v1/TaskService/Tasks'
+
+
+class WaitForTasksTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(WaitForTasksTestCase, self).setUp()
+        self.server = self.useFixture(redfish_server.RedfishServer())
+        with open('sushy_oem_idrac/tests/unit/json_samples/task.json') as f:
+            self.task = json.load(f)
+        self.task_ids = ['JID_000000000001', 'JID_000000000002',
+                         'JID_000000000003']
+        self.paths = self.server.add_tasks(self.task_ids, self.task)
+
+        self.conn = connector.Connector(self.server.url, verify=False)
+        self.addCleanup(self.conn.close)
+        self.monitors = [taskmonitor.TaskMonitor(self.conn, path)
+                         for path in self.paths]
+        self.policy = asynchronous.FixedPollPolicy(0)
+        del self.server.requests[:]
+
+    def _task(self, path, task_state='Running', job_state='Running',
+              message='Job in progress.'):
+        doc = copy.deepcopy(self.task)
+        doc['@odata.id'] = path
+        doc['Id'] = doc['Oem']['Dell']['Id'] = path.split('/')[-1]
+        doc['TaskState'] = task_state
+        doc['Oem']['Dell'].update(JobState=job_state, Message=message)
+        return doc
+
+    def _completed(self, path):
+        return self._task(path, 'Completed', 'Completed',
+                          'Job completed successfully.')
+
+    def _expanded(self, *cycles):
+        self.server.add_route(
+            'GET', TASKS_PATH + task_group.EXPAND_QUERY,
+            [(200, {}, {'@odata.id': TASKS_PATH, 'Members': members})
+             for members in cycles])
+
+    def test_wait_for_tasks(self):
+        first, second, third = self.paths
+        self._expanded(
+            [self._task(first), self._task(second), self._task(third)],
+            [self._completed(first), self._task(second), self._task(third)],
+            [self._completed(first), self._completed(second),
+             self._task(third)])
+        self.server.add_route('GET', third, (200, {}, self._completed(third)))
+
+        results = task_group.wait_for_tasks(self.monitors,
+                                            poll_policy=self.policy)
+
+        self.assertEqual(set(self.paths), set(results))
+        for path in self.paths:
+            self.assertEqual('Completed', results[path]['task_state'])
+            self.assertEqual('Completed', results[path]['job_state'])
+            self.assertEqual('Job completed successfully.',
+                             results[path]['message'])
+        self.assertLessEqual(results[first]['elapsed'],
+                             results[second]['elapsed'])
+        self.assertLessEqual(results[second]['elapsed'],
+                             results[third]['elapsed'])
+        # One expanded request per cycle, the last task left on its own
+        self.assertEqual(
+            [('GET', TASKS_PATH + task_group.EXPAND_QUERY)] * 3
+            + [('GET', third)], self.server.requests)
+
+    def test_wait_for_tasks_fail_fast(self):
+        first, second, third = self.paths
+        self._expanded([
+            self._task(first),
+            self._task(second, 'Exception', 'Failed',
+                       'Unable to complete the operation.'),
+            self._task(third)])
+
+        exc = self.assertRaises(task_group.TaskGroupError,
+                                task_group.wait_for_tasks, self.monitors,
+                                poll_policy=self.policy)
+
+        self.assertEqual(second, exc.location)
+        self.assertIn('failed in state Failed: Unable to complete the '
+                      'operation.', str(exc))
+        self.assertIsNone(exc.results[first]['elapsed'])
+        self.assertIsNotNone(exc.results[second]['elapsed'])
+        self.assertEqual('Running', exc.results[third]['job_state'])
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_wait_for_tasks_completed_with_errors(self):
+        self._expanded([self._completed(path) for path in self.paths[:2]]
+                       + [self._task(self.paths[2], 'Completed',
+                                     'CompletedWithErrors')])
+
+        exc = self.assertRaises(task_group.TaskGroupError,
+                                task_group.wait_for_tasks, self.monitors,
+                                poll_policy=self.policy)
+
+        self.assertEqual(self.paths[2], exc.location)
+
+    def test_wait_for_tasks_not_expanded(self):
+        self._expanded([{'@odata.id': path} for path in self.paths])
+        for path in self.paths:
+            self.server.add_route('GET', path,
+                                  (200, {}, self._completed(path)))
+
+        results = task_group.wait_for_tasks(self.monitors,
+                                            poll_policy=self.policy)
+
+        self.assertEqual({'Completed'},
+                         {r['job_state'] for r in results.values()})
+        self.assertEqual(
+            [('GET', TASKS_PATH + task_group.EXPAND_QUERY)]
+            + [('GET', path) for path in self.paths], self.server.requests)
+
+    def test_wait_for_tasks_expand_rejected(self):
+        self.server.add_route(
+            'GET', TASKS_PATH + task_group.EXPAND_QUERY,
+            (501, {}, {'error': {'message': 'Not implemented'}}))
+        first, second, third = self.paths
+        for path in (first, second):
+            self.server.add_route('GET', path, [
+                (200, {}, self._task(path)), (200, {}, self._completed(path))])
+        self.server.add_route('GET', third, (200, {}, self._completed(third)))
+
+        results = task_group.wait_for_tasks(self.monitors,
+                                            poll_policy=self.policy)
+
+        self.assertEqual({'Completed'},
+                         {r['job_state'] for r in results.values()})
+        # The query is given up on once rejected
+        self.assertEqual(
+            [('GET', TASKS_PATH + task_group.EXPAND_QUERY)]
+            + [('GET', path) for path in self.paths]
+            + [('GET', first), ('GET', second)], self.server.requests)
+
+    def test_wait_for_tasks_deadline(self):
+        self._expanded([self._task(path) for path in self.paths])
+
+        exc = self.assertRaises(asynchronous.TaskTimeoutError,
+                                task_group.wait_for_tasks, self.monitors,
+                                deadline=0.05,
+                                poll_policy=asynchronous.FixedPollPolicy(
+                                    0.01))
+
+        self.assertEqual('deadline exceeded', exc.reason)
+        self.assertEqual(', '.join(self.paths), exc.location)
+        self.assertEqual({None}, {r['elapsed'] for r in exc.results.values()})
+
+    def test_wait_for_tasks_cancelled(self):
+        self._expanded([self._task(path) for path in self.paths])
+        cancel = threading.Event()
+        cancel.set()
+
+        exc = self.assertRaises(asynchronous.TaskTimeoutError,
+                                task_group.wait_for_tasks, self.monitors,
+                                cancel=cancel, poll_policy=self.policy)
+
+        self.assertEqual('cancelled', exc.reason)
+        self.assertEqual(1, len(self.server.requests))
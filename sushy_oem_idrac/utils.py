@@ -10,13 +10,77 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import importlib
 import logging
+import sys
+import threading
 import time
+from urllib.parse import urlparse
 
 import sushy
 
 LOG = logging.getLogger(__name__)
 
+# Requests issued at once to one iDRAC, at most, by code paths fanning
+# requests out over threads. Keeps BMC request throttling from kicking in
+IDRAC_MAX_CONCURRENT_REQUESTS = 8
+
+_request_slots = {}
+_request_slots_lock = threading.Lock()
+
+
+class _LazyModule(object):
+    """Stands in for a module until one of its attributes is used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._name
+
+
+def lazy_import(name):
+    """Get a module object importing the module on first attribute use.
+
+    Meant for modules needed by a few code paths only, so that loading
+    the sushy OEM entry points stays cheap.
+
+    :param name: Absolute name of the module to import.
+    :returns: The module if already imported, otherwise a stand-in
+        proxying attribute access to the module.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    return _LazyModule(name)
+
+
+def get_request_slots(conn):
+    """Get the semaphore capping concurrent requests to an iDRAC.
+
+    The semaphore is shared by all connections to the same iDRAC, so that
+    operations running side by side stay within
+    `IDRAC_MAX_CONCURRENT_REQUESTS` altogether.
+
+    :param conn: Sushy `Connector` of the iDRAC.
+    :returns: `threading.BoundedSemaphore` to hold while requesting.
+    """
+    url = getattr(conn, '_url', None)
+    host = urlparse(url).netloc if isinstance(url, str) else None
+    with _request_slots_lock:
+        slots = _request_slots.get(host)
+        if slots is None:
+            slots = _request_slots[host] = threading.BoundedSemaphore(
+                IDRAC_MAX_CONCURRENT_REQUESTS)
+    return slots
+
 
 def reboot_system(system):
     if system.power_state != sushy.POWER_STATE_OFF: